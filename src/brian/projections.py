@@ -40,10 +40,10 @@ class Projection(common.Projection):
 
     def __init__(self, presynaptic_population, postsynaptic_population,
                  connector, synapse_type, source=None, receptor_type=None,
-                 space=Space(), label=None):
+                 space=Space(), label=None, dry_run=False):
         common.Projection.__init__(self, presynaptic_population, postsynaptic_population,
                                    connector, synapse_type, source, receptor_type,
-                                   space, label)
+                                   space, label, dry_run)
         self.connections = None
         self._n_connections = 0
         # create one Synapses object per pre-post population pair
@@ -81,7 +81,8 @@ class Projection(common.Projection):
                 self._brian_synapses[i][j] = syn_obj
                 simulator.state.network.add(syn_obj)
         # connect the populations
-        connector.connect(self)
+        if not dry_run:
+            connector.connect(self)
         # special-case: the Tsodyks-Markram short-term plasticity model takes
         #               a parameter value from the post-synaptic response model
         if isinstance(self.synapse_type, TsodyksMarkramSynapse):
@@ -0,0 +1,274 @@
+"""
+An on-disk cache for connectivity generated by connectors, so that identical
+networks need not be rebuilt from scratch in every run of a parameter sweep.
+
+Classes:
+    ConnectionCache - stores the connections created by a connector in a
+                      directory, keyed by a hash of everything that determines
+                      them.
+
+:copyright: Copyright 2006-2013 by the PyNN team, see AUTHORS.
+:license: CeCILL, see LICENSE for details.
+"""
+
+import os
+import re
+import hashlib
+import logging
+import tempfile
+import types
+import numpy
+from pyNN.random import AbstractRNG
+
+logger = logging.getLogger("PyNN")
+
+
+class Uncacheable(Exception):
+    """Raised when an object cannot be given a stable fingerprint."""
+    pass
+
+
+class _Fingerprint(object):
+    """
+    Build a string which identifies the value of an object independently of
+    its identity in memory, keeping track of the random number generators
+    encountered on the way (so that their state can be saved and restored).
+    """
+
+    # attributes which do not affect the connections created
+    ignore = ("_projection", "callback")
+
+    def __init__(self):
+        self.rngs = []
+        self._active = set()
+
+    def __call__(self, value):
+        if value is None or isinstance(value, (bool, int, long, float, complex, basestring)):
+            return repr(value)
+        if isinstance(value, numpy.generic):
+            return repr(value.item())
+        if id(value) in self._active:
+            raise Uncacheable("circular reference in %r" % type(value))
+        self._active.add(id(value))
+        try:
+            return self._fingerprint(value)
+        finally:
+            self._active.remove(id(value))
+
+    def _fingerprint(self, value):
+        if isinstance(value, numpy.ndarray):
+            if value.dtype.hasobject:
+                return "array([%s])" % ", ".join(self(x) for x in value.flat)
+            digest = hashlib.sha1(numpy.ascontiguousarray(value).view(numpy.uint8)).hexdigest()
+            return "array(%s, %s, %s)" % (value.dtype.str, value.shape, digest)
+        if isinstance(value, (list, tuple)):
+            return "%s(%s)" % (type(value).__name__, ", ".join(self(x) for x in value))
+        if isinstance(value, dict):
+            return "{%s}" % ", ".join("%s: %s" % (self(k), self(v))
+                                      for k, v in sorted(value.items()))
+        if isinstance(value, type):
+            return "type(%s.%s)" % (value.__module__, value.__name__)
+        if isinstance(value, numpy.random.RandomState):
+            return "RandomState(%s)" % self(value.get_state())
+        if isinstance(value, types.FunctionType):
+            if value.__name__ == "<lambda>" or value.__closure__:
+                raise Uncacheable("cannot identify function %r" % value)
+            code = value.func_code
+            return "function(%s.%s, %s, %s)" % (value.__module__, value.__name__,
+                                                 hashlib.sha1(code.co_code).hexdigest(),
+                                                 self(value.func_defaults))
+        if isinstance(value, types.MethodType):
+            if id(value.im_self) in self._active:  # e.g. an alias for another method
+                return "method(%s)" % value.__name__
+            return "method(%s, %s)" % (value.__name__, self(value.im_self))
+        if isinstance(value, types.BuiltinFunctionType) or type(value).__name__ == "ufunc":
+            return "function(%s)" % value.__name__
+        if isinstance(value, AbstractRNG):
+            if not any(rng is value for rng in self.rngs):
+                self.rngs.append(value)
+            return "%s.%s(%s)" % (type(value).__module__, type(value).__name__,
+                                  self(rng_state(value)))
+        if hasattr(value, "fileobj"):
+            raise Uncacheable("cannot identify the contents of file %r" % value)
+        if hasattr(value, "__dict__") and not isinstance(value, (types.ModuleType, file)):
+            state = dict((k, v) for k, v in value.__dict__.items()
+                         if k not in self.ignore)
+            return "%s.%s(%s)" % (type(value).__module__, type(value).__name__, self(state))
+        raise Uncacheable("cannot identify objects of type %r" % type(value))
+
+
+def rng_state(rng):
+    """
+    Return the state of a random number generator as a dict of NumPy arrays.
+    Raise `Uncacheable` if the state cannot be represented in this way.
+    """
+    state = {}
+    for name, value in rng.__dict__.items():
+        if name == "rng" and isinstance(value, numpy.random.RandomState):
+            algorithm, keys, pos, has_gauss, cached_gaussian = value.get_state()
+            state.update(rng_keys=keys.copy(), rng_pos=numpy.array(pos),
+                         rng_has_gauss=numpy.array(has_gauss),
+                         rng_cached_gaussian=numpy.array(cached_gaussian))
+        elif name == "_key_source":
+            # the stream keys of a CounterBasedRNG may be counted by another copy
+            state["_n_keys"] = numpy.array(value._n_keys)
+        elif value is None or isinstance(value, types.MethodType):
+            continue
+        elif isinstance(value, (bool, int, long, float, numpy.generic, numpy.ndarray)):
+            state[name] = numpy.array(value)
+        else:
+            raise Uncacheable("cannot save the state of %r" % rng)
+    return state
+
+
+def restore_rng_state(rng, state):
+    """
+    Set the state of a random number generator from a dict returned by
+    `rng_state()`.
+    """
+    for name, value in state.items():
+        if name.startswith("rng_"):
+            continue
+        elif name == "_n_keys":
+            rng._key_source._n_keys = int(value)
+        elif value.ndim == 0:
+            setattr(rng, name, value.item())
+        else:
+            setattr(rng, name, value.copy())
+    if "rng_keys" in state:
+        rng.rng.set_state(("MT19937", state["rng_keys"], int(state["rng_pos"]),
+                           int(state["rng_has_gauss"]), float(state["rng_cached_gaussian"])))
+
+
+class ConnectionCache(object):
+    """
+    Store the connections created by connectors in the directory `directory`,
+    one file per projection, in NumPy .npz format.
+
+    The key of each entry is a hash of the connector class and attributes
+    (including the state of any random number generators), of the sizes, cell
+    types, positions and MPI distribution of the pre- and post-synaptic
+    populations, of the `Space` and of the synapse type and its parameters.
+    Entries are only valid for the same MPI rank and number of processes.
+
+    When the total size of the cache exceeds `max_size` bytes, the least
+    recently used entries are deleted.
+
+    The entries contain only numerical arrays, but versions of NumPy older
+    than 1.10 will unpickle object arrays when loading, so the directory
+    should not be writable by untrusted users.
+    """
+    suffix = ".npz"
+    _rng_array = re.compile(r"^rng_state(\d+)_(.+)$")
+
+    def __init__(self, directory, max_size=2**30):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.max_size = max_size
+        if not os.path.exists(self.directory):
+            try:  # wrapping in try...except block for MPI
+                os.makedirs(self.directory)
+            except OSError:
+                pass
+
+    def key(self, connector, projection):
+        """
+        Return the key for the connections created by `connector` in
+        `projection`, and the list of random number generators that determine
+        them. Raise `Uncacheable` if the key cannot be determined.
+        """
+        fingerprint = _Fingerprint()
+        state = projection._simulator.state
+        components = [
+            fingerprint(connector),
+            fingerprint((state.mpi_rank, state.num_processes)),
+            fingerprint(projection.pre == projection.post),
+            fingerprint(projection.space),
+            fingerprint(projection.receptor_type),
+            fingerprint(type(projection.synapse_type).__name__),
+            fingerprint(projection.synapse_type.parameter_space._parameters),
+        ]
+        for population in (projection.pre, projection.post):
+            celltype = getattr(population, "celltype", None)
+            components.extend([
+                fingerprint(population.size),
+                fingerprint(type(celltype).__name__),
+                fingerprint(population.positions),
+                fingerprint(getattr(population, "_mask_local", None)),
+            ])
+        key = hashlib.sha1("\n".join(components)).hexdigest()
+        return key, fingerprint.rngs
+
+    def path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, key):
+        """
+        Return the connection parameters and a list of random number
+        generator states stored under `key`, or None if there is no such entry.
+        """
+        path = self.path(key)
+        try:
+            data = numpy.load(path)
+            arrays = dict((name, data[name]) for name in data.files)
+            data.close()
+            os.utime(path, None)  # for least-recently-used eviction
+        except (IOError, OSError, ValueError), err:
+            if os.path.exists(path):
+                logger.warning("Unable to read connection cache file %s: %s" % (path, err))
+            return None
+        rng_states = [{} for i in range(int(arrays.pop("rng_count")))]
+        for name in arrays.keys():
+            match = self._rng_array.match(name)
+            if match:
+                rng_states[int(match.group(1))][match.group(2)] = arrays.pop(name)
+        return arrays, rng_states
+
+    def store(self, key, arrays, rng_states):
+        """
+        Store the connection parameters `arrays` (a dict of NumPy arrays),
+        together with the states of the random number generators after
+        connecting (dicts of arrays, as returned by `rng_state()`), under
+        `key`, then evict old entries if necessary.
+        """
+        arrays = dict(arrays)
+        arrays["rng_count"] = numpy.array(len(rng_states))
+        for i, state in enumerate(rng_states):
+            for name, value in state.items():
+                arrays["rng_state%d_%s" % (i, name)] = value
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                numpy.savez(f, **arrays)
+            os.rename(tmp_path, self.path(key))  # atomic, in case of concurrent runs
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in `max_size`."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Delete all entries."""
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                os.remove(os.path.join(self.directory, name))
@@ -45,6 +45,6 @@ Global constants:
 """
 
 from populations import IDMixin, BasePopulation, Population, PopulationView, Assembly, is_conductance
-from projections import Projection
+from projections import Projection, ConnectionStore
 from procedural_api import build_create, build_connect, set, build_record, initialize
 from control import setup, end, build_run, build_reset, build_state_queries
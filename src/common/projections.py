@@ -9,7 +9,6 @@ backend-specific Projection classes.
 
 import numpy
 import logging
-import operator
 from copy import copy
 from pyNN import recording, errors, models, core, descriptions
 from pyNN.parameters import ParameterSpace, LazyArray
@@ -17,6 +16,12 @@ from pyNN.space import Space
 from pyNN.standardmodels import StandardSynapseType
 from populations import BasePopulation, Assembly
 
+try:
+    import scipy.sparse
+    have_scipy = True
+except ImportError:
+    have_scipy = False
+
 logger = logging.getLogger("PyNN")
 deprecated = core.deprecated
 
@@ -49,12 +54,20 @@ class Projection(object):
             mechanisms to use.
         `space`:
             TO DOCUMENT
+        `dry_run`:
+            if True, no connections are created. Instead, the number of
+            connections the connector would create, and the memory they would
+            need, are estimated (see `Connector.estimate()`) and stored in the
+            `estimate` attribute.
     """
     _nProj = 0
+    # Backends which keep the connections in a ConnectionStore, rather than
+    # as a list of connection objects, set this in __init__()
+    _connection_store = None
 
     def __init__(self, presynaptic_neurons, postsynaptic_neurons, connector,
                  synapse_type=None, source=None, receptor_type=None,
-                 space=Space(), label=None):
+                 space=Space(), label=None, dry_run=False):
         """
         Create a new projection, connecting the pre- and post-synaptic neurons.
         """
@@ -85,6 +98,11 @@ class Projection(object):
         if label is None:
             if self.pre.label and self.post.label:
                 self.label = "%s→%s" % (self.pre.label, self.post.label)
+        self.dry_run = dry_run
+        if dry_run:
+            self.estimate = connector.estimate(self.pre, self.post, space, self.synapse_type)
+            logger.info("Dry run of %s: %d connections expected (%d bytes)" % (
+                        self.label, self.estimate['expected'], self.estimate['bytes']))
         Projection._nProj += 1
 
     def __len__(self):
@@ -119,6 +137,38 @@ class Projection(object):
         for i in range(len(self)):
             yield self[i]
 
+    # --- Methods for creating connections ------------------------------------
+
+    def _connect_block(self, presynaptic_indices, postsynaptic_indices,
+                       **connection_parameters):
+        """
+        Create a block of connections, given in coordinate (COO) format.
+
+        `presynaptic_indices` and `postsynaptic_indices` are integer arrays of
+        equal length, with the connections grouped by post-synaptic index. Each
+        connection parameter is either a single value or an array with one
+        value per connection.
+
+        Backends that can create many connections with a single call should
+        override this method. The default implementation creates the
+        connections one post-synaptic cell at a time, using
+        `_convergent_connect()`.
+        """
+        n = postsynaptic_indices.size
+        boundaries = numpy.flatnonzero(numpy.diff(postsynaptic_indices)) + 1
+        starts = numpy.hstack(([0], boundaries))
+        stops = numpy.hstack((boundaries, [n]))
+        for start, stop in zip(starts, stops):
+            column_parameters = {}
+            for name, value in connection_parameters.items():
+                if isinstance(value, numpy.ndarray) and value.ndim > 0:
+                    column_parameters[name] = value[start:stop]
+                else:
+                    column_parameters[name] = value
+            self._convergent_connect(presynaptic_indices[start:stop],
+                                     postsynaptic_indices[start],
+                                     **column_parameters)
+
     # --- Methods for setting connection parameters ---------------------------
 
     def set(self, **attributes):
@@ -131,34 +181,103 @@ class Projection(object):
         Each attribute value may be:
             (1) a single number
             (2) a RandomDistribution object
-            (3) a list/1D array of the same length as the number of local connections
+            (3) a list/1D array of the same length as the number of local
+                connections, in the order of the local connections (as
+                returned by `get(format='list', gather=False)`)
             (4) a 2D array with the same dimensions as the connectivity matrix
                 (as returned by `get(format='array')`
             (5) a mapping function, which accepts a single float argument (the
                 distance between pre- and post-synaptic cells) and returns a single value.
+            (6) a tuple `(presynaptic_indices, postsynaptic_indices, values)`,
+                giving the values for the connections between the given pairs
+                of cells. The connections between other pairs are unchanged,
+                and pairs with no connection on the local MPI node are ignored,
+                so the same tuple may be given on all nodes.
 
         Weights should be in nA for current-based and µS for conductance-based
         synapses. Delays should be in milliseconds.
         """
         # should perhaps add a "distribute" argument, for symmetry with "gather" in get()
-        attributes = self._value_list_to_array(attributes)
-        parameter_space = ParameterSpace(attributes,
+        connection_values = {}
+        for name, value in attributes.items():
+            if isinstance(value, tuple) or (isinstance(value, (list, numpy.ndarray))
+                                            and numpy.ndim(value) == 1):
+                connection_values[name] = attributes.pop(name)
+        if attributes:
+            parameter_space = ParameterSpace(attributes,
+                                             self.synapse_type.get_schema(),
+                                             (self.pre.size, self.post.size))
+            parameter_space = self._handle_distance_expressions(parameter_space)
+            if isinstance(self.synapse_type, StandardSynapseType):
+                parameter_space = self.synapse_type.translate(parameter_space)
+            self._set_attributes(parameter_space)
+        for name, value in connection_values.items():
+            self._set_connection_values(name, value)
+
+    def _set_connection_values(self, name, value):
+        """
+        Set the attribute `name` of individual local connections, given either
+        a list/1D array with one value per local connection, or a tuple
+        `(presynaptic_indices, postsynaptic_indices, values)`.
+        """
+        if isinstance(value, tuple):
+            if len(value) != 3:
+                raise errors.InvalidParameterValueError(
+                    "%s should be given as (presynaptic_indices, postsynaptic_indices, values)" % name)
+            indices, values = self._match_connections(*value)
+        else:
+            values = numpy.asarray(value)
+            if values.size != len(self):
+                raise errors.InvalidDimensionsError(
+                    "%d values given for %s, but there are %d local connections" % (values.size, name, len(self)))
+            indices = slice(None)
+        parameter_space = ParameterSpace({name: values},
                                          self.synapse_type.get_schema(),
-                                         (self.pre.size, self.post.size))
-        parameter_space = self._handle_distance_expressions(parameter_space)
+                                         (values.size,))
         if isinstance(self.synapse_type, StandardSynapseType):
             parameter_space = self.synapse_type.translate(parameter_space)
-        self._set_attributes(parameter_space)
+        parameter_space.evaluate()
+        self._set_connection_attributes(indices, **parameter_space.as_dict())
 
-    def _value_list_to_array(self, attributes):
-        """Convert a list of connection parameters/attributes to a 2D array."""
-        connection_mask = ~numpy.isnan(self.get('weight', format='array', gather='all'))
-        for name, value in attributes.items():
-            if isinstance(value, list) or (isinstance(value, numpy.ndarray) and value.ndim == 1):
-                array_value = numpy.nan * numpy.ones(self.shape)
-                array_value[connection_mask] = value
-                attributes[name] = array_value
-        return attributes
+    def _match_connections(self, presynaptic_indices, postsynaptic_indices, values):
+        """
+        Return the positions of the local connections between the given pairs
+        of cells, and the values for those connections.
+        """
+        presynaptic_indices = numpy.asarray(presynaptic_indices, dtype=int)
+        postsynaptic_indices = numpy.asarray(postsynaptic_indices, dtype=int)
+        values = numpy.broadcast_arrays(values, presynaptic_indices)[0]
+        keys = presynaptic_indices * self.post.size + postsynaptic_indices
+        order = numpy.argsort(keys, kind='mergesort')
+        keys = keys[order]
+        sources, targets = self._get_attributes_as_coo()
+        addresses = sources * self.post.size + targets
+        positions = numpy.minimum(numpy.searchsorted(keys, addresses), max(keys.size - 1, 0))
+        if keys.size > 0:
+            found = keys[positions] == addresses
+        else:
+            found = numpy.zeros(addresses.shape, dtype=bool)
+        return numpy.flatnonzero(found), values[order[positions[found]]]
+
+    def _set_connection_attributes(self, indices, **attributes):
+        """
+        Set the attributes of the local connections at positions `indices`
+        (an integer array or a slice), in the order of the local connections,
+        from arrays of native parameter values with one value per connection.
+
+        Backends which can set the attributes of many connections at once
+        should override this. The default implementation writes to the
+        `ConnectionStore`, if there is one, or sets the attributes of each
+        connection object.
+        """
+        if self._connection_store is not None:
+            for name, values in attributes.items():
+                self._connection_store.set(name, values, indices)
+        else:
+            positions = numpy.arange(len(self))[indices]
+            for name, values in attributes.items():
+                for i, value in zip(positions, values):
+                    setattr(self[int(i)], name, value)
 
     def _handle_distance_expressions(self, parameter_space):
         # also index-based expressions
@@ -166,6 +285,8 @@ class Projection(object):
             if callable(map.base_value):
                 if isinstance(map.base_value, core.IndexBasedExpression):
                     map.base_value.projection = self
+                    # blocks of the map are evaluated with evaluate_block()
+                    map.base_value = map.base_value.evaluate
                     parameter_space[name] = map
                 else:
                     # Assumes map is a function of distance
@@ -211,7 +332,7 @@ class Projection(object):
             name of the attributes whose values are wanted, or a list of such
             names.
         `format`:
-            "list" or "array".
+            "list", "array" or "sparse".
 
         With list format, returns a list of tuples. Each tuple contains the
         indices of the pre- and post-synaptic cell followed by the attribute
@@ -233,6 +354,13 @@ class Projection(object):
             >>> weights.shape
             TODO
 
+        With sparse format, returns a SciPy sparse matrix in CSR format for
+        each name in `attribute_names`, with the same shape as for the array
+        format, and with elements only for the existing connections. As for
+        the array format, the values of multiple connections between the same
+        pair of neurons are summed. Memory use is proportional to the number
+        of connections, not to the size of the connectivity matrix.
+
         TODO: document "with_address"
 
         Values will be expressed in the standard PyNN units (i.e. millivolts,
@@ -249,61 +377,94 @@ class Projection(object):
             names = list(attribute_names)
             if with_address:
                 names = ["presynaptic_index", "postsynaptic_index"] + names
-            values = self._get_attributes_as_list(*names)
             if gather and self._simulator.state.num_processes > 1:
-                all_values = { self._simulator.state.mpi_rank: values }
-                all_values = recording.gather_dict(all_values, all=(gather=='all'))
-                if gather == 'all' or self._simulator.state.mpi_rank == 0:
-                    values = reduce(operator.add, all_values.values())
+                columns = self._gather_attributes_as_coo(attribute_names, gather)
+                if not with_address:
+                    columns = columns[2:]
+                values = zip(*[column.tolist() for column in columns])
+            else:
+                values = self._get_attributes_as_list(*names)
             if not with_address and return_single:
                 values = [val[0] for val in values]
             return values
-        elif format == 'array':
-            if gather and self._simulator.state.num_processes > 1:
-                # Node 0 is the only one creating a full connection matrix, and returning it (saving memory)
-                # Slaves nodes are returning list of connections, so this may be inconsistent...
-                names      = list(attribute_names)
-                names      = ["presynaptic_index", "postsynaptic_index"] + names
-                values     = self._get_attributes_as_list(*names)
-                all_values = { self._simulator.state.mpi_rank: values }
-                all_values = recording.gather_dict(all_values, all=(gather=='all'))
-                if gather == 'all' or self._simulator.state.mpi_rank == 0:
-                    tmp_values = reduce(operator.add, all_values.values())
-                    values     = self._get_attributes_as_arrays(*attribute_names)
-                    tmp_values = numpy.array(tmp_values)
-                    for i in xrange(len(values)):
-                        values[i][tmp_values[:, 0].astype(int), tmp_values[:, 1].astype(int)] = tmp_values[:, 2+i]
-            else:
+        elif format in ('array', 'sparse'):
+            if format == 'sparse' and not have_scipy:
+                raise ImportError("format='sparse' requires SciPy")
+            if format == 'array' and not (gather and self._simulator.state.num_processes > 1):
                 values = self._get_attributes_as_arrays(*attribute_names)
+            else:
+                # Node 0 is the only one creating a full connection matrix, and returning it
+                # (saving memory), unless gather is 'all'. Other nodes return their local connections.
+                columns = self._gather_attributes_as_coo(attribute_names, gather)
+                sources, targets = columns[:2]
+                if format == 'array':
+                    values = [_coo_to_dense(self.shape, sources, targets, column)
+                              for column in columns[2:]]
+                else:
+                    values = [scipy.sparse.coo_matrix((column, (sources, targets)),
+                                                      shape=self.shape).tocsr()
+                              for column in columns[2:]]
             if return_single:
-                if gather == 'all' or self._simulator.state.mpi_rank == 0:
-                    assert len(values) == 1, values
+                assert len(values) == 1, values
                 return values[0]
             else:
                 return values
         else:
-            raise Exception("format must be 'list' or 'array'")
+            raise Exception("format must be 'list', 'array' or 'sparse'")
 
     def _get_attributes_as_list(self, *names):
+        if self._connection_store is not None:
+            return self._connection_store.as_list(*names)
         return [c.as_tuple(*names) for c in self.connections]
 
+    def _get_attributes_as_coo(self, *names):
+        """
+        Return the pre- and post-synaptic indices of the local connections,
+        followed by the values of the attributes `names`, as a list of 1D
+        arrays (i.e. the connections in coordinate (COO) format).
+        """
+        names = ["presynaptic_index", "postsynaptic_index"] + list(names)
+        if self._connection_store is not None:
+            return [self._connection_store.column(name).copy() for name in names]
+        values = numpy.array(self._get_attributes_as_list(*names), dtype=float)
+        columns = list(values.reshape((-1, len(names))).T)
+        columns[:2] = [column.astype(int) for column in columns[:2]]
+        return columns
+
+    def _gather_attributes_as_coo(self, names, gather):
+        """
+        Return the connections in coordinate format, as for
+        `_get_attributes_as_coo()`, gathered from all MPI nodes to node 0 if
+        `gather` is True, or to all nodes if `gather` is 'all'.
+        """
+        columns = self._get_attributes_as_coo(*names)
+        state = self._simulator.state
+        if gather and state.num_processes > 1:
+            columns = recording.gather_columns(columns, all=(gather=='all'))
+        return columns
+
+    def _iter_gathered_attributes_as_coo(self, names, chunk_size):
+        """
+        Return an iterator over the connections in coordinate format, as for
+        `_gather_attributes_as_coo()` with `gather` True, in chunks of at
+        most `chunk_size` connections. On nodes other than node 0, the
+        iterator is empty, but must be exhausted.
+        """
+        columns = self._get_attributes_as_coo(*names)
+        if self._simulator.state.num_processes > 1:
+            return recording.iter_gather_columns(columns, chunk_size)
+        return ([column[start:start + chunk_size] for column in columns]
+                for start in xrange(0, columns[0].size, chunk_size))
+
     def _get_attributes_as_arrays(self, *names):
-        all_values = []
-        for attribute_name in names:
-            values = numpy.nan * numpy.ones((self.pre.size, self.post.size))
-            if attribute_name[-1] == "s":  # weights --> weight, delays --> delay
-                attribute_name = attribute_name[:-1]
-            for c in self.connections:
-                value = getattr(c, attribute_name)
-                addr = (c.presynaptic_index, c.postsynaptic_index)
-                if numpy.isnan(values[addr]):
-                    values[addr] = value
-                else:
-                    values[addr] += value   # addition is only appropriate for certain variables
-                                            # e.g. weight. Not appropriate for delays.
-                                            # What about synaptic parameters, e.g. wmax?
-            all_values.append(values)
-        return all_values
+        # weights --> weight, delays --> delay
+        names = [{"weights": "weight", "delays": "delay"}.get(name, name) for name in names]
+        columns = self._get_attributes_as_coo(*names)
+        sources, targets = columns[:2]
+        # addition is only appropriate for certain variables, e.g. weight.
+        # Not appropriate for delays. What about synaptic parameters, e.g. wmax?
+        return [_coo_to_dense(self.shape, sources, targets, values)
+                for values in columns[2:]]
 
     @deprecated("get('weight', format, gather)")
     def getWeights(self, format='list', gather=True):
@@ -317,28 +478,62 @@ class Projection(object):
     def getSynapseDynamics(self, parameter_name, format='list', gather=True):
         return self.get(parameter_name, format, gather, with_address=False)
 
-    def save(self, attribute_names, file, format='list', gather=True, with_address=True):
+    def save(self, attribute_names, file, format='list', gather=True, with_address=True,
+             chunk_size=None):
         """
         Print synaptic attributes (weights, delays, etc.) to file. In the array
         format, zeros are printed for non-existent connections.
 
         Values will be expressed in the standard PyNN units (i.e. millivolts,
         nanoamps, milliseconds, microsiemens, nanofarads, event per second).
+
+        `file` may be a filename, in which case a text file is written, or any
+        of the file objects from :mod:`pyNN.recording.files`. For large
+        projections, use a :class:`~pyNN.recording.files.BinaryConnectionFile`
+        (with `format='list'` and `with_address=True`), which can be loaded
+        efficiently in parallel by a `FromFileConnector`.
+
+        With `format='list'` and `gather=True`, if `chunk_size` is given, the
+        connections are sent to node 0 and written to file in chunks of at
+        most `chunk_size` connections, so that node 0 never holds the whole
+        projection in memory (if the file type supports writing in chunks).
         """
         if attribute_names in ('all', 'connections'):
             attribute_names = self.synapse_type.get_parameter_names()
         if isinstance(file, basestring):
             file = recording.files.StandardTextFile(file, mode='w')
-        all_values = self.get(attribute_names, format=format, gather=gather, with_address=with_address)
+        if isinstance(attribute_names, basestring):
+            attribute_names = [attribute_names]
+        names = attribute_names
+        if isinstance(self.synapse_type, StandardSynapseType):
+            names = self.synapse_type.get_native_names(*names)
+        streaming = bool(chunk_size) and format == 'list' and gather is True
         if format == 'array':
-            all_values = [numpy.where(numpy.isnan(values), 0.0, values)
-                          for values in all_values]
+            # the matrices are built directly from the connection indices,
+            # with zeros for the non-existent connections
+            columns = self._gather_attributes_as_coo(names, gather)
+            all_values = [_coo_to_dense(self.shape, columns[0], columns[1], values, fill=0.0)
+                          for values in columns[2:]]
+            if len(all_values) == 1:
+                all_values = all_values[0]
+        elif streaming:
+            first = 0 if with_address else 2
+            all_values = (numpy.column_stack(columns[first:])
+                          for columns in self._iter_gathered_attributes_as_coo(names, chunk_size))
+        else:
+            all_values = self.get(attribute_names, format=format, gather=gather, with_address=with_address)
         if self._simulator.state.mpi_rank == 0:
-            metadata = {"columns": attribute_names}
-            if with_address:
+            metadata = {"columns": list(attribute_names)}
+            if with_address and format == 'list':
                 metadata["columns"] = ["i", "j"] + metadata["columns"]
-            file.write(all_values, metadata)
+            if streaming:
+                file.write_chunks(all_values, metadata)
+            else:
+                file.write(all_values, metadata)
             file.close()
+        elif streaming:
+            for chunk in all_values:  # take part in the collective operations
+                pass
 
     @deprecated("save('all', file, format='list', gather=gather)")
     def saveConnections(self, file, gather=True, compatible_output=True):
@@ -395,3 +590,183 @@ class Projection(object):
         if self.synapse_type:
             context.update(plasticity=self.synapse_type.describe(template=None))
         return descriptions.render(engine, template, context)
+
+
+def _coo_to_dense(shape, sources, targets, values, fill=numpy.nan):
+    """
+    Return a 2D array of the given shape, containing `values` at the positions
+    given by the index arrays `sources` and `targets`, summed where there are
+    multiple values for the same position, and `fill` elsewhere.
+    """
+    size = shape[0] * shape[1]
+    addresses = sources * shape[1] + targets
+    dense = numpy.bincount(addresses, weights=values, minlength=size).reshape(shape)
+    if fill != 0:
+        n_values = numpy.bincount(addresses, minlength=size).reshape(shape)
+        dense[n_values == 0] = fill
+    return dense
+
+
+class ConnectionStore(object):
+    """
+    Compact storage for the connections of a projection on the local MPI node,
+    as a "struct of arrays": an array of pre-synaptic indices, an array of
+    post-synaptic indices and an array for each connection parameter.
+
+    Connections are kept sorted by post-synaptic index (i.e. in compressed
+    sparse row order, with one row per post-synaptic cell), and in the order
+    in which they were added for each post-synaptic cell. The arrays grow
+    geometrically as connections are added. Blocks of connections which
+    arrive out of order are appended as they are, and the connections are
+    sorted once, when they are next accessed.
+
+    Arguments:
+        `n_post`:
+            the number of post-synaptic cells.
+    """
+    initial_capacity = 64
+
+    def __init__(self, n_post):
+        self.n_post = n_post
+        self._n = 0
+        self._pre = numpy.zeros((self.initial_capacity,), dtype=int)
+        self._post = numpy.zeros((self.initial_capacity,), dtype=int)
+        self._parameters = {}
+        self._indptr = None
+        self._sorted = True
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def presynaptic_index(self):
+        self._sort()
+        return self._pre[:self._n]
+
+    @property
+    def postsynaptic_index(self):
+        self._sort()
+        return self._post[:self._n]
+
+    @property
+    def parameter_names(self):
+        return self._parameters.keys()
+
+    def parameter(self, name):
+        """Return the array of values of the parameter `name`."""
+        if self._n == 0 and name not in self._parameters:
+            return numpy.zeros((0,))
+        self._sort()
+        return self._parameters[name][:self._n]
+
+    def column(self, name):
+        """
+        Return the array of pre- or post-synaptic indices or parameter values
+        given by `name`.
+        """
+        if name == "presynaptic_index":
+            return self.presynaptic_index
+        elif name == "postsynaptic_index":
+            return self.postsynaptic_index
+        return self.parameter(name)
+
+    @property
+    def indptr(self):
+        """
+        Array of length `n_post + 1`, such that the connections to the `j`th
+        post-synaptic cell are those from `indptr[j]` to `indptr[j + 1]`.
+        """
+        if self._indptr is None:
+            self._indptr = numpy.searchsorted(self.postsynaptic_index,
+                                              numpy.arange(self.n_post + 1))
+        return self._indptr
+
+    def _reserve(self, n):
+        """Make sure the arrays have room for `n` connections."""
+        capacity = self._pre.size
+        if n <= capacity:
+            return
+        while capacity < n:
+            capacity *= 2
+        def grow(array):
+            new_array = numpy.empty((capacity,), dtype=array.dtype)
+            new_array[:self._n] = array[:self._n]
+            return new_array
+        self._pre = grow(self._pre)
+        self._post = grow(self._post)
+        for name, values in self._parameters.items():
+            self._parameters[name] = grow(values)
+
+    def add(self, presynaptic_indices, postsynaptic_indices, **connection_parameters):
+        """
+        Add connections, given in coordinate (COO) format. Each connection
+        parameter is either a single value or an array with one value per
+        connection. Parameters which are not given for these connections are
+        set to NaN.
+        """
+        presynaptic_indices = numpy.asarray(presynaptic_indices, dtype=int).ravel()
+        postsynaptic_indices = numpy.asarray(postsynaptic_indices, dtype=int).ravel()
+        n = presynaptic_indices.size
+        if n == 0:
+            return
+        start, stop = self._n, self._n + n
+        self._reserve(stop)
+        for name in connection_parameters:
+            if name not in self._parameters:
+                values = numpy.empty((self._pre.size,), dtype=float)
+                values[:start] = numpy.nan
+                self._parameters[name] = values
+        self._pre[start:stop] = presynaptic_indices
+        self._post[start:stop] = postsynaptic_indices
+        for name, values in self._parameters.items():
+            values[start:stop] = connection_parameters.get(name, numpy.nan)
+        in_order = (numpy.all(postsynaptic_indices[1:] >= postsynaptic_indices[:-1])
+                    and (start == 0 or postsynaptic_indices[0] >= self._post[start - 1]))
+        self._n = stop
+        self._sorted = self._sorted and in_order
+        self._indptr = None
+
+    def _sort(self):
+        """
+        Sort the connections by post-synaptic index, keeping their order within
+        each row, if connections have been added out of order since the last
+        sort.
+        """
+        if self._sorted:
+            return
+        n = self._n
+        order = numpy.argsort(self._post[:n], kind='mergesort')
+        self._pre[:n] = self._pre[:n][order]
+        self._post[:n] = self._post[:n][order]
+        for values in self._parameters.values():
+            values[:n] = values[:n][order]
+        self._sorted = True
+
+    def set(self, name, values, indices=slice(None)):
+        """
+        Set the values of parameter `name` for all connections, or for the
+        connections at positions `indices`, from a single value or an array
+        with one value per connection.
+        """
+        if name not in self._parameters:
+            self._parameters[name] = numpy.nan * numpy.ones((self._pre.size,))
+        self._sort()
+        self._parameters[name][:self._n][indices] = values
+
+    def as_list(self, *names):
+        """
+        Return a list of tuples, one per connection, containing the indices or
+        parameter values given by `names`.
+        """
+        return zip(*[self.column(name).tolist() for name in names])
+
+    def as_arrays(self, n_pre, *names):
+        """
+        Return a list of 2D arrays with shape `(n_pre, n_post)`, one for each
+        parameter in `names`, containing the value for the connection from the
+        ith to the jth cell, NaN where there is no connection and the sum of
+        the values where there are multiple connections.
+        """
+        return [_coo_to_dense((n_pre, self.n_post), self.presynaptic_index,
+                              self.postsynaptic_index, self.parameter(name))
+                for name in names]
@@ -12,15 +12,20 @@ from __future__ import division
 from pyNN.random import RandomDistribution, AbstractRNG, NumpyRNG
 from pyNN.common.populations import is_conductance
 from pyNN.core import IndexBasedExpression
-from pyNN import errors, descriptions
+from pyNN import errors, descriptions, recording
 from pyNN.recording import files
-from pyNN.parameters import LazyArray
+from pyNN.parameters import LazyArray, ParameterSpace
+from pyNN.space import Space, CellList
+from pyNN.caching import ConnectionCache, Uncacheable, rng_state, restore_rng_state
 from pyNN.standardmodels import StandardSynapseType
 import numpy
-from itertools import izip, repeat
+from itertools import izip, repeat, islice
+from multiprocessing.pool import ThreadPool
+import collections
 import logging
 from copy import copy, deepcopy
 
+from lazyarray import larray, VectorizedIterable
 from lazyarray import arccos, arcsin, arctan, arctan2, ceil, cos, cosh, exp, \
                       fabs, floor, fmod, hypot, ldexp, log, log10, modf, power, \
                       sin, sinh, sqrt, tan, tanh, maximum, minimum
@@ -32,6 +37,12 @@ try:
 except ImportError:
     haveCSA = False
 
+try:
+    import scipy.sparse
+    have_scipy = True
+except ImportError:
+    have_scipy = False
+
 logger = logging.getLogger("PyNN")
 
 
@@ -44,6 +55,55 @@ def _get_rng(rng):
         raise Exception("rng must be either None, or a subclass of pyNN.random.AbstractRNG")
 
 
+class _DryRunSynapseType(object):
+    """
+    Stand-in for a synapse type with no synaptic parameters, so that a
+    connector can determine its connections without evaluating parameter
+    values (and without drawing random numbers for them).
+    """
+
+    def __init__(self, parameter_names=('weight', 'delay')):
+        self.parameter_names = list(parameter_names)
+
+    @property
+    def native_parameters(self):
+        return ParameterSpace({})
+
+    parameter_space = native_parameters
+
+    def get_parameter_names(self):
+        return self.parameter_names
+
+
+class _DryRunProjection(object):
+    """
+    Stand-in for a `Projection`, which counts the connections made to each
+    post-synaptic cell by a connector instead of creating them.
+    """
+
+    def __init__(self, pre, post, space, synapse_type=None):
+        self.pre = pre
+        self.post = post
+        self.space = space
+        names = synapse_type and synapse_type.get_parameter_names() or ('weight', 'delay')
+        self.synapse_type = _DryRunSynapseType(names)
+        self.label = "dry run"
+        self._simulator = post._simulator
+        self.counts = numpy.zeros((post.size,), dtype=int)
+
+    @property
+    def shape(self):
+        return (self.pre.size, self.post.size)
+
+    def _connect_block(self, presynaptic_indices, postsynaptic_indices,
+                       **connection_parameters):
+        self.counts += numpy.bincount(postsynaptic_indices, minlength=self.post.size)
+
+    def _convergent_connect(self, presynaptic_indices, postsynaptic_index,
+                            **connection_parameters):
+        self.counts[postsynaptic_index] += numpy.size(presynaptic_indices)
+
+
 class Connector(object):
     """
     Base class for connectors.
@@ -75,6 +135,96 @@ class Connector(object):
             P[name] = getattr(self, name)
         return P
 
+    def estimate(self, pre, post, space=None, synapse_type=None):
+        """
+        Estimate the number of connections that this connector would create
+        between the populations `pre` and `post`, and the memory needed to
+        store them, without creating any connections.
+
+        Returns a dict containing:
+            `expected`:
+                the expected total number of connections.
+            `exact`:
+                the exact total number of connections, if it can be
+                determined cheaply, otherwise None.
+            `local`:
+                the expected number of connections on this MPI node.
+            `per_rank`:
+                a list with the expected number of connections on each MPI
+                node, given the distribution of the post-synaptic cells.
+            `parameters`:
+                the names of the values stored for each connection (synaptic
+                parameters and plasticity state variables) given
+                `synapse_type` (weight and delay if it is None).
+            `bytes_per_connection`:
+                the memory needed for each connection, counting 8 bytes for
+                each parameter and each of the two cell indices.
+            `bytes`, `bytes_local`:
+                the memory needed for all connections, and for the connections
+                on this MPI node.
+
+        Simple connectors use analytic formulae, distance-dependent connectors
+        evaluate the connection probability for a random sample of pairs of
+        cells, and other connectors are run without creating the connections.
+        """
+        if space is None:
+            space = Space()
+        projection = _DryRunProjection(pre, post, space, synapse_type)
+        counts, exact = self._estimate_connections(projection)
+        local = counts[post._mask_local].sum()
+        state = post._simulator.state
+        if state.num_processes > 1:
+            # each node fills in its own element, so the sum contains all of them
+            local_counts = numpy.zeros((state.num_processes,))
+            local_counts[state.mpi_rank] = local
+            per_rank = recording.mpi_sum(local_counts).tolist()
+        else:
+            per_rank = [local]
+        expected = sum(per_rank)
+        if synapse_type is None:
+            parameters = ['weight', 'delay']
+        else:
+            parameters = list(synapse_type.get_parameter_names())
+            for component in (synapse_type,
+                              getattr(synapse_type, 'timing_dependence', None),
+                              getattr(synapse_type, 'weight_dependence', None)):
+                if component is not None:
+                    parameters.extend(name for name in component.default_initial_values
+                                      if name not in parameters)
+        bytes_per_connection = 8 * (2 + len(parameters))
+        return {
+            'expected': expected,
+            'exact': int(round(expected)) if exact else None,
+            'local': local,
+            'per_rank': per_rank,
+            'parameters': parameters,
+            'bytes_per_connection': bytes_per_connection,
+            'bytes': expected * bytes_per_connection,
+            'bytes_local': local * bytes_per_connection,
+        }
+
+    def _estimate_connections(self, projection):
+        """
+        Return an array containing the (expected) number of connections to
+        each post-synaptic cell of `projection`, which need only be valid for
+        the local cells, and a flag indicating whether these are exact.
+
+        This default implementation runs the connector with a projection that
+        counts the connections, restoring the state of the random number
+        generators afterwards. Sub-classes should override it with something
+        cheaper where possible.
+        """
+        rngs = [value for value in self.__dict__.values() if isinstance(value, AbstractRNG)]
+        rngs.extend(value.rng for value in self.__dict__.values()
+                    if isinstance(value, RandomDistribution))
+        states = [deepcopy(rng_state(rng)) for rng in rngs]
+        try:
+            self.connect(projection)
+        finally:
+            for rng, state in zip(rngs, states):
+                restore_rng_state(rng, state)
+        return projection.counts, True
+
     def _generate_distance_map(self, projection):
         position_generators = (projection.pre.position_generator,
                                projection.post.position_generator)
@@ -102,10 +252,12 @@ class Connector(object):
                     # Assumes map is a function of index and hence requires the projection to
                     # determine its value. It and its index function are copied so as to be able
                     # to set the projection without altering the connector, which would perhaps
-                    # not be expected from the 'connect' call.
+                    # not be expected from the 'connect' call. Blocks of the
+                    # map are evaluated with the expression's evaluate_block().
                     new_map = copy(map)
-                    new_map.base_value = copy(map.base_value)
-                    new_map.base_value.projection = projection
+                    expression = copy(map.base_value)
+                    expression.projection = projection
+                    new_map.base_value = expression.evaluate
                     parameter_space[name] = new_map
                 else:
                     # Assumes map is a function of distance
@@ -133,13 +285,33 @@ class MapConnector(Connector):
     containing either the (boolean) connectivity matrix (aka adjacency matrix, connection set mask, etc.)
     or the values of a synaptic connection parameter.
     """
+    # Connection maps are evaluated for blocks of post-synaptic cells, each
+    # block containing at most this number of elements of the connection
+    # matrix. If zero or None, maps are evaluated one post-synaptic cell at a time.
+    max_block_elements = 1000000
+    # Number of threads used to evaluate the blocks of a connection map and of
+    # the synaptic parameters. Threads are only used if all random numbers are
+    # drawn from addressable RNGs (see CounterBasedRNG), so that the result
+    # does not depend on the order in which the blocks are evaluated.
+    threads = 1
+    # Number of pairs of cells, and seed, used by connectors which estimate
+    # the number of connections by sampling (see Connector.estimate())
+    estimate_samples = 100000
+    estimate_seed = 853274
+
+    def _parallel_safe(self, projection, sequential_rng=False):
+        # `sequential_rng` should be True if the connector draws numbers from
+        # `self.rng` in sequence, rather than through a lazy array, in which
+        # case an addressable RNG does not allow skipping non-local columns.
+        return (projection.synapse_type.native_parameters.parallel_safe
+                or hasattr(self, "rng") and self.rng.parallel_safe
+                   and (sequential_rng or not self.rng.addressable))
 
     def _standard_connect(self, projection, connection_map_generator, distance_map=None):
 
         column_indices = numpy.arange(projection.post.size)
 
-        if (projection.synapse_type.native_parameters.parallel_safe
-            or hasattr(self, "rng") and self.rng.parallel_safe):
+        if self._parallel_safe(projection):
 
             # If any of the synapse parameters are based on parallel-safe random number generators,
             # we need to iterate over all post-synaptic cells, so we can generate then
@@ -196,6 +368,279 @@ class MapConnector(Connector):
                     if self.callback:
                         self.callback(count/projection.post.local_size)
 
+    def _block_connect(self, projection, connection_map, distance_map=None):
+        """
+        Create connections according to a connection map, evaluating the map
+        and the synaptic parameters for blocks of post-synaptic cells, and
+        passing each block of connections to `projection._connect_block()`.
+        """
+        mask = projection.post._mask_local
+        parallel_safe = self._parallel_safe(projection)
+        block_size = self._block_size(projection)
+        parameter_space = self._parameters_from_synapse_type(projection, distance_map)
+        if self.threads > 1 and not parallel_safe:
+            if self._prepare_threads(connection_map, parameter_space):
+                self._threaded_block_connect(projection, connection_map, parameter_space,
+                                             block_size)
+                return
+            logger.debug("Random numbers are drawn in sequence, connecting with a single thread.")
+        if parallel_safe:
+            # as for _standard_connect(), we evaluate all columns, so that the
+            # random numbers for the non-local nodes are drawn and thrown away
+            blocks = connection_map.by_column_block(block_size)
+        else:
+            blocks = connection_map.by_column_block(block_size, mask)
+
+        def connection_blocks():
+            for columns, source_mask in blocks:
+                connections = self._block_connections(projection, columns, source_mask)
+                if connections is not None:
+                    yield (columns,) + connections
+
+        self._connect_blocks(projection, connection_blocks(), parallel_safe,
+                             parameter_space=parameter_space)
+
+    def _block_connections(self, projection, columns, source_mask):
+        """
+        Convert a block of a connection map to arrays `(sources, targets)` of
+        connection indices, or None if there are no connections.
+
+        `columns`: indices of the post-synaptic neurons in this block
+        `source_mask`: boolean numpy array, with one column per post-synaptic neuron,
+                       or a single boolean, meaning connect to all/none of the pre-synaptic neurons
+        """
+        if isinstance(source_mask, numpy.ndarray):
+            target_positions, sources = source_mask.T.nonzero()
+            targets = columns[target_positions]
+        elif source_mask:
+            sources = numpy.tile(numpy.arange(projection.pre.size), columns.size)
+            targets = numpy.repeat(columns, projection.pre.size)
+        else:
+            return None
+        return sources, targets
+
+    def _evaluate_parameters(self, parameter_space, sources, targets):
+        """
+        Evaluate the lazy arrays containing the synaptic parameters for the
+        connections given by the index arrays `sources` and `targets`.
+        """
+        connection_parameters = {}
+        for name, map in parameter_space.items():
+            if map.is_homogeneous:
+                connection_parameters[name] = map.evaluate(simplify=True)
+            else:
+                connection_parameters[name] = map[sources, targets]
+        return connection_parameters
+
+    def _prepare_threads(self, connection_map, parameter_space):
+        """
+        Return True if blocks of `connection_map` and of the maps in
+        `parameter_space` may be evaluated in any order, in separate threads.
+        """
+        maps = [connection_map] + [map for name, map in parameter_space.items()]
+        components = []
+        for map in maps:
+            stack = [map]
+            while stack:
+                component = stack.pop(0)
+                components.append(component)
+                stack.extend(arg for f, arg in component.operations
+                             if isinstance(arg, larray))
+        for component in components:
+            if isinstance(component.base_value, collections.Iterator):
+                return False
+            if isinstance(component.base_value, VectorizedIterable):
+                if not (isinstance(component, LazyArray) and component._addressable):
+                    return False
+        return True
+
+    def _threaded_block_connect(self, projection, connection_map, parameter_space, block_size):
+        """
+        Evaluate blocks of local post-synaptic cells in a pool of `threads`
+        threads, and create the connections in the main thread, in order.
+        """
+        columns = numpy.flatnonzero(projection.post._mask_local)
+        blocks = [columns[start:start + block_size]
+                  for start in xrange(0, columns.size, block_size)]
+        logger.debug("Evaluating %d blocks in %d threads" % (len(blocks), self.threads))
+
+        def evaluate_block(columns):
+            source_mask = connection_map._partially_evaluate((slice(None), columns), simplify=True)
+            connections = self._block_connections(projection, columns, source_mask)
+            if connections is None:
+                return None
+            sources, targets = connections
+            return sources, targets, self._evaluate_parameters(parameter_space, sources, targets)
+
+        pool = ThreadPool(self.threads)
+        try:
+            # at most two blocks per thread are held in memory at any time
+            pending = collections.deque()
+            n_local = 0
+            for k, columns in enumerate(blocks):
+                pending.append((columns, pool.apply_async(evaluate_block, (columns,))))
+                last = (k == len(blocks) - 1)
+                while pending and (last or len(pending) >= 2 * self.threads):
+                    columns, result = pending.popleft()
+                    result = result.get()
+                    if result is not None and result[0].size > 0:
+                        sources, targets, connection_parameters = result
+                        projection._connect_block(sources, targets, **connection_parameters)
+                    if self.callback:
+                        n_local += columns.size
+                        self.callback(n_local/projection.post.local_size)
+        finally:
+            pool.close()
+            pool.join()
+
+    def _block_size(self, projection):
+        """Number of post-synaptic cells to handle in each block."""
+        return max(1, (self.max_block_elements or 1) // max(projection.pre.size, 1))
+
+    def _connect_blocks(self, projection, blocks, parallel_safe, distance_map=None,
+                        parameter_space=None):
+        """
+        Create connections from an iterator over blocks of connections, each
+        given as `(columns, sources, targets)`, where `columns` contains the
+        indices of the post-synaptic cells handled in the block and `sources`
+        and `targets` are arrays of connection indices (COO format), sorted by
+        target.
+
+        A block may have a fourth element, a dict containing the values of the
+        synaptic parameters for its connections, in which case these values
+        are used instead of those given by `parameter_space`.
+
+        If `parallel_safe` is True, the blocks should contain connections to
+        all post-synaptic cells, so that random numbers for synaptic parameters
+        are drawn identically on all MPI nodes. Connections to non-local cells
+        are then thrown away.
+        """
+        mask = projection.post._mask_local
+        if parameter_space is None:
+            parameter_space = self._parameters_from_synapse_type(projection, distance_map)
+
+        n_local = 0
+        for block in blocks:
+            columns, sources, targets = block[:3]
+            if sources.size > 0:
+                if len(block) > 3:
+                    connection_parameters = dict(block[3])
+                else:
+                    connection_parameters = self._evaluate_parameters(parameter_space, sources, targets)
+
+                if parallel_safe:
+                    local = mask[targets]
+                    if not local.all():
+                        sources = sources[local]
+                        targets = targets[local]
+                        for name, value in connection_parameters.items():
+                            if isinstance(value, numpy.ndarray) and value.ndim > 0:
+                                connection_parameters[name] = value[local]
+                if sources.size > 0:
+                    projection._connect_block(sources, targets, **connection_parameters)
+            # progress is counted in local post-synaptic cells, including
+            # those which receive no connections
+            if self.callback and mask[columns].any():
+                n_local += mask[columns].sum()
+                self.callback(n_local/projection.post.local_size)
+
+    def _sparse_connection_blocks(self, projection, columns, indptr, indices, nonzero=None):
+        """
+        Iterate over blocks of connections, in the form used by
+        :meth:`_connect_blocks`, given compressed sparse column (CSC) index
+        arrays. `nonzero`, if given, is a boolean array with one element per
+        stored entry, indicating which entries are connections.
+        """
+        block_size = self._block_size(projection)
+        for start in xrange(0, columns.size, block_size):
+            block = columns[start:start + block_size]
+            first = indptr[block]
+            counts = indptr[block + 1] - first
+            entries = (numpy.arange(counts.sum())
+                       - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+                       + numpy.repeat(first, counts))
+            sources = indices[entries]
+            targets = numpy.repeat(block, counts)
+            if nonzero is not None:
+                keep = nonzero[entries]
+                sources, targets = sources[keep], targets[keep]
+            yield block, sources, targets
+
+    def _connect_sparse(self, projection, matrix):
+        """
+        Create a connection for each non-zero element of the SciPy sparse
+        matrix `matrix`, with shape (pre.size, post.size). Memory use is
+        proportional to the number of non-zero elements.
+        """
+        if matrix.shape != projection.shape:
+            raise ValueError("Connection matrix has shape %s, projection has shape %s"
+                             % (matrix.shape, projection.shape))
+        matrix = matrix.tocsc()
+        if not matrix.has_sorted_indices:
+            matrix = matrix.sorted_indices()
+        parallel_safe = self._parallel_safe(projection)
+        if parallel_safe:
+            columns = numpy.arange(projection.post.size)
+        else:
+            columns = numpy.flatnonzero(projection.post._mask_local)
+        blocks = self._sparse_connection_blocks(projection, columns, matrix.indptr,
+                                                matrix.indices, matrix.data != 0)
+        self._connect_blocks(projection, blocks, parallel_safe)
+
+    def _filter_self_connections(self, projection, sources, targets, *values):
+        """
+        Remove the connections that are excluded by `allow_self_connections`
+        from the connection index arrays `sources` and `targets`, and from any
+        arrays in `values` that accompany them.
+        """
+        arrays = (sources, targets) + values
+        if projection.pre == projection.post:
+            if not self.allow_self_connections:
+                keep = sources != targets
+                arrays = tuple(a[keep] for a in arrays)
+            elif self.allow_self_connections == 'NoMutual':
+                keep = sources > targets
+                arrays = tuple(a[keep] for a in arrays)
+        return arrays
+
+    def _candidates(self, projection):
+        """
+        Return the number of potential pre-synaptic partners of each
+        post-synaptic cell, given `allow_self_connections`.
+        """
+        n_pre = projection.pre.size
+        candidates = numpy.repeat(n_pre, projection.post.size)
+        allow_self_connections = getattr(self, "allow_self_connections", True)
+        if projection.pre == projection.post:
+            if not allow_self_connections:
+                candidates -= 1
+            elif allow_self_connections == 'NoMutual':
+                candidates = n_pre - 1 - numpy.arange(projection.post.size)
+        return candidates
+
+    def _sampled_estimate(self, projection, probability):
+        """
+        Estimate the number of connections to each post-synaptic cell from the
+        connection probability `probability(sources, targets)` of a random
+        sample of `estimate_samples` pairs of cells with local targets.
+        The expected number of connections is spread uniformly over the local
+        cells.
+        """
+        counts = numpy.zeros((projection.post.size,))
+        columns = numpy.flatnonzero(projection.post._mask_local)
+        if columns.size == 0 or projection.pre.size == 0:
+            return counts
+        # a separate generator, so as not to change the state of `self.rng`
+        rng = numpy.random.RandomState(self.estimate_seed)
+        sources = rng.randint(0, projection.pre.size, self.estimate_samples)
+        targets = columns[rng.randint(0, columns.size, self.estimate_samples)]
+        sources, targets = self._filter_self_connections(projection, sources, targets)
+        p = numpy.zeros((self.estimate_samples,))
+        if sources.size > 0:
+            p[:sources.size] = probability(sources, targets)
+        counts[columns] = p.mean() * projection.pre.size
+        return counts
+
     def _connect_with_map(self, projection, connection_map, distance_map=None):
         """
         Create connections according to a connection map.
@@ -210,7 +655,10 @@ class MapConnector(Connector):
                 TODO
         """
         logger.debug("Connecting %s using a connection map" % projection.label)
-        self._standard_connect(projection, connection_map.by_column, distance_map)
+        if self.max_block_elements:
+            self._block_connect(projection, connection_map, distance_map)
+        else:
+            self._standard_connect(projection, connection_map.by_column, distance_map)
 
 
 class AllToAllConnector(MapConnector):
@@ -246,6 +694,9 @@ class AllToAllConnector(MapConnector):
             connection_map = LazyArray(True, shape=projection.shape)
         self._connect_with_map(projection, connection_map)
 
+    def _estimate_connections(self, projection):
+        return self._candidates(projection), True
+
 
 class FixedProbabilityConnector(MapConnector):
     """
@@ -263,11 +714,23 @@ class FixedProbabilityConnector(MapConnector):
             or only to other neurons in the Population.
         `rng`:
             an :class:`RNG` instance used to evaluate whether connections exist
+        `sparse`:
+            if True, rather than drawing one random number for every possible
+            connection, the gaps between successive connections (in
+            column-major order, i.e. looping over pre-synaptic cells for each
+            post-synaptic cell in turn) are drawn from a geometric
+            distribution, so that the number of random numbers drawn scales
+            with the number of connections rather than with the size of the
+            connection matrix. This is much faster for small values of
+            `p_connect`, but does not give the same connections as the
+            default method for a given `rng`. If `rng` is parallel safe, all
+            MPI nodes draw the same random numbers, so the connections do
+            not depend on the number of processes.
     """
-    parameter_names = ('allow_self_connections', 'p_connect')
+    parameter_names = ('allow_self_connections', 'p_connect', 'sparse')
 
     def __init__(self, p_connect, allow_self_connections=True,
-                 rng=None, safe=True, callback=None):
+                 rng=None, safe=True, callback=None, sparse=False):
         """
         Create a new connector.
         """
@@ -277,8 +740,15 @@ class FixedProbabilityConnector(MapConnector):
         self.p_connect = float(p_connect)
         assert 0 <= self.p_connect
         self.rng = _get_rng(rng)
+        self.sparse = sparse
 
     def connect(self, projection):
+        if self.sparse:
+            parallel_safe = self._parallel_safe(projection, sequential_rng=True)
+            self._connect_blocks(projection,
+                                 self._sample_connection_blocks(projection, parallel_safe),
+                                 parallel_safe)
+            return
         random_map = LazyArray(RandomDistribution('uniform', (0, 1), rng=self.rng),
                                projection.shape)
         connection_map = random_map < self.p_connect
@@ -289,6 +759,47 @@ class FixedProbabilityConnector(MapConnector):
                 connection_map *= LazyArray(lambda i,j: i > j, shape=projection.shape)
         self._connect_with_map(projection, connection_map)
 
+    def _estimate_connections(self, projection):
+        return self.p_connect * self._candidates(projection), False
+
+    def _sample_connection_blocks(self, projection, parallel_safe):
+        """
+        Generate blocks of connections `(columns, sources, targets)` by
+        geometric skip sampling, treating the connection matrix as a single
+        sequence of Bernoulli trials in column-major order.
+        """
+        n_pre = projection.pre.size
+        columns = numpy.arange(projection.post.size)
+        if not parallel_safe:
+            columns = columns[projection.post._mask_local]
+        if self.p_connect == 0 or n_pre == 0:
+            return
+        block_size = self._block_size(projection)
+        if self.p_connect < 1:
+            log_q = numpy.log1p(-self.p_connect)
+        pending = numpy.zeros((0,), dtype=int)  # sampled positions not yet used
+        last = -1                               # most recently sampled position
+        for start in xrange(0, columns.size, block_size):
+            block = columns[start:start + block_size]
+            end = (start + block.size) * n_pre
+            while last < end - 1:
+                expected = self.p_connect * (end - 1 - last)
+                n_draw = int(expected + 3 * numpy.sqrt(expected)) + 1
+                if self.p_connect < 1:
+                    u = self.rng.next(n_draw, 'uniform', {'low': 0.0, 'high': 1.0}, mask_local=False)
+                    gaps = numpy.floor(numpy.log1p(-u) / log_q).astype(int) + 1
+                else:
+                    gaps = numpy.ones((n_draw,), dtype=int)
+                positions = last + numpy.cumsum(gaps)
+                pending = numpy.hstack((pending, positions))
+                last = positions[-1]
+            n = pending.searchsorted(end)
+            flat_indices = pending[:n] - start * n_pre
+            pending = pending[n:]
+            sources = flat_indices % n_pre
+            targets = block[flat_indices // n_pre]
+            yield (block,) + self._filter_self_connections(projection, sources, targets)
+
 
 class DistanceDependentProbabilityConnector(MapConnector):
     """
@@ -306,17 +817,27 @@ class DistanceDependentProbabilityConnector(MapConnector):
             or only to other neurons in the Population.
         `rng`:
             an :class:`RNG` instance used to evaluate whether connections exist
+        `max_distance`:
+            if given, the connection probability is taken to be zero for cells
+            further apart than this, and a spatial index (see
+            :class:`~pyNN.space.CellList`) is used so that only pairs of cells
+            within `max_distance` of each other are considered, which is much
+            faster when `max_distance` is small compared to the size of the
+            populations. Random numbers are only drawn for these pairs, so the
+            connections are not the same as without `max_distance`, for a
+            given `rng`.
     """
-    parameter_names = ('allow_self_connections', 'd_expression')
+    parameter_names = ('allow_self_connections', 'd_expression', 'max_distance')
 
     def __init__(self, d_expression, allow_self_connections=True,
-                 rng=None, safe=True, callback=None):
+                 rng=None, safe=True, callback=None, max_distance=None):
         """
         Create a new connector.
         """
         Connector.__init__(self, safe, callback)
         assert isinstance(d_expression, str) or callable(d_expression)
         assert isinstance(allow_self_connections, bool) or allow_self_connections == 'NoMutual'
+        assert max_distance is None or max_distance > 0
         try:
             if isinstance(d_expression, str):
                 d = 0; assert 0 <= eval(d_expression), eval(d_expression)
@@ -327,8 +848,15 @@ class DistanceDependentProbabilityConnector(MapConnector):
         self.allow_self_connections = allow_self_connections
         self.distance_function = eval("lambda d: %s" % self.d_expression)
         self.rng = _get_rng(rng)
+        self.max_distance = max_distance
 
     def connect(self, projection):
+        if self.max_distance is not None:
+            parallel_safe = self._parallel_safe(projection, sequential_rng=True)
+            self._connect_blocks(projection,
+                                 self._sample_connection_blocks(projection, parallel_safe),
+                                 parallel_safe)
+            return
         distance_map = self._generate_distance_map(projection)
         probability_map = self.distance_function(distance_map)
         random_map = LazyArray(RandomDistribution('uniform', (0, 1), rng=self.rng),
@@ -341,6 +869,42 @@ class DistanceDependentProbabilityConnector(MapConnector):
                 connection_map *= LazyArray(lambda i,j: i > j, shape=projection.shape)
         self._connect_with_map(projection, connection_map, distance_map)
 
+    def _estimate_connections(self, projection):
+        distance_map = self._generate_distance_map(projection)
+
+        def probability(sources, targets):
+            distances = distance_map[sources, targets]
+            p = self.distance_function(distances) * numpy.ones(distances.shape)
+            if self.max_distance is not None:
+                p[distances > self.max_distance] = 0
+            return p
+        return self._sampled_estimate(projection, probability), False
+
+    def _sample_connection_blocks(self, projection, parallel_safe):
+        """
+        Generate blocks of connections `(columns, sources, targets)`, drawing
+        random numbers only for the pairs of cells within `max_distance` of
+        each other.
+        """
+        columns = numpy.arange(projection.post.size)
+        if not parallel_safe:
+            columns = columns[projection.post._mask_local]
+        index = CellList(projection.pre.positions.T, self.max_distance, projection.space)
+        post_positions = projection.post.positions.T
+        block_size = self._block_size(projection)
+        for start in xrange(0, columns.size, block_size):
+            block = columns[start:start + block_size]
+            sources, target_positions, distances = index.pairs_within(post_positions[block],
+                                                                      self.max_distance)
+            targets = block[target_positions]
+            probabilities = self.distance_function(distances)
+            if sources.size > 0:
+                random_numbers = self.rng.next(sources.size, 'uniform', {'low': 0.0, 'high': 1.0},
+                                               mask_local=False)
+                connected = random_numbers < probabilities
+                sources, targets = sources[connected], targets[connected]
+            yield (block,) + self._filter_self_connections(projection, sources, targets)
+
 
 class IndexBasedProbabilityConnector(MapConnector):
     """
@@ -352,7 +916,9 @@ class IndexBasedProbabilityConnector(MapConnector):
 
         `index_expression`:
             a function that takes the two cell indices as inputs and calculates the
-            probability matrix from it.
+            probability matrix from it. If the expression gives its support
+            (see :class:`~pyNN.core.IndexBasedExpression`), random numbers are
+            only drawn for the pairs of cells within the support.
         `allow_self_connections`:
             if the connector is used to connect a Population to itself, this
             flag determines whether a neuron is allowed to connect to itself,
@@ -380,7 +946,14 @@ class IndexBasedProbabilityConnector(MapConnector):
         # function, which is probably unexpected behaviour.
         index_expression = copy(self.index_expression)
         index_expression.projection = projection
-        probability_map = LazyArray(index_expression, projection.shape)
+        if projection.post.size > 0 and index_expression.support(0) is not None:
+            parallel_safe = self._parallel_safe(projection, sequential_rng=True)
+            self._connect_blocks(projection,
+                                 self._support_connection_blocks(projection, index_expression,
+                                                                 parallel_safe),
+                                 parallel_safe)
+            return
+        probability_map = LazyArray(index_expression.evaluate, projection.shape)
         random_map = LazyArray(RandomDistribution('uniform', (0, 1), rng=self.rng),
                                projection.shape)
         connection_map = random_map < probability_map
@@ -391,6 +964,38 @@ class IndexBasedProbabilityConnector(MapConnector):
                 connection_map *= LazyArray(lambda i,j: i > j, shape=projection.shape)
         self._connect_with_map(projection, connection_map)
 
+    def _support_connection_blocks(self, projection, index_expression, parallel_safe):
+        """
+        Generate blocks of connections `(columns, sources, targets)`, drawing
+        random numbers only for the pairs of cells within the support of
+        `index_expression`, i.e. where the connection probability may be
+        non-zero.
+        """
+        columns = numpy.arange(projection.post.size)
+        if not parallel_safe:
+            columns = columns[projection.post._mask_local]
+        block_size = self._block_size(projection)
+        for start in xrange(0, columns.size, block_size):
+            block = columns[start:start + block_size]
+            candidates = [numpy.asarray(index_expression.support(j), dtype=int) for j in block]
+            sources = numpy.hstack([numpy.zeros((0,), dtype=int)] + candidates)
+            targets = numpy.repeat(block, [c.size for c in candidates])
+            if sources.size > 0:
+                probabilities = index_expression(sources, targets)
+                random_numbers = self.rng.next(sources.size, 'uniform', {'low': 0.0, 'high': 1.0},
+                                               mask_local=False)
+                connected = random_numbers < probabilities
+                sources, targets = sources[connected], targets[connected]
+            yield (block,) + self._filter_self_connections(projection, sources, targets)
+
+    def _estimate_connections(self, projection):
+        index_expression = copy(self.index_expression)
+        index_expression.projection = projection
+
+        def probability(sources, targets):
+            return index_expression(sources, targets) * numpy.ones(sources.shape)
+        return self._sampled_estimate(projection, probability), False
+
 
 class DisplacementDependentProbabilityConnector(IndexBasedProbabilityConnector):
 
@@ -407,9 +1012,40 @@ class DisplacementDependentProbabilityConnector(IndexBasedProbabilityConnector):
             self._disp_function = disp_function
 
         def __call__(self, i, j):
-            disp = (self.projection.post.positions.T[j] - self.projection.pre.positions.T[i]).T
+            # i and j may be integers or arrays of any (matching) shape. The
+            # axis of the displacement components is moved to the front.
+            pre_positions, post_positions = self._positions()
+            disp = numpy.rollaxis(post_positions[j] - pre_positions[i], -1)
             return self._disp_function(disp)
 
+        def evaluate_block(self, i, j):
+            """
+            Evaluate the expression for all pairs of pre-synaptic cells `i` and
+            post-synaptic cells `j` (1D index arrays), returning an array of
+            shape `(i.size, j.size)`.
+
+            The displacements are computed by broadcasting, as a contiguous
+            array of shape `(3, i.size, j.size)`, and `disp_function` is
+            called once for the whole block.
+            """
+            pre_positions, post_positions = self._positions()
+            disp = (post_positions[j].T[:, numpy.newaxis, :]
+                    - pre_positions[i].T[:, :, numpy.newaxis])
+            return self._disp_function(disp)
+
+        def _positions(self):
+            """
+            Return the positions of the pre- and post-synaptic cells as
+            contiguous (N, 3) arrays, which are cached for each projection.
+            """
+            cache = getattr(self, "_position_cache", None)
+            if cache is None or cache[0] is not self.projection:
+                cache = (self.projection,
+                         numpy.ascontiguousarray(self.projection.pre.positions.T),
+                         numpy.ascontiguousarray(self.projection.post.positions.T))
+                self._position_cache = cache
+            return cache[1:]
+
     def __init__(self, disp_function, allow_self_connections=True,
                  rng=None, safe=True, callback=None):
         super(DisplacementDependentProbabilityConnector, self).__init__(
@@ -429,6 +1065,17 @@ class FromListConnector(Connector):
             neuron, `post_idx` is the index of the postsynaptic neuron, and
             p1, p2, etc. are the synaptic parameters (e.g. weight, delay,
             plasticity parameters).
+
+            For very large numbers of connections, `conn_list` may instead be
+            a 2D NumPy array or a structured array (for example a
+            :class:`numpy.memmap`) with one row per connection, or an iterable
+            (e.g. a list or a generator) of such arrays, each containing a
+            chunk of the connection list. These are not copied, but are read
+            and connected one chunk at a time. A generator can only be used
+            to connect a single projection. For a structured array, the
+            fields are taken in order as `pre_idx`, `post_idx`, `p1`, etc., and
+            the names of the parameter fields are used if `column_names` is
+            not given.
         `column_names`:
             the names of the parameters p1, p2, etc. If not provided, it is
             assumed the parameters are 'weight', 'delay' (for backwards
@@ -440,6 +1087,8 @@ class FromListConnector(Connector):
             if True, display a progress bar on the terminal.
     """
     parameter_names = ('conn_list',)
+    # number of rows read at once from an array connection list
+    chunk_size = 1000000
 
     def __init__(self, conn_list, column_names=None, safe=True, callback=None):
         """
@@ -447,53 +1096,106 @@ class FromListConnector(Connector):
         """
         # needs extending for dynamic synapses.
         Connector.__init__(self, safe=safe, callback=callback)
-        self.conn_list = numpy.array(conn_list)
+        if isinstance(conn_list, numpy.ndarray):
+            self.conn_list = conn_list
+            if conn_list.dtype.names:
+                column_names = column_names or conn_list.dtype.names[2:]
+                n_columns = len(conn_list.dtype.names)
+            else:
+                n_columns = conn_list.shape[-1]
+        elif isinstance(conn_list, (list, tuple)) and not self._is_chunk_list(conn_list):
+            self.conn_list = numpy.array(conn_list)
+            n_columns = len(conn_list) > 0 and len(conn_list[0]) or None
+        else:
+            self.conn_list = conn_list
+            n_columns = None   # checked when connecting
         self.column_names = column_names or ('weight', 'delay')
-        if len(conn_list) > 0:
-            if len(conn_list[0]) != len(self.column_names) + 2:
-                raise ValueError("connection list has %d parameter columns, but %d column names provided." % (
-                                 len(conn_list[0]) - 2, len(self.column_names)))
+        if n_columns:
+            self._check_columns(n_columns)
+
+    @staticmethod
+    def _is_chunk_list(conn_list):
+        return (len(conn_list) > 0
+                and isinstance(conn_list[0], numpy.ndarray)
+                and (conn_list[0].ndim == 2 or bool(conn_list[0].dtype.names)))
+
+    def _check_columns(self, n_columns):
+        if n_columns != len(self.column_names) + 2:
+            raise ValueError("connection list has %d parameter columns, but %d column names provided." % (
+                             n_columns - 2, len(self.column_names)))
+
+    def _chunks(self):
+        """
+        Iterate over the connection list in chunks, each chunk being a 2D array
+        with one row per connection.
+        """
+        def as_2d(chunk):
+            if chunk.dtype.names:
+                return numpy.column_stack([chunk[name] for name in chunk.dtype.names])
+            return chunk
+        if isinstance(self.conn_list, numpy.ndarray):
+            for start in xrange(0, self.conn_list.shape[0], self.chunk_size):
+                yield as_2d(self.conn_list[start:start + self.chunk_size])
+        else:
+            for chunk in self.conn_list:
+                chunk = as_2d(numpy.asarray(chunk))
+                self._check_columns(chunk.shape[1])
+                yield chunk
 
     def connect(self, projection):
         """Connect-up a Projection."""
-        logger.debug("conn_list (original) = \n%s", self.conn_list)
         synapse_parameter_names = projection.synapse_type.get_parameter_names()
         for name in self.column_names:
             if name not in synapse_parameter_names:
                 raise ValueError("%s is not a valid parameter for %s" % (
                                  name, projection.synapse_type.__class__.__name__))
-        if numpy.any(self.conn_list[:, 0] >= projection.pre.size):
-            raise errors.ConnectionError("source index out of range")
-        # need to do some profiling, to figure out the best way to do this:
-        #  - order of sorting/filtering by local
-        #  - use numpy.unique, or just do in1d(self.conn_list)?
-        idx = numpy.argsort(self.conn_list[:, 1])
-        targets = numpy.unique(self.conn_list[:, 1]).astype(numpy.int)
-        local = numpy.in1d(targets,
-                           numpy.arange(projection.post.size)[projection.post._mask_local],
-                           assume_unique=True)
-        local_targets = targets[local]
-        self.conn_list = self.conn_list[idx]
-        left  = numpy.searchsorted(self.conn_list[:, 1], local_targets, 'left')
-        right = numpy.searchsorted(self.conn_list[:, 1], local_targets, 'right')
-        logger.debug("idx = %s", idx)
-        logger.debug("targets = %s", targets)
-        logger.debug("local_targets = %s", local_targets)
-        logger.debug("conn_list (sorted by target) = \n%s", self.conn_list)
-        logger.debug("left = %s", left)
-        logger.debug("right = %s", right)
-
-        for tgt, l, r in zip(local_targets, left, right):
-            sources = self.conn_list[l:r, 0].astype(numpy.int)
-            connection_parameters = deepcopy(projection.synapse_type.parameter_space)
-            connection_parameters.shape = (r-l,)
+        mask = projection.post._mask_local
+        # a single copy of the synapse parameters serves as a template for all chunks
+        template = deepcopy(projection.synapse_type.parameter_space)
+        for chunk in self._chunks():
+            if chunk.shape[0] == 0:
+                continue
+            if numpy.any(chunk[:, 0] >= projection.pre.size):
+                raise errors.ConnectionError("source index out of range")
+            if numpy.any(chunk[:, 1] >= projection.post.size):
+                raise errors.ConnectionError("target index out of range")
+            # keep only the connections to local cells, and group them by target
+            targets = chunk[:, 1].astype(numpy.int)
+            local = mask[targets]
+            order = numpy.flatnonzero(local)
+            order = order[numpy.argsort(targets[order], kind='mergesort')]
+            if order.size == 0:
+                continue
+            sources = chunk[order, 0].astype(numpy.int)
+            targets = targets[order]
+            connection_parameters = ParameterSpace({}, schema=template.schema,
+                                                   shape=(order.size,),
+                                                   component=template.component)
+            for name, value in template.items():
+                connection_parameters[name] = copy(value)
+            connection_parameters.shape = (order.size,)
             for col, name in enumerate(self.column_names, 2):
-                connection_parameters.update(**{name: self.conn_list[l:r, col]})
+                connection_parameters.update(**{name: chunk[order, col]})
             if isinstance(projection.synapse_type, StandardSynapseType):
                 connection_parameters = projection.synapse_type.translate(
                                             connection_parameters)
             connection_parameters.evaluate()
-            projection._convergent_connect(sources, tgt, **connection_parameters)
+            projection._connect_block(sources, targets, **connection_parameters)
+
+    def _estimate_connections(self, projection):
+        if isinstance(self.conn_list, collections.Iterator):
+            raise NotImplementedError("Cannot estimate the number of connections in a generator "
+                                      "without consuming it")
+        return self._count_targets(projection, self._chunks()), True
+
+    @staticmethod
+    def _count_targets(projection, chunks):
+        """Count the connections to each post-synaptic cell in a connection list."""
+        counts = numpy.zeros((projection.post.size,), dtype=int)
+        for chunk in chunks:
+            if chunk.shape[0] > 0:
+                counts += numpy.bincount(chunk[:, 1].astype(int), minlength=projection.post.size)
+        return counts
 
 
 class FromFileConnector(FromListConnector):
@@ -504,10 +1206,13 @@ class FromFileConnector(FromListConnector):
         `file`:
             either an open file object or the filename of a file containing a
             list of connections, in the format required by `FromListConnector`.
+            Files written with :class:`~pyNN.recording.files.BinaryConnectionFile`
+            (e.g. by `Projection.save()`) are memory-mapped, and each node
+            reads only the connections to its own cells.
         `distributed`:
             if this is True, then each node will read connections from a file
             called `filename.x`, where `x` is the MPI rank. This speeds up
-            loading connections for distributed simulations.
+            loading connections for distributed simulations from text files.
         `safe`:
             if True, check that weights and delays have valid values. If False,
             this check is skipped.
@@ -522,7 +1227,10 @@ class FromFileConnector(FromListConnector):
         """
         Connector.__init__(self, safe=safe, callback=callback)
         if isinstance(file, basestring):
-            file = files.StandardTextFile(file, mode='r')
+            if files.is_binary_connection_file(file):
+                file = files.BinaryConnectionFile(file, mode='r')
+            else:
+                file = files.StandardTextFile(file, mode='r')
         self.file = file
         self.distributed = distributed
 
@@ -535,9 +1243,22 @@ class FromFileConnector(FromListConnector):
         for ignore in "ij":
             if ignore in self.column_names:
                 self.column_names.remove(ignore)
-        self.conn_list = self.file.read()
+        if isinstance(self.file, files.BinaryConnectionFile):
+            local_targets = numpy.flatnonzero(projection.post._mask_local)
+            self.conn_list = self.file.read_targets(local_targets, self.chunk_size)
+        else:
+            self.conn_list = self.file.read()
         FromListConnector.connect(self, projection)
 
+    def _estimate_connections(self, projection):
+        file = self.file
+        if self.distributed:
+            file = type(file)("%s.%d" % (file.name, projection._simulator.state.mpi_rank),
+                              mode='r')
+        if isinstance(file, files.BinaryConnectionFile):
+            return numpy.diff(file.read_index()), True
+        return self._count_targets(projection, [numpy.atleast_2d(file.read())]), True
+
 
 class FixedNumberConnector(MapConnector):
     # base class - should not be instantiated
@@ -562,6 +1283,103 @@ class FixedNumberConnector(MapConnector):
             raise TypeError("n must be an integer or a RandomDistribution object")
         self.rng = _get_rng(rng)
 
+    def _random_integers(self, high):
+        """
+        Return an array of random integers, the i-th being drawn uniformly from
+        `range(high[i])`.
+        """
+        u = self.rng.next(high.size, 'uniform', {'low': 0.0, 'high': 1.0}, mask_local=False)
+        return numpy.minimum(numpy.floor(u * high).astype(int), high - 1)
+
+    def _mean_n(self):
+        """The (expected) number of connections per cell."""
+        if isinstance(self.n, int):
+            return self.n
+        # sample from a copy, so as not to change the state of the generator
+        return numpy.mean(deepcopy(self.n).next(1000))
+
+    def _sample_without_replacement(self, k, m):
+        """
+        For each i, draw `k[i]` distinct integers from `range(m[i])`, where
+        `k[i] <= m[i]`.
+
+        Returns a flat array containing the samples for each i in turn. The work
+        needed is proportional to `k.sum()`: random integers are drawn for all
+        rows at once and duplicates within a row are redrawn until there are
+        none. Where `k[i]` is more than half of `m[i]`, the `m[i] - k[i]`
+        integers that are *not* in the sample are drawn instead.
+        """
+        assert (k <= m).all()
+        complement = k > m // 2
+        n_draw = numpy.where(complement, m - k, k)
+        rows = numpy.repeat(numpy.arange(k.size), n_draw)
+        values = self._random_integers(m[rows])
+        duplicates = numpy.arange(values.size)
+        while duplicates.size > 0:
+            order = numpy.lexsort((values, rows))
+            repeated = ((rows[order][1:] == rows[order][:-1])
+                        & (values[order][1:] == values[order][:-1]))
+            duplicates = order[1:][repeated]
+            if duplicates.size > 0:
+                values[duplicates] = self._random_integers(m[rows[duplicates]])
+        if complement.any():
+            # the rows for which we have drawn the cells to leave out
+            excluded = complement[rows]
+            comp_rows = numpy.flatnonzero(complement)
+            comp_sizes = m[comp_rows]
+            offsets = numpy.cumsum(comp_sizes) - comp_sizes
+            position_in_comp = numpy.cumsum(complement) - 1
+            keep = numpy.ones(comp_sizes.sum(), dtype=bool)
+            keep[offsets[position_in_comp[rows[excluded]]] + values[excluded]] = False
+            all_rows = numpy.repeat(comp_rows, comp_sizes)
+            all_values = numpy.arange(keep.size) - numpy.repeat(offsets, comp_sizes)
+            rows = numpy.hstack((rows[~excluded], all_rows[keep]))
+            values = numpy.hstack((values[~excluded], all_values[keep]))
+            values = values[numpy.argsort(rows, kind='mergesort')]
+        return values
+
+    def _get_num_connections(self, size):
+        """Number of connections for each of `size` cells."""
+        if isinstance(self.n, int):
+            return numpy.repeat(self.n, size)
+        else:
+            return numpy.asarray(self.n.next(size, mask_local=False), dtype=int)
+
+    def _draw_partners(self, cells, n, n_candidates, first_candidate, exclude_self):
+        """
+        For each `cells[k]`, choose `n[k]` partners among the `n_candidates[k]`
+        cells starting at `first_candidate[k]`. If `exclude_self` is True, the
+        candidates are numbered as if `cells[k]` itself was not present.
+
+        Returns two arrays, giving for each connection the index into `cells`
+        and the index of the partner, grouped by cell.
+        """
+        n = numpy.where(n_candidates > 0, n, 0)
+        positions = numpy.arange(cells.size)
+        if self.with_replacement:
+            owners = numpy.repeat(positions, n)
+            partners = self._random_integers(numpy.repeat(n_candidates, n))
+        else:
+            # where n is larger than the number of candidates, first all the
+            # candidates are connected one or more times, then the remainder
+            # are chosen randomly
+            safe_candidates = numpy.maximum(n_candidates, 1)
+            full_sets = n // safe_candidates
+            remainder = n % safe_candidates
+            n_full = full_sets * n_candidates
+            full_partners = numpy.arange(n_full.sum()) - numpy.repeat(numpy.cumsum(n_full) - n_full, n_full)
+            full_partners %= numpy.repeat(safe_candidates, n_full)
+            random_partners = self._sample_without_replacement(remainder, n_candidates)
+            owners = numpy.hstack((numpy.repeat(positions, n_full), numpy.repeat(positions, remainder)))
+            partners = numpy.hstack((full_partners, random_partners)).astype(int)
+            order = numpy.argsort(owners, kind='mergesort')
+            owners, partners = owners[order], partners[order]
+        partners += first_candidate[owners]
+        owners = cells[owners]
+        if exclude_self:
+            partners += (partners >= owners)
+        return owners, partners
+
 
 class FixedNumberPostConnector(FixedNumberConnector):
     """
@@ -585,30 +1403,82 @@ class FixedNumberPostConnector(FixedNumberConnector):
         `allow_self_connections`:
             if the connector is used to connect a Population to itself, this
             flag determines whether a neuron is allowed to connect to itself,
-            or only to other neurons in the Population.
+            or only to other neurons in the Population. If 'NoMutual', a
+            neuron may only connect to neurons with a lower index.
+        `with_replacement`:
+            if True, the post-synaptic neurons are drawn independently, so that
+            the same pair of neurons may be connected more than once even if
+            `n` is less than the size of the post-synaptic population.
         `rng`:
             an :class:`RNG` instance used to evaluate which potential connections
             are created.
     """
 
     def connect(self, projection):
-        raise NotImplementedError()   # the code below is not correct
-        assert self.rng.parallel_safe
-        # this is probably very inefficient, would be better to use
-        # divergent connect
-        shuffle = numpy.array([self.rng.permutation(numpy.arange(projection.post.size))
-                               for i in range(projection.pre.size)])
-        n = self.n
-        if hasattr(self, "rand_distr"):
-            n = self.rand_distr.next(projection.pre.size)
-        f_ij = lambda i,j: shuffle[:, j] < n
-        connection_map = LazyArray(f_ij, projection.shape)
+        # Since the targets of each pre-synaptic cell are spread over all MPI
+        # nodes, all nodes draw the targets for all pre-synaptic cells, keeping
+        # only the connections to local cells unless the synaptic parameters
+        # or `self.rng` are parallel safe, in which case they have to be
+        # evaluated for all connections (in the same order on all nodes).
+        # All nodes must draw the same targets, hence the need for a parallel
+        # safe RNG when there is more than one node.
+        if projection._simulator.state.num_processes > 1 and not self.rng.parallel_safe:
+            raise errors.ConnectionError("FixedNumberPostConnector requires a parallel safe RNG "
+                                         "when running on more than one MPI process.")
+        parallel_safe = self._parallel_safe(projection, sequential_rng=True)
+        mask = projection.post._mask_local
+        n_pre = projection.pre.size
+        n_post = self._get_num_connections(n_pre)
+        all_sources = []
+        all_targets = []
+        rows_per_block = max(1, (self.max_block_elements or 1) // max(n_post.max() if n_pre else 1, 1))
+        for start in xrange(0, n_pre, rows_per_block):
+            rows = numpy.arange(start, min(start + rows_per_block, n_pre))
+            sources, targets = self._draw_targets(projection, rows, n_post[rows])
+            if not parallel_safe:
+                local = mask[targets]
+                sources, targets = sources[local], targets[local]
+            all_sources.append(sources)
+            all_targets.append(targets)
+        sources = numpy.hstack(all_sources).astype(int)
+        targets = numpy.hstack(all_targets).astype(int)
+        # transpose, so as to connect post-synaptic cell by post-synaptic cell
+        order = numpy.argsort(targets, kind='mergesort')
+        sources, targets = sources[order], targets[order]
+        columns = numpy.arange(projection.post.size)
+        if not parallel_safe:
+            columns = columns[mask]
+        block_size = self._block_size(projection)
+
+        def connection_blocks():
+            for start in xrange(0, columns.size, block_size):
+                block = columns[start:start + block_size]
+                first, last = targets.searchsorted((block[0], block[-1] + 1))
+                yield block, sources[first:last], targets[first:last]
+
+        self._connect_blocks(projection, connection_blocks(), parallel_safe)
+
+    def _estimate_connections(self, projection):
+        n = self._mean_n() * projection.pre.size / max(projection.post.size, 1)
+        return numpy.repeat(n, projection.post.size), False
+
+    def _draw_targets(self, projection, rows, n):
+        """
+        Choose `n[k]` post-synaptic cells for each pre-synaptic cell `rows[k]`.
+        Returns the connections as arrays of source and target indices.
+        """
+        size = projection.post.size
+        n_candidates = numpy.repeat(size, rows.size)
+        first_candidate = numpy.zeros_like(rows)
+        exclude_self = False
         if projection.pre == projection.post:
             if not self.allow_self_connections:
-                connection_map *= LazyArray(lambda i,j: i != j, shape=projection.shape)
+                n_candidates -= 1
+                exclude_self = True
             elif self.allow_self_connections == 'NoMutual':
-                connection_map *= LazyArray(lambda i,j: i > j, shape=projection.shape)
-        self._connect_with_map(projection, connection_map)
+                # connections from i to j only for i > j
+                n_candidates = rows.copy()
+        return self._draw_partners(rows, n, n_candidates, first_candidate, exclude_self)
 
 
 class FixedNumberPreConnector(FixedNumberConnector):
@@ -633,7 +1503,13 @@ class FixedNumberPreConnector(FixedNumberConnector):
         `allow_self_connections`:
             if the connector is used to connect a Population to itself, this
             flag determines whether a neuron is allowed to connect to itself,
-            or only to other neurons in the Population.
+            or only to other neurons in the Population. If 'NoMutual', a
+            neuron may only receive connections from neurons with a higher
+            index.
+        `with_replacement`:
+            if True, the pre-synaptic neurons are drawn independently, so that
+            the same pair of neurons may be connected more than once even if
+            `n` is less than the size of the pre-synaptic population.
         `rng`:
             an :class:`RNG` instance used to evaluate which potential connections
             are created.
@@ -687,49 +1563,55 @@ class FixedNumberPreConnector(FixedNumberConnector):
                     else:
                         # TODO: use mask to obtain indices i
                         raise NotImplementedError("allow_self_connections=False currently requires a parallel safe RNG.")
+            self._standard_connect(projection, build_source_masks)
         else:
-            if self.allow_self_connections or projection.pre != projection.post:
-                def build_source_masks(mask=None):
-                    # where n > projection.pre.size, first all pre-synaptic cells
-                    # are connected one or more times, then the remainder
-                    # are chosen randomly
-                    n_pre = self._get_num_pre(projection.post.size, mask)
-                    all_cells = numpy.arange(projection.pre.size)
-                    for n in n_pre:
-                        full_sets = n // projection.pre.size
-                        remainder = n % projection.pre.size
-                        source_sets = []
-                        if full_sets > 0:
-                            source_sets = [all_cells]*full_sets
-                        if remainder > 0:
-                            source_sets.append(self.rng.permutation(all_cells)[:remainder])
-                        sources = numpy.hstack(source_sets)
-                        assert sources.size == n
-                        yield sources
-            else:
-                def build_source_masks(mask=None):
-                    # where n > projection.pre.size, first all pre-synaptic cells
-                    # are connected one or more times, then the remainder
-                    # are chosen randomly
-                    n_pre = self._get_num_pre(projection.post.size, mask)
-                    all_cells = numpy.arange(projection.pre.size)
-                    if self.rng.parallel_safe or mask is None:
-                        for i, n in enumerate(n_pre):
-                            full_sets = n // (projection.pre.size - 1)
-                            remainder = n % (projection.pre.size - 1)
-                            allowed_cells = all_cells[all_cells != i]
-                            source_sets = []
-                            if full_sets > 0:
-                                source_sets = [allowed_cells]*full_sets
-                            if remainder > 0:
-                                source_sets.append(self.rng.permutation(allowed_cells)[:remainder])
-                            sources = numpy.hstack(source_sets)
-                            assert sources.size == n
-                            yield sources
-                    else:
-                        raise NotImplementedError("allow_self_connections=False currently requires a parallel safe RNG.")
+            self._sample_connect(projection)
 
-        self._standard_connect(projection, build_source_masks)
+    def _sample_connect(self, projection):
+        """
+        Create connections without replacement, drawing the sources for blocks
+        of post-synaptic cells at once.
+        """
+        parallel_safe = self._parallel_safe(projection, sequential_rng=True)
+        mask = projection.post._mask_local
+        columns = numpy.arange(projection.post.size)
+        if parallel_safe:
+            n_pre = self._get_num_pre(projection.post.size)
+        else:
+            n_pre = self._get_num_pre(projection.post.size, mask)
+            columns = columns[mask]
+        n_pre = numpy.fromiter(n_pre, dtype=int, count=columns.size)
+        block_size = max(1, (self.max_block_elements or 1) // max(n_pre.max() if columns.size else 1, 1))
+
+        def connection_blocks():
+            for start in xrange(0, columns.size, block_size):
+                block = columns[start:start + block_size]
+                targets, sources = self._draw_sources(projection, block, n_pre[start:start + block_size])
+                yield block, sources, targets
+
+        self._connect_blocks(projection, connection_blocks(), parallel_safe)
+
+    def _estimate_connections(self, projection):
+        return numpy.repeat(self._mean_n(), projection.post.size), isinstance(self.n, int)
+
+    def _draw_sources(self, projection, columns, n):
+        """
+        Choose `n[k]` pre-synaptic cells for each post-synaptic cell `columns[k]`.
+        Returns the connections as arrays of target and source indices.
+        """
+        size = projection.pre.size
+        n_candidates = numpy.repeat(size, columns.size)
+        first_candidate = numpy.zeros_like(columns)
+        exclude_self = False
+        if projection.pre == projection.post:
+            if not self.allow_self_connections:
+                n_candidates -= 1
+                exclude_self = True
+            elif self.allow_self_connections == 'NoMutual':
+                # connections from i to j only for i > j
+                n_candidates = size - 1 - columns
+                first_candidate = columns + 1
+        return self._draw_partners(columns, n, n_candidates, first_candidate, exclude_self)
 
 
 class OneToOneConnector(MapConnector):
@@ -747,11 +1629,21 @@ class OneToOneConnector(MapConnector):
         connection_map = LazyArray(lambda i,j: i == j, shape=projection.shape)
         self._connect_with_map(projection, connection_map)
 
+    def _estimate_connections(self, projection):
+        return (numpy.arange(projection.post.size) < projection.pre.size).astype(int), True
+
 
-class SmallWorldConnector(Connector):
+class SmallWorldConnector(MapConnector):
     """
     Connect cells so as to create a small-world network.
 
+    Each post-synaptic cell is first connected to all the pre-synaptic cells
+    within a distance `degree`. Then the pre-synaptic cell of each of these
+    connections is, with probability `rewiring`, replaced by a cell chosen
+    uniformly among all the possible pre-synaptic cells (Watts and Strogatz,
+    1998). Rewiring may occasionally create multiple connections between the
+    same pair of cells.
+
     Takes any of the standard :class:`Connector` optional arguments and, in
     addition:
 
@@ -763,13 +1655,11 @@ class SmallWorldConnector(Connector):
             if the connector is used to connect a Population to itself, this
             flag determines whether a neuron is allowed to connect to itself,
             or only to other neurons in the Population.
-        `n_connections`:
-            if specified, the number of efferent synaptic connections per neuron.
         `rng`:
             an :class:`RNG` instance used to evaluate which connections
             are created.
     """
-    parameter_names = ('allow_self_connections', 'degree', 'rewiring', 'n_connections')
+    parameter_names = ('allow_self_connections', 'degree', 'rewiring')
 
     def __init__(self, degree, rewiring, allow_self_connections=True,
                  n_connections=None, rng=None, safe=True, callback=None):
@@ -777,17 +1667,80 @@ class SmallWorldConnector(Connector):
         Create a new connector.
         """
         Connector.__init__(self, safe, callback)
+        assert degree > 0
         assert 0 <= rewiring <= 1
         assert isinstance(allow_self_connections, bool) or allow_self_connections == 'NoMutual'
+        if n_connections is not None:
+            raise ValueError("SmallWorldConnector does not support n_connections: "
+                             "the number of connections is set by `degree`.")
+        self.degree                 = degree
         self.rewiring               = rewiring
         self.d_expression           = "d < %g" % degree
         self.allow_self_connections = allow_self_connections
-        self.n_connections          = n_connections
         self.rng = _get_rng(rng)
 
     def connect(self, projection):
         """Connect-up a Projection."""
-        raise NotImplementedError
+        parallel_safe = self._parallel_safe(projection, sequential_rng=True)
+        self._connect_blocks(projection,
+                             self._rewired_connection_blocks(projection, parallel_safe),
+                             parallel_safe)
+
+    def _estimate_connections(self, projection):
+        # rewiring does not change the number of connections
+        distance_map = self._generate_distance_map(projection)
+
+        def probability(sources, targets):
+            return distance_map[sources, targets] < self.degree
+        return self._sampled_estimate(projection, probability), False
+
+    def _rewired_connection_blocks(self, projection, parallel_safe):
+        """
+        Generate blocks of connections `(columns, sources, targets)`, finding
+        the neighbourhood of each post-synaptic cell with a spatial index, then
+        rewiring. Two random numbers are drawn for each connection of the
+        lattice, so the result does not depend on the block size.
+        """
+        columns = numpy.arange(projection.post.size)
+        if not parallel_safe:
+            columns = columns[projection.post._mask_local]
+        index = CellList(projection.pre.positions.T, self.degree, projection.space)
+        post_positions = projection.post.positions.T
+        block_size = self._block_size(projection)
+        for start in xrange(0, columns.size, block_size):
+            block = columns[start:start + block_size]
+            sources, target_positions, distances = index.pairs_within(post_positions[block],
+                                                                      self.degree)
+            within = distances < self.degree
+            sources, targets = self._filter_self_connections(projection, sources[within],
+                                                             block[target_positions[within]])
+            if sources.size > 0 and self.rewiring > 0:
+                random_numbers = self.rng.next(2 * sources.size, 'uniform',
+                                               {'low': 0.0, 'high': 1.0},
+                                               mask_local=False).reshape((sources.size, 2))
+                rewired = numpy.flatnonzero(random_numbers[:, 0] < self.rewiring)
+                sources = sources.copy()
+                sources[rewired] = self._random_sources(projection, targets[rewired],
+                                                        random_numbers[rewired, 1])
+            yield block, sources, targets
+
+    def _random_sources(self, projection, targets, uniforms):
+        """
+        Choose new pre-synaptic cells for connections to `targets` from the
+        uniformly distributed numbers `uniforms`, respecting
+        `allow_self_connections`.
+        """
+        n_pre = projection.pre.size
+        if projection.pre == projection.post and not self.allow_self_connections:
+            n_candidates = n_pre - 1
+            sources = numpy.minimum((uniforms * n_candidates).astype(int), n_candidates - 1)
+            return sources + (sources >= targets)
+        elif projection.pre == projection.post and self.allow_self_connections == 'NoMutual':
+            n_candidates = n_pre - 1 - targets
+            sources = numpy.minimum((uniforms * n_candidates).astype(int), n_candidates - 1)
+            return targets + 1 + sources
+        else:
+            return numpy.minimum((uniforms * n_pre).astype(int), n_pre - 1)
 
 
 class CSAConnector(MapConnector):
@@ -801,6 +1754,8 @@ class CSAConnector(MapConnector):
             a connection set object.
     """
     parameter_names = ('cset',)
+    # number of connections taken from the connection set at once
+    chunk_size = 100000
 
     if haveCSA:
         def __init__(self, cset, safe=True, callback=None):
@@ -818,22 +1773,121 @@ class CSAConnector(MapConnector):
 
     def connect(self, projection):
         """Connect-up a Projection."""
-        # Cut out finite part
-        c = csa.cross((0, projection.pre.size-1), (0, projection.post.size-1)) * self.cset  # can't we cut out just the columns we want?
-
+        restrict = self._can_restrict(self.cset)
         if csa.arity(self.cset) == 2:
-            # Connection-set with arity 2
-            for (i, j, weight, delay) in c:
-                projection._convergent_connect([projection.pre[i]], projection.post[j], weight, delay)
+            # Connection-set with arity 2: the values are weights and delays,
+            # and only the connections to local cells are needed.
+            if restrict:
+                columns = numpy.flatnonzero(projection.post._mask_local)
+            else:
+                columns = numpy.arange(projection.post.size)
+            c = self._restrict(projection, columns) * self.cset
+            chunks = self._report_progress(projection, self._chunks(c, 4))
+            list_connector = FromListConnector(chunks, column_names=('weight', 'delay'),
+                                               safe=self.safe)
+            list_connector.connect(projection)
         elif csa.arity(self.cset) == 0:
-            # inefficient implementation as a starting point
-            connection_map = numpy.zeros((projection.pre.size, projection.post.size), dtype=bool)
-            for addr in c:
-                connection_map[addr] = True
-            self._connect_with_map(projection, LazyArray(connection_map))
+            # connections to non-local cells are thrown away by _connect_blocks()
+            parallel_safe = self._parallel_safe(projection) or not restrict
+            if parallel_safe:
+                columns = numpy.arange(projection.post.size)
+            else:
+                columns = numpy.flatnonzero(projection.post._mask_local)
+            c = self._restrict(projection, columns) * self.cset
+            self._connect_blocks(projection, self._connection_blocks(projection, c),
+                                 parallel_safe)
         else:
             raise NotImplementedError
 
+    @staticmethod
+    def _can_restrict(cset):
+        """
+        Return False if the connection set contains a difference of masks.
+        The csa package returns no connections from a difference for a region
+        of the connection matrix which contains none of the subtracted
+        connections, so such connection sets must be evaluated over the whole
+        matrix rather than over the local columns only.
+        """
+        stack, seen = [cset], set()
+        while stack:
+            obj = stack.pop()
+            if id(obj) in seen:
+                continue
+            seen.add(id(obj))
+            if isinstance(obj, csa.connset.MaskDifference):
+                return False
+            stack.extend(value for value in vars(obj).values()
+                         if isinstance(value, csa.csaobject.CSAObject))
+        return True
+
+    @staticmethod
+    def _restrict(projection, columns):
+        """
+        Return a mask containing all pre-synaptic cells and the post-synaptic
+        cells with indices `columns`, as a list of contiguous intervals.
+        """
+        if columns.size == 0:
+            return csa.cross([], [])
+        boundaries = numpy.flatnonzero(numpy.diff(columns) != 1) + 1
+        starts = columns[numpy.hstack(([0], boundaries))]
+        stops = columns[numpy.hstack((boundaries - 1, [columns.size - 1]))]
+        intervals = [(int(start), int(stop)) for start, stop in zip(starts, stops)]
+        return csa.cross((0, projection.pre.size - 1), intervals)
+
+    def _chunks(self, c, n_columns):
+        """
+        Iterate over the finite connection set `c` in chunks, each a 2D array
+        with one row per connection.
+        """
+        iterator = iter(c)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+            yield numpy.array(chunk, dtype=float).reshape((-1, n_columns))
+
+    def _report_progress(self, projection, chunks):
+        """
+        Pass through the chunks of connections, calling the callback, after
+        each chunk has been connected, with the fraction of the local
+        post-synaptic cells which have been dealt with. Connection sets are
+        iterated post-synaptic cell by post-synaptic cell, so these are the
+        cells up to the last target of the chunk.
+        """
+        mask = projection.post._mask_local
+        n_local = 0
+        covered = 0
+        for chunk in chunks:
+            yield chunk
+            if self.callback:
+                last = int(chunk[:, 1].max()) + 1
+                n_local += mask[covered:last].sum()
+                covered = max(covered, last)
+                self.callback(n_local/projection.post.local_size)
+        if self.callback and n_local < projection.post.local_size:
+            self.callback(1.0)  # the remaining cells receive no connections
+
+    def _connection_blocks(self, projection, c):
+        """
+        Generate blocks of connections `(columns, sources, targets)` from the
+        finite mask `c`. Connection sets are iterated post-synaptic cell by
+        post-synaptic cell, so `columns` contains the cells from the end of the
+        previous block to the last target of the block, whether or not they
+        receive connections, and the last block contains the remaining cells.
+        """
+        covered = 0
+        for chunk in self._chunks(c, 2):
+            sources = chunk[:, 0].astype(int)
+            targets = chunk[:, 1].astype(int)
+            order = numpy.argsort(targets, kind='mergesort')
+            sources, targets = sources[order], targets[order]
+            last = max(covered, targets[-1] + 1)
+            yield numpy.arange(covered, last), sources, targets
+            covered = last
+        if covered < projection.post.size:
+            empty = numpy.zeros((0,), dtype=int)
+            yield numpy.arange(covered, projection.post.size), empty, empty
+
 
 class CloneConnector(MapConnector):
     """
@@ -859,9 +1913,28 @@ class CloneConnector(MapConnector):
                                          .format(self.reference_projection.pre,
                                                  self.reference_projection.post,
                                                  projection.pre, projection.post))
-        connection_map = LazyArray(~numpy.isnan(self.reference_projection.get(['weight'], 'array',
-                                                                              gather='all')[0]))
-        self._connect_with_map(projection, connection_map)
+        # Since the post-synaptic populations are the same, the local
+        # connections of the reference projection are those needed here, unless
+        # random numbers must be drawn for the connections on all nodes.
+        parallel_safe = self._parallel_safe(projection)
+        sources, targets = self.reference_projection._gather_attributes_as_coo(
+                                [], gather=parallel_safe and 'all')
+        connections = numpy.column_stack((sources, targets))
+        # compressed sparse column representation, without multapses
+        order = numpy.lexsort((connections[:, 0], connections[:, 1]))
+        connections = connections[order]
+        if connections.shape[0] > 1:
+            distinct = numpy.ones((connections.shape[0],), dtype=bool)
+            distinct[1:] = numpy.any(numpy.diff(connections, axis=0) != 0, axis=1)
+            connections = connections[distinct]
+        indptr = numpy.searchsorted(connections[:, 1], numpy.arange(projection.post.size + 1))
+        if parallel_safe:
+            columns = numpy.arange(projection.post.size)
+        else:
+            columns = numpy.flatnonzero(projection.post._mask_local)
+        blocks = self._sparse_connection_blocks(projection, columns, indptr,
+                                                connections[:, 0])
+        self._connect_blocks(projection, blocks, parallel_safe)
 
 
 class ArrayConnector(MapConnector):
@@ -869,8 +1942,14 @@ class ArrayConnector(MapConnector):
     Provide an explicit boolean connection matrix, with shape (m, n) where m is
     the size of the presynaptic population and n that of the postsynaptic
     population.
+
+    The matrix may also be a SciPy sparse matrix (e.g. in CSR or CSC format),
+    in which case a connection is created for each non-zero element, and
+    memory use is proportional to the number of connections. Synaptic
+    parameter values may be given in the same form, using
+    :class:`SparseMatrixExpression`.
     """
-    parameter_names = ('array')
+    parameter_names = ('array',)
 
     def __init__(self, array, safe=True, callback=None):
         """
@@ -880,5 +1959,199 @@ class ArrayConnector(MapConnector):
         self.array = array
 
     def connect(self, projection):
-        connection_map = LazyArray(self.array, projection.shape)
-        self._connect_with_map(projection, connection_map)
+        if have_scipy and scipy.sparse.issparse(self.array):
+            self._connect_sparse(projection, self.array)
+        else:
+            connection_map = LazyArray(self.array, projection.shape)
+            self._connect_with_map(projection, connection_map)
+
+    def _estimate_connections(self, projection):
+        if have_scipy and scipy.sparse.issparse(self.array):
+            counts = (self.array != 0).sum(axis=0)
+        else:
+            counts = (numpy.asarray(self.array) != 0).sum(axis=0)
+        return numpy.asarray(counts).ravel(), True
+
+
+class SparseMatrixExpression(IndexBasedExpression):
+    """
+    Synaptic parameter values taken from a SciPy sparse matrix (or a dense 2D
+    array), with shape (m, n) where m is the size of the presynaptic
+    population and n that of the postsynaptic population. Use as a synapse
+    parameter, e.g.::
+
+        W = scipy.sparse.csr_matrix(...)
+        prj = Projection(p1, p2, ArrayConnector(W),
+                         StaticSynapse(weight=SparseMatrixExpression(W)))
+    """
+
+    def __init__(self, matrix):
+        if have_scipy and scipy.sparse.issparse(matrix):
+            matrix = matrix.tocsc()
+        self.matrix = matrix
+
+    def __call__(self, i, j):
+        i, j = numpy.broadcast_arrays(i, j)
+        if i.size == 0:
+            return numpy.zeros(i.shape)
+        values = self.matrix[i.ravel(), j.ravel()]
+        return numpy.asarray(values, dtype=float).reshape(i.shape)
+
+    def evaluate_block(self, i, j):
+        if have_scipy and scipy.sparse.issparse(self.matrix):
+            return self.matrix[:, j][i, :].toarray().astype(float)
+        return numpy.asarray(self.matrix, dtype=float)[numpy.ix_(i, j)]
+
+    def support(self, j):
+        if have_scipy and scipy.sparse.issparse(self.matrix):
+            start, stop = self.matrix.indptr[j:j + 2]
+            column = self.matrix.indices[start:stop]
+            return column[self.matrix.data[start:stop] != 0]
+        return numpy.flatnonzero(self.matrix[:, j])
+
+
+class CachedConnector(MapConnector):
+    """
+    Wrap another connector (typically a subclass of :class:`MapConnector` or
+    :class:`FromListConnector`), storing the connections it creates in an
+    on-disk cache, so that the same connections can be re-created quickly in
+    later runs, without generating them again.
+
+    Connections are reused only if the connector, the state of its random
+    number generators, the populations, the space and the synapse type are
+    identical. On reuse, the random number generators are left in the same
+    state as if the connections had been generated.
+
+    Arguments:
+        `connector`:
+            the connector that generates the connections.
+        `cache`:
+            a :class:`~pyNN.caching.ConnectionCache` or the name of the
+            directory in which to store the connections.
+        `safe`:
+            if True, check that weights and delays have valid values. If False,
+            this check is skipped.
+        `callback`:
+            if True, display a progress bar on the terminal.
+
+    Cached connections are re-created in blocks of post-synaptic cells, as
+    determined by `max_block_elements`.
+    """
+    parameter_names = ('connector',)
+
+    def __init__(self, connector, cache, safe=True, callback=None):
+        """
+        Create a new connector.
+        """
+        Connector.__init__(self, safe=safe, callback=callback)
+        assert isinstance(connector, Connector)
+        self.connector = connector
+        if isinstance(cache, basestring):
+            cache = ConnectionCache(cache)
+        self.cache = cache
+
+    def connect(self, projection):
+        """Connect-up a Projection."""
+        try:
+            key, rngs = self.cache.key(self.connector, projection)
+        except Uncacheable, err:
+            logger.warning("Connections of %s cannot be cached: %s" % (projection, err))
+            self.connector.connect(projection)
+            return
+        entry = self.cache.load(key)
+        if entry is None:
+            logger.debug("Connection cache miss for %s" % projection)
+            arrays = self._record(projection)
+            try:
+                self.cache.store(key, arrays, [rng_state(rng) for rng in rngs])
+            except (IOError, OSError), err:
+                logger.warning("Unable to cache connections of %s: %s" % (projection, err))
+        else:
+            logger.debug("Connection cache hit for %s" % projection)
+            arrays, rng_states = entry
+            for rng, state in zip(rngs, rng_states):
+                restore_rng_state(rng, state)
+            self._replay(projection, arrays)
+
+    def _estimate_connections(self, projection):
+        return self.connector._estimate_connections(projection)
+
+    def _record(self, projection):
+        """
+        Connect the projection with the wrapped connector, recording the
+        connections as they are created. Return a dict of arrays.
+        """
+        calls = []
+        depth = [0]
+        connect_block = projection._connect_block
+        convergent_connect = projection._convergent_connect
+
+        def recording_connect_block(presynaptic_indices, postsynaptic_indices,
+                                    **connection_parameters):
+            calls.append((numpy.array(presynaptic_indices), numpy.array(postsynaptic_indices),
+                          connection_parameters))
+            depth[0] += 1
+            try:
+                connect_block(presynaptic_indices, postsynaptic_indices, **connection_parameters)
+            finally:
+                depth[0] -= 1
+
+        def recording_convergent_connect(presynaptic_indices, postsynaptic_index,
+                                         **connection_parameters):
+            if depth[0] == 0:
+                presynaptic_indices = numpy.array(presynaptic_indices)
+                calls.append((presynaptic_indices,
+                              numpy.repeat(postsynaptic_index, presynaptic_indices.size),
+                              dict(connection_parameters)))
+            convergent_connect(presynaptic_indices, postsynaptic_index, **connection_parameters)
+
+        projection._connect_block = recording_connect_block
+        projection._convergent_connect = recording_convergent_connect
+        try:
+            self.connector.connect(projection)
+        finally:
+            del projection._connect_block
+            del projection._convergent_connect
+
+        arrays = {
+            "presynaptic_index": numpy.hstack([numpy.zeros((0,), dtype=int)] + [c[0] for c in calls]),
+            "postsynaptic_index": numpy.hstack([numpy.zeros((0,), dtype=int)] + [c[1] for c in calls]),
+        }
+        names = calls and calls[0][2].keys() or []
+        for name in names:
+            values = [c[2][name] for c in calls]
+            if all(numpy.isscalar(v) for v in values) and len(set(values)) == 1:
+                arrays["parameter_" + name] = numpy.array(values[0])
+            else:
+                arrays["parameter_" + name] = numpy.hstack(
+                    [numpy.repeat(v, c[0].size) if numpy.isscalar(v) else numpy.array(v)
+                     for v, c in zip(values, calls)])
+        return arrays
+
+    def _replay(self, projection, arrays):
+        """Create the connections stored in `arrays`."""
+        # group the connections by target, keeping the order in which they
+        # were created for each target
+        order = numpy.argsort(arrays["postsynaptic_index"], kind='mergesort')
+        sources = arrays["presynaptic_index"][order]
+        targets = arrays["postsynaptic_index"][order]
+        connection_parameters = {}
+        for name, value in arrays.items():
+            if name.startswith("parameter_"):
+                if value.ndim == 0:
+                    value = value.item()
+                else:
+                    value = value[order]
+                connection_parameters[name[len("parameter_"):]] = value
+        columns = numpy.flatnonzero(projection.post._mask_local)
+        block_size = self._block_size(projection)
+
+        def connection_blocks():
+            for start in xrange(0, columns.size, block_size):
+                block = columns[start:start + block_size]
+                first, last = targets.searchsorted((block[0], block[-1] + 1))
+                yield block, sources[first:last], targets[first:last], dict(
+                    (name, value if numpy.isscalar(value) else value[first:last])
+                    for name, value in connection_parameters.items())
+
+        self._connect_blocks(projection, connection_blocks(), False, parameter_space={})
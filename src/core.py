@@ -56,7 +56,22 @@ class IndexBasedExpression(object):
     """
     Abstract base class for general expressions that use the cell indices and projection class to
     determine their value instead of just the the distance between the cells
+
+    Sub-classes must implement `__call__(i, j)`, which is given index arrays
+    of any (matching) shape. They may also provide:
+
+        `evaluate_block(i, j)`:
+            a faster way of evaluating the expression for all pairs of a set
+            of pre-synaptic and a set of post-synaptic cells.
+        `support(j)`:
+            the pre-synaptic cells for which the expression may be non-zero,
+            so that connectors can skip the regions where it is zero.
+        `is_separable`, `pre_factor(i)` and `post_factor(j)`:
+            for expressions which are the product of a function of the
+            pre-synaptic index and a function of the post-synaptic index.
     """
+    # set to True in sub-classes which implement pre_factor() and post_factor()
+    is_separable = False
 
     @property
     def projection(self):
@@ -71,3 +86,55 @@ class IndexBasedExpression(object):
 
     def __call__(self, i, j):
         raise NotImplementedError
+
+    def pre_factor(self, i):
+        """
+        For separable expressions, the factor which depends on the
+        pre-synaptic indices `i`.
+        """
+        raise NotImplementedError
+
+    def post_factor(self, j):
+        """
+        For separable expressions, the factor which depends on the
+        post-synaptic indices `j`.
+        """
+        raise NotImplementedError
+
+    def evaluate_block(self, i, j):
+        """
+        Evaluate the expression for all pairs of pre-synaptic cells `i` and
+        post-synaptic cells `j` (1D index arrays), returning an array of shape
+        `(i.size, j.size)`.
+
+        Separable expressions are evaluated as an outer product, others by
+        calling the expression with index grids.
+        """
+        if self.is_separable:
+            return numpy.outer(self.pre_factor(i), self.post_factor(j))
+        grid_j, grid_i = numpy.meshgrid(j, i)  # meshgrid works on (x,y), not (i,j)
+        return self(grid_i, grid_j) * numpy.ones(grid_i.shape)
+
+    def support(self, j):
+        """
+        Return the indices of the pre-synaptic cells for which the expression
+        may be non-zero for the post-synaptic cell `j`, or None if these are
+        not known.
+        """
+        if self.is_separable:
+            if not numpy.any(self.post_factor(numpy.array([j]))):
+                return numpy.zeros((0,), dtype=int)
+            return numpy.flatnonzero(self.pre_factor(numpy.arange(self.projection.pre.size)))
+        return None
+
+    def evaluate(self, i, j):
+        """
+        Evaluate the expression for index arrays `i` and `j`, as passed by
+        `LazyArray`. The index grids of a block of the connection matrix are
+        recognised and evaluated with `evaluate_block()`.
+        """
+        i, j = numpy.asarray(i), numpy.asarray(j)
+        if (i.ndim == 2 and i.shape == j.shape and i.size > 0
+                and (i == i[:, :1]).all() and (j == j[:1, :]).all()):
+            return self.evaluate_block(i[:, 0], j[0, :])
+        return self(i, j)
@@ -1,7 +1,5 @@
-from itertools import repeat, izip
+import numpy
 from pyNN import common
-from pyNN.core import ezip
-from pyNN.parameters import ParameterSpace
 from pyNN.space import Space
 from . import simulator
 
@@ -11,13 +9,33 @@ class Connection(object):
     Store an individual plastic connection and information about it. Provide an
     interface that allows access to the connection's weight, delay and other
     attributes.
+
+    Connections are lightweight views of the projection's `ConnectionStore`,
+    created on demand.
     """
 
-    def __init__(self, pre, post, **attributes):
-        self.presynaptic_index = pre
-        self.postsynaptic_index = post
-        for name, value in attributes.items():
-            setattr(self, name, value)
+    def __init__(self, store, index):
+        self.__dict__["_store"] = store
+        self.__dict__["_index"] = index
+
+    @property
+    def presynaptic_index(self):
+        return self._store.presynaptic_index[self._index]
+
+    @property
+    def postsynaptic_index(self):
+        return self._store.postsynaptic_index[self._index]
+
+    def __getattr__(self, name):
+        if name in self._store.parameter_names:
+            return self._store.parameter(name)[self._index]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name in self._store.parameter_names:
+            self._store.parameter(name)[self._index] = value
+        else:
+            raise AttributeError("Cannot set attribute %s of a connection" % name)
 
     def as_tuple(self, *attribute_names):
         # should return indices, not IDs for source and target
@@ -30,29 +48,49 @@ class Projection(common.Projection):
 
     def __init__(self, presynaptic_population, postsynaptic_population,
                  connector, synapse_type, source=None, receptor_type=None,
-                 space=Space(), label=None):
+                 space=Space(), label=None, dry_run=False):
         common.Projection.__init__(self, presynaptic_population, postsynaptic_population,
                                    connector, synapse_type, source, receptor_type,
-                                   space, label)
+                                   space, label, dry_run)
 
         ## Create connections
-        self.connections = []
-        connector.connect(self)
+        self._connection_store = common.ConnectionStore(self.post.size)
+        if not dry_run:
+            connector.connect(self)
 
     def __len__(self):
-        return len(self.connections)
+        return len(self._connection_store)
+
+    def __getitem__(self, i):
+        """Return the *i*th connection on the local MPI node."""
+        if isinstance(i, slice):
+            return [Connection(self._connection_store, j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("%d > %d" % (i, len(self) - 1))
+        return Connection(self._connection_store, i)
+
+    @property
+    def connections(self):
+        return iter(self)
+
+    def _set_attributes(self, parameter_space):
+        store = self._connection_store
+        for name, value in parameter_space.items():
+            if value.is_homogeneous:
+                store.set(name, value.evaluate(simplify=True))
+            else:
+                store.set(name, value[store.presynaptic_index, store.postsynaptic_index])
 
-    def set(self, **attributes):
-        #parameter_space = ParameterSpace
-        raise NotImplementedError
+    def _connect_block(self, presynaptic_indices, postsynaptic_indices,
+                       **connection_parameters):
+        self._connection_store.add(presynaptic_indices, postsynaptic_indices,
+                                   **connection_parameters)
 
     def _convergent_connect(self, presynaptic_indices, postsynaptic_index,
                             **connection_parameters):
-        for name, value in connection_parameters.items():
-            if isinstance(value, float):
-                connection_parameters[name] = repeat(value)
-        for pre_idx, other in ezip(presynaptic_indices, *connection_parameters.values()):
-            other_attributes = dict(zip(connection_parameters.keys(), other))
-            self.connections.append(
-                Connection(pre_idx, postsynaptic_index, **other_attributes)
-            )
\ No newline at end of file
+        presynaptic_indices = numpy.asarray(presynaptic_indices, dtype=int)
+        self._connection_store.add(presynaptic_indices,
+                                   numpy.repeat(postsynaptic_index, presynaptic_indices.size),
+                                   **connection_parameters)
@@ -101,6 +101,10 @@ def setup(timestep=0.1, min_delay=0.1, max_delay=10.0, **extra_params):
         a list of seeds, one for each thread on each MPI process
     `rng_seeds_seed`:
         a single seed that will be used to generate random values for `rng_seeds`
+    `record_to_file`:
+        if True, recorded data are written to file by NEST during the
+        simulation, rather than kept in memory, and are read back from disk
+        when retrieved (default False)
     """
     common.setup(timestep, min_delay, max_delay, **extra_params)
     simulator.state.clear()
@@ -110,6 +114,7 @@ def setup(timestep=0.1, min_delay=0.1, max_delay=10.0, **extra_params):
             setattr(simulator.state, key, extra_params[key])
     # set kernel RNG seeds
     simulator.state.num_threads = extra_params.get('threads') or 1
+    simulator.state.record_to_file = extra_params.get('record_to_file', False)
     if 'grng_seed' in extra_params:
         simulator.state.grng_seed = extra_params['grng_seed']
     if 'rng_seeds' in extra_params:
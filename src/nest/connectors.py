@@ -20,7 +20,9 @@ from pyNN.connectors import Connector, \
                             FromListConnector, \
                             FromFileConnector, \
                             CloneConnector, \
-                            ArrayConnector
+                            ArrayConnector, \
+                            SparseMatrixExpression, \
+                            CachedConnector
 
 import nest
 
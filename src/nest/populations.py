@@ -12,7 +12,6 @@ import nest
 import logging
 from pyNN import common, errors
 from pyNN.parameters import Sequence, ParameterSpace, simplify
-from pyNN.random import RandomDistribution
 from pyNN.standardmodels import StandardCellType
 from . import simulator
 from .recording import Recorder, VARIABLE_MAP
@@ -30,11 +29,13 @@ class PopulationMixin(object):
         """
         parameter_space should contain native parameters
         """
-        param_dict = _build_params(parameter_space, numpy.where(self._mask_local)[0])
+        homogeneous, heterogeneous = _build_params(parameter_space, numpy.where(self._mask_local)[0])
         ids = self.local_cells.tolist()
         if hasattr(self.celltype, "uses_parrot") and self.celltype.uses_parrot:
             ids = [id.source for id in ids]
-        nest.SetStatus(ids, param_dict)
+        if homogeneous:
+            nest.SetStatus(ids, homogeneous)
+        _set_heterogeneous_params(ids, heterogeneous)
 
     def _get_parameters(self, *names):
         """
@@ -64,29 +65,44 @@ class PopulationView(common.PopulationView, PopulationMixin):
 
 def _build_params(parameter_space, mask_local, size=None, extra_parameters=None):
     """
-    Return either a single parameter dict or a list of dicts, suitable for use
-    in Create or SetStatus.
+    Return a dict containing the parameters which have the same value for all
+    cells, suitable for use in Create or SetStatus, and a dict containing
+    arrays of the values of the other parameters, with one value per cell
+    (for the cells in `mask_local`, if given), to be set with one SetStatus
+    call per parameter (see `_set_heterogeneous_params()`).
     """
     if size:
         parameter_space.shape = (size,)
-    if parameter_space.is_homogeneous:
-        parameter_space.evaluate(simplify=True)
-        cell_parameters = parameter_space.as_dict()
-        if extra_parameters:
-            cell_parameters.update(extra_parameters)
-        for name, val in cell_parameters.items():
+    homogeneous = {}
+    heterogeneous = {}
+    for name, value in parameter_space.items():
+        if value.is_homogeneous:
+            val = value.evaluate(simplify=True)
             if isinstance(val, Sequence):
-                cell_parameters[name] = val.value
-    else:
-        parameter_space.evaluate(mask=mask_local)
-        cell_parameters = list(parameter_space) # may not be the most efficient way. Might be best to set homogeneous parameters on creation, then inhomogeneous ones using SetStatus. Need some timings.
-        for D in cell_parameters:
-            for name, val in D.items():
-                if isinstance(val, Sequence):
-                    D[name] = val.value
-            if extra_parameters:
-                D.update(extra_parameters)
-    return cell_parameters
+                val = val.value
+            homogeneous[name] = val
+        elif mask_local is None:
+            heterogeneous[name] = value.evaluate()
+        elif value._sequential_parallel_safe:
+            heterogeneous[name] = value.evaluate()[mask_local]  # can't partially evaluate if using parallel safe
+        else:
+            heterogeneous[name] = value[mask_local]
+    if extra_parameters:
+        homogeneous.update(extra_parameters)
+    return homogeneous, heterogeneous
+
+
+def _set_heterogeneous_params(ids, heterogeneous):
+    """
+    Set the parameters in `heterogeneous`, a dict of arrays with one value
+    per cell in `ids`, with one SetStatus call per parameter.
+    """
+    for name, values in heterogeneous.items():
+        if values.dtype == object:  # e.g. Sequences
+            values = make_sli_compatible(list(values))
+        else:
+            values = values.tolist()
+        nest.SetStatus(ids, name, values)
 
 
 class Population(common.Population, PopulationMixin):
@@ -110,26 +126,32 @@ class Population(common.Population, PopulationMixin):
         nest_model = self.celltype.nest_name[simulator.state.spike_precision]
         if isinstance(self.celltype, StandardCellType):
             self.celltype.parameter_space.shape = (self.size,)  # should perhaps do this on a copy?
-            params = _build_params(self.celltype.native_parameters,
-                                   None,
-                                   size=self.size,
-                                   extra_parameters=self.celltype.extra_parameters)
+            homogeneous, heterogeneous = _build_params(self.celltype.native_parameters,
+                                                       None,
+                                                       size=self.size,
+                                                       extra_parameters=self.celltype.extra_parameters)
         else:
-            params = _build_params(self.celltype.parameter_space,
-                                   None,
-                                   size=self.size)
+            homogeneous, heterogeneous = _build_params(self.celltype.parameter_space,
+                                                       None,
+                                                       size=self.size)
         try:
-            self.all_cells = nest.Create(nest_model, self.size, params=params)
+            self.all_cells = nest.Create(nest_model, self.size, params=homogeneous or None)
         except nest.NESTError, err:
             if "UnknownModelName" in err.message and "cond" in err.message:
                 raise errors.InvalidModelError("%s Have you compiled NEST with the GSL (Gnu Scientific Library)?" % err)
             raise #errors.InvalidModelError(err)
+        self._mask_local = numpy.array(nest.GetStatus(self.all_cells, 'local'), dtype=bool)
+        # the parameters which differ between cells are set afterwards, one at a time
+        if heterogeneous:
+            _set_heterogeneous_params(numpy.array(self.all_cells)[self._mask_local].tolist(),
+                                      dict((name, values[self._mask_local])
+                                           for name, values in heterogeneous.items()))
         # create parrot neurons if necessary
         if hasattr(self.celltype, "uses_parrot") and self.celltype.uses_parrot:
             self.all_cells_source = numpy.array(self.all_cells)  # we put the parrots into all_cells, since this will
             self.all_cells = nest.Create("parrot_neuron", self.size)     # be used for connections and recording. all_cells_source
             nest.Connect(self.all_cells_source, self.all_cells)  # should be used for setting parameters
-        self._mask_local = numpy.array(nest.GetStatus(self.all_cells, 'local'))
+            self._mask_local = numpy.array(nest.GetStatus(self.all_cells, 'local'), dtype=bool)
         self.all_cells = numpy.array([simulator.ID(gid) for gid in self.all_cells], simulator.ID)
         for gid in self.all_cells:
             gid.parent = self
@@ -139,7 +161,7 @@ class Population(common.Population, PopulationMixin):
 
     def _set_initial_value_array(self, variable, value):
         variable = VARIABLE_MAP.get(variable, variable)
-        if isinstance(value.base_value, RandomDistribution) and value.base_value.rng.parallel_safe:
+        if value._sequential_parallel_safe:
             local_values = value.evaluate()[self._mask_local]
         else:
             local_values = value._partially_evaluate(self._mask_local, simplify=True)
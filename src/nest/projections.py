@@ -10,7 +10,6 @@ NEST v2 implementation of the PyNN API.
 import numpy
 import nest
 import logging
-from itertools import repeat
 from pyNN import common, errors
 from pyNN.space import Space
 from . import simulator
@@ -29,6 +28,34 @@ def listify(obj):
         return obj
 
 
+def _block_slice(syn_spec, n, start, stop):
+    """
+    Return a copy of `syn_spec` for the connections `start:stop` of a block
+    of `n` connections, with the per-synapse parameters as arrays of floats.
+    """
+    sliced = {}
+    for name, value in syn_spec.items():
+        if name in ('model', 'receptor_type'):
+            sliced[name] = value
+        else:
+            value = make_sli_compatible(value)
+            if numpy.ndim(value) == 1 and len(value) == n:
+                sliced[name] = value[start:stop].astype(float)
+            else:
+                sliced[name] = float(value) * numpy.ones((stop - start,))
+    return sliced
+
+
+def _block_select(value, n, mask):
+    """
+    Return the values of a per-synapse parameter of a block of `n`
+    connections for the connections selected by the boolean array `mask`.
+    """
+    if numpy.ndim(value) == 1 and len(value) == n:
+        return numpy.asarray(value)[mask]
+    return value
+
+
 class Projection(common.Projection):
     __doc__ = common.Projection.__doc__
     _simulator = simulator
@@ -36,10 +63,10 @@ class Projection(common.Projection):
 
     def __init__(self, presynaptic_population, postsynaptic_population,
                  connector, synapse_type=None, source=None, receptor_type=None,
-                 space=Space(), label=None):
+                 space=Space(), label=None, dry_run=False):
         common.Projection.__init__(self, presynaptic_population, postsynaptic_population,
                                    connector, synapse_type, source, receptor_type,
-                                   space, label)
+                                   space, label, dry_run)
         self.nest_synapse_model = self.synapse_type._get_nest_synapse_model("projection_%d" % Projection._nProj)
         self.synapse_type._set_tau_minus(self.post.local_cells)
         self._sources = []
@@ -51,7 +78,8 @@ class Projection(common.Projection):
         self._common_synapse_property_names = None
 
         # Create connections
-        connector.connect(self)
+        if not dry_run:
+            connector.connect(self)
 
     def __getitem__(self, i):
         """Return the `i`th connection on the local MPI node."""
@@ -90,74 +118,101 @@ class Projection(common.Projection):
             tau_syn = nest.GetStatus(targets, (param_name))
             nest.SetStatus(self.connections, 'tau_psc', tau_syn)
 
-    def _convergent_connect(self, presynaptic_indices, postsynaptic_index,
-                            **connection_parameters):
+    def _connect_block(self, presynaptic_indices, postsynaptic_indices,
+                       **connection_parameters):
         """
-        Connect a neuron to one or more other neurons with a static connection.
-
-        `sources`  -- a 1D array of pre-synaptic cell IDs
-        `target`   -- the ID of the post-synaptic cell.
+        Create a block of connections, given in coordinate (COO) format, with
+        a single call to `nest.Connect()`, using the 'one_to_one' rule and
+        arrays of per-synapse parameters, so that NEST creates the connections
+        itself, using all of its threads.
+        """
+        n = presynaptic_indices.size
+        if n == 0:
+            return
+        if isinstance(self.post, common.Assembly):
+            # the receptor type and the weight scaling depend on the cell type,
+            # so we connect to each population of the Assembly separately
+            boundaries = numpy.cumsum([p.size for p in self.post.populations])
+            groups = boundaries.searchsorted(postsynaptic_indices, side='right')
+            for group in numpy.unique(groups):
+                mask = groups == group
+                parameters = dict((name, _block_select(value, n, mask))
+                                  for name, value in connection_parameters.items())
+                self._connect_cells(presynaptic_indices[mask], postsynaptic_indices[mask],
+                                    self.post.populations[group].celltype, parameters)
+        else:
+            self._connect_cells(presynaptic_indices, postsynaptic_indices,
+                                self.post.celltype, connection_parameters)
 
-        TO UPDATE
+    def _connect_cells(self, presynaptic_indices, postsynaptic_indices, celltype,
+                       connection_parameters):
+        """
+        Create a block of connections onto post-synaptic cells which all have
+        the cell type `celltype`.
         """
-        #logger.debug("Connecting to index %s from %s with %s" % (postsynaptic_index, presynaptic_indices, connection_parameters))
-        presynaptic_cells = self.pre.all_cells[presynaptic_indices]
-        postsynaptic_cell = self.post[postsynaptic_index]
-        assert presynaptic_cells.size == presynaptic_indices.size
-        assert len(presynaptic_cells) > 0, presynaptic_cells
-        weights = connection_parameters.pop('weight')
+        n = presynaptic_indices.size
+        presynaptic_cells = self.pre.all_cells[presynaptic_indices].astype(int)
+        postsynaptic_cells = self.post.all_cells[postsynaptic_indices].astype(int)
+        weights = numpy.array(connection_parameters.pop('weight'), dtype=float)  # copy, as we change the sign and scale
         if self.receptor_type == 'inhibitory' and self.post.conductance_based:
             weights *= -1  # NEST wants negative values for inhibitory weights, even if these are conductances
-        if hasattr(self.post, "celltype") and hasattr(self.post.celltype, "receptor_scale"):  # this is a bit of a hack
-            weights *= self.post.celltype.receptor_scale                                      # needed for the Izhikevich model
-        delays = connection_parameters.pop('delay')
-        if postsynaptic_cell.celltype.standard_receptor_type:
-            try:
-                nest.ConvergentConnect(presynaptic_cells.astype(int).tolist(),
-                                       [int(postsynaptic_cell)],
-                                       listify(weights),
-                                       listify(delays),
-                                       self.nest_synapse_model)
-            except nest.NESTError, e:
-                raise errors.ConnectionError("%s. presynaptic_cells=%s, postsynaptic_cell=%s, weights=%s, delays=%s, synapse model='%s'" % (
-                                             e, presynaptic_cells, postsynaptic_cell, weights, delays, self.nest_synapse_model))
-        else:
-            receptor_type = postsynaptic_cell.celltype.get_receptor_type(self.receptor_type)
-            if numpy.isscalar(weights):
-                weights = repeat(weights)
-            if numpy.isscalar(delays):
-                delays = repeat(delays)
-            for pre, w, d in zip(presynaptic_cells, weights, delays):
-                nest.Connect([pre], [postsynaptic_cell],
-                             {'weight': w, 'delay': d, 'receptor_type': receptor_type},
-                             model=self.nest_synapse_model)
-        self._connections = None  # reset the caching of the connection list, since this will have to be recalculated
-        self._sources.extend(presynaptic_cells)
+        if hasattr(celltype, "receptor_scale"):  # this is a bit of a hack
+            weights *= celltype.receptor_scale   # needed for the Izhikevich model
+        syn_spec = {'model': self.nest_synapse_model,
+                    'weight': weights,
+                    'delay': connection_parameters.pop('delay')}
+        if not celltype.standard_receptor_type:
+            syn_spec['receptor_type'] = celltype.get_receptor_type(self.receptor_type)
         connection_parameters.pop('tau_minus', None)  # TODO: set tau_minus on the post-synaptic cells
         connection_parameters.pop('dendritic_delay_fraction', None)
         connection_parameters.pop('w_min_always_zero_in_NEST', None)
-        # We need to distinguish between common synapse parameters from local ones
-        # We just get the parameters of the first connection (is there an easier way?)
+        self._connections = None  # reset the caching of the connection list, since this will have to be recalculated
+        self._sources.extend(presynaptic_cells)
+        start = 0
         if self._common_synapse_property_names is None:
-            self._identify_common_synapse_properties(int(self.pre[presynaptic_indices[0]]),
-                                                     int(postsynaptic_cell))
-        if connection_parameters:
-            #logger.debug(connection_parameters)
-            sort_indices = numpy.argsort(presynaptic_cells)
-            connections = nest.GetConnections(source=numpy.unique(presynaptic_cells.astype(int)).tolist(),
-                                              target=[int(postsynaptic_cell)],
-                                              synapse_model=self.nest_synapse_model)
-            assert len(connections) == presynaptic_cells.size
+            # We need to distinguish between common synapse parameters from local ones,
+            # which we can only do from an existing connection, so we create the first
+            # connection on its own and set its other parameters afterwards
+            self._nest_connect(presynaptic_cells[:1], postsynaptic_cells[:1],
+                               _block_slice(syn_spec, n, 0, 1))
+            self._identify_common_synapse_properties(presynaptic_cells[0], postsynaptic_cells[0])
+            connection = nest.GetConnections(source=[int(presynaptic_cells[0])],
+                                             target=[int(postsynaptic_cells[0])],
+                                             synapse_model=self.nest_synapse_model)
             for name, value in connection_parameters.items():
-                value = make_sli_compatible(value)
                 if name not in self._common_synapse_property_names:
-                    #logger.debug("Setting %s=%s for connections %s" % (name, value, connections))
-                    if isinstance(value, numpy.ndarray):
-                        nest.SetStatus(connections, name, value[sort_indices])
-                    else:
-                        nest.SetStatus(connections, name, value)
-                else:
-                    self._set_common_synapse_property(name, value)
+                    value = make_sli_compatible(_block_slice({name: value}, n, 0, 1)[name][0])
+                    nest.SetStatus(connection, name, value)
+            start = 1
+        for name, value in connection_parameters.items():
+            if name in self._common_synapse_property_names:
+                self._set_common_synapse_property(name, make_sli_compatible(value))
+            else:
+                syn_spec[name] = value
+        if start < n:
+            self._nest_connect(presynaptic_cells[start:], postsynaptic_cells[start:],
+                               _block_slice(syn_spec, n, start, n))
+
+    def _nest_connect(self, presynaptic_cells, postsynaptic_cells, syn_spec):
+        try:
+            nest.Connect(presynaptic_cells.tolist(), postsynaptic_cells.tolist(),
+                         conn_spec={'rule': 'one_to_one'}, syn_spec=syn_spec)
+        except nest.NESTError, e:
+            raise errors.ConnectionError("%s. presynaptic_cells=%s, postsynaptic_cells=%s, syn_spec=%s" % (
+                                         e, presynaptic_cells, postsynaptic_cells, syn_spec))
+
+    def _convergent_connect(self, presynaptic_indices, postsynaptic_index,
+                            **connection_parameters):
+        """
+        Connect a neuron to one or more other neurons.
+
+        `presynaptic_indices` -- a 1D array of pre-synaptic cell indices
+        `postsynaptic_index`  -- the index of the post-synaptic cell.
+        """
+        presynaptic_indices = numpy.asarray(presynaptic_indices, dtype=int)
+        self._connect_block(presynaptic_indices,
+                            numpy.repeat(postsynaptic_index, presynaptic_indices.size),
+                            **connection_parameters)
 
     def _identify_common_synapse_properties(self, sample_pre_idx, sample_post_idx):
         """
@@ -172,47 +227,61 @@ class Projection(common.Projection):
         self._common_synapse_property_names = [name for name in all_parameters if name not in local_parameters]
 
     def _set_attributes(self, parameter_space):
-        parameter_space.evaluate(mask=(slice(None), self.post._mask_local))  # only columns for connections that exist on this machine
-        sources = numpy.unique(self._sources).tolist()
-        for postsynaptic_cell, connection_parameters in zip(self.post.local_cells,
-                                                            parameter_space.columns()):
-            connections = nest.GetConnections(source=sources,
-                                              target=[postsynaptic_cell],
-                                              synapse_model=self.nest_synapse_model)
-            if connections:
-                source_mask = self.pre.id_to_index([x[0] for x in connections])
-                for name, value in connection_parameters.items():
-                    if name == "weight" and self.receptor_type == 'inhibitory' and self.post.conductance_based:
-                        value *= -1  # NEST uses negative values for inhibitory weights, even if these are conductances
-                    value = make_sli_compatible(value)
-                    if name not in self._common_synapse_property_names:
-                        if len(source_mask) > 1:
-                            nest.SetStatus(connections, name, value[source_mask])
-                        elif isinstance(value, numpy.ndarray):  # OneToOneConnector
-                            nest.SetStatus(connections, name, value[source_mask])
-                        else:
-                            nest.SetStatus(connections, name, value)
-                    else:
-                        self._set_common_synapse_property(name, value)
+        connections = self.connections
+        if not connections:
+            return
+        sources, targets = self._get_attributes_as_coo()
+        for name, value in parameter_space.items():
+            if value.is_homogeneous:
+                value = value.evaluate(simplify=True)
+            else:
+                if value._sequential_parallel_safe:
+                    value = value.evaluate()  # can't partially evaluate if using parallel safe
+                value = value[sources, targets]
+            if name == "weight" and self.receptor_type == 'inhibitory' and self.post.conductance_based:
+                value = -value  # NEST uses negative values for inhibitory weights, even if these are conductances
+            value = make_sli_compatible(value)
+            if name in (self._common_synapse_property_names or ()):
+                self._set_common_synapse_property(name, value)
+            else:
+                nest.SetStatus(connections, name, listify(value))
+
+    def _set_connection_attributes(self, indices, **attributes):
+        connections = self.connections
+        positions = numpy.arange(len(connections))[indices]
+        connections = [connections[i] for i in positions]
+        for name, value in attributes.items():
+            if name == "weight" and self.receptor_type == 'inhibitory' and self.post.conductance_based:
+                value = -value  # NEST uses negative values for inhibitory weights, even if these are conductances
+            if name in (self._common_synapse_property_names or ()):
+                self._set_common_synapse_property(name, value)
+            elif connections:
+                nest.SetStatus(connections, name, listify(value))
 
     def _set_common_synapse_property(self, name, value):
         """
             Sets the common synapse property while making sure its value stays
             unique (i.e. it can only be set once).
         """
+        if isinstance(value, numpy.ndarray) and value.size > 0 and value.dtype != object:
+            # one value per connection, e.g. for a block of connections
+            raise_error = (value != value.flat[0]).any()
+            value = value.flat[0]
+        else:
+            raise_error = False
         if name in self._common_synapse_properties:
             unequal = self._common_synapse_properties[name] != value
             # handle both scalars and numpy ndarray
             if isinstance(unequal, numpy.ndarray):
-                raise_error = unequal.any()
+                raise_error |= unequal.any()
             else:
-                raise_error = unequal
-            if raise_error:
-                raise ValueError("{} cannot be heterogeneous "
-                        "within a single Projection. Warning: "
-                        "Projection was only partially initialized."
-                        " Please call sim.nest.reset() to reset "
-                        "your network and start over!".format(name))
+                raise_error |= unequal
+        if raise_error:
+            raise ValueError("{} cannot be heterogeneous "
+                    "within a single Projection. Warning: "
+                    "Projection was only partially initialized."
+                    " Please call sim.nest.reset() to reset "
+                    "your network and start over!".format(name))
         self._common_synapse_properties[name] = value
         nest.SetDefaults(self.nest_synapse_model, name, value)
 
@@ -245,52 +314,37 @@ class Projection(common.Projection):
     #        file.write(lines, {'pre' : self.pre.label, 'post' : self.post.label})
     #        file.close()
 
+    def _get_attribute_columns(self, names):
+        """
+        Return the values of the attributes `names` (which may include
+        'presynaptic_index' and 'postsynaptic_index') for all local
+        connections, as a list of arrays, with a single call to
+        `nest.GetStatus()`.
+        """
+        nest_names = [{'presynaptic_index': 'source',
+                       'postsynaptic_index': 'target'}.get(name, name)
+                      for name in names]
+        connections = self.connections
+        if connections:
+            values = numpy.array(nest.GetStatus(connections, nest_names), dtype=float)
+        else:
+            values = numpy.zeros((0, len(names)))
+        columns = list(values.reshape((-1, len(names))).T)
+        for k, name in enumerate(names):
+            if name in ('presynaptic_index', 'postsynaptic_index'):
+                population = (name == 'presynaptic_index') and self.pre or self.post
+                columns[k] = columns[k].astype(int)
+                if connections:
+                    columns[k] = population.id_to_index(columns[k])
+            elif name == 'weight':  # other attributes could also have scale factors - need to use translation mechanisms
+                columns[k] *= 0.001
+                if self.receptor_type == 'inhibitory' and self.post.conductance_based:
+                    columns[k] *= -1  # NEST uses negative values for inhibitory weights, even if these are conductances
+        return columns
+
     def _get_attributes_as_list(self, *names):
-        nest_names = []
-        for name in names:
-            if name == 'presynaptic_index':
-                nest_names.append('source')
-            elif name == 'postsynaptic_index':
-                nest_names.append('target')
-            else:
-                nest_names.append(name)
-        values = nest.GetStatus(self.connections, nest_names)
-        if 'weight' in names:  # other attributes could also have scale factors - need to use translation mechanisms
-            values = numpy.array(values)  # ought to preserve int type for source, target
-            scale_factors = numpy.ones(len(names))
-            scale_factors[names.index('weight')] = 0.001
-            if self.receptor_type == 'inhibitory' and self.post.conductance_based:
-                scale_factors[names.index('weight')] *= -1  # NEST uses negative values for inhibitory weights, even if these are conductances
-            values *= scale_factors
-            values = values.tolist()
-        if 'presynaptic_index' in names:
-            values = numpy.array(values)
-            values[:, names.index('presynaptic_index')] -= self.pre.first_id
-            values = values.tolist()
-        if 'postsynaptic_index' in names:
-            values = numpy.array(values)
-            values[:, names.index('postsynaptic_index')] -= self.post.first_id
-            values = values.tolist()
-        return values
+        return zip(*[column.tolist() for column in self._get_attribute_columns(names)])
 
-    def _get_attributes_as_arrays(self, *names):
-        all_values = []
-        for attribute_name in names:
-            if attribute_name[-1] == "s":  # weights --> weight, delays --> delay
-                attribute_name = attribute_name[:-1]
-            value_arr = numpy.nan * numpy.ones((self.pre.size, self.post.size))
-            connection_attributes = nest.GetStatus(self.connections, ('source', 'target', attribute_name))
-            for conn in connection_attributes:
-                # (offset is always 0,0 for connections created with connect())
-                src, tgt, value = conn
-                addr = self.pre.id_to_index(src), self.post.id_to_index(tgt)
-                if numpy.isnan(value_arr[addr]):
-                    value_arr[addr] = value
-                else:
-                    value_arr[addr] += value
-            if attribute_name == 'weight':
-                value_arr *= 0.001
-                if self.receptor_type == 'inhibitory' and self.post.conductance_based:
-                    value_arr *= -1  # NEST uses negative values for inhibitory weights, even if these are conductances
-            all_values.append(value_arr)
-        return all_values
+    def _get_attributes_as_coo(self, *names):
+        __doc__ = common.Projection._get_attributes_as_coo.__doc__
+        return self._get_attribute_columns(["presynaptic_index", "postsynaptic_index"] + list(names))
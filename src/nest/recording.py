@@ -29,7 +29,19 @@ def _set_status(obj, parameters):
 
 
 class RecordingDevice(object):
-    """Base class for SpikeDetector and Multimeter"""
+    """
+    Base class for SpikeDetector and Multimeter.
+
+    If `to_memory` is False, NEST writes the recorded events to text files,
+    one per thread. Each time the data are retrieved, the text written since
+    the previous retrieval is read in blocks of at most `merge_block_size`
+    bytes and merged into a cache, a memory-mapped .npy file of rows of
+    doubles (sender, time and the recorded variables) kept sorted by sender,
+    with the events from each sender in time order. Retrieving the data for
+    a cell then reads only the rows for that cell, so that memory use stays
+    bounded however long the simulation.
+    """
+    merge_block_size = 2**24
 
     def __init__(self, device_parameters, to_memory=True):
         # to be called at the end of the subclass __init__
@@ -38,8 +50,15 @@ class RecordingDevice(object):
             device_parameters.update(to_file=False, to_memory=True)
         else:
             device_parameters.update(to_file=True, to_memory=False)
+            self._cache = None
+            self._cache_columns = None
+            self._cache_ids = numpy.zeros((0,), dtype=int)
+            self._cache_index = numpy.zeros((1,), dtype=int)
+            self._file_offsets = {}
+        self.to_memory = to_memory
         self._all_ids = set([])
         self._connected = False
+        self._events = None
         simulator.state.recording_devices.append(self)
         _set_status(self.device, device_parameters)
 
@@ -47,6 +66,149 @@ class RecordingDevice(object):
         assert not self._connected
         self._all_ids = self._all_ids.union(new_ids)
 
+    def _open_cache(self, n_rows):
+        """
+        Create a memory-mapped .npy file with room for `n_rows` events. The
+        file is unlinked straight away, so it is removed once closed.
+        """
+        fd, path = tempfile.mkstemp(suffix=".npy")
+        os.close(fd)
+        try:
+            return numpy.lib.format.open_memmap(path, mode='w+', dtype=float,
+                                                shape=(n_rows, self._cache_columns))
+        finally:
+            os.remove(path)
+
+    @staticmethod
+    def _scatter(cache, cursor, ids, block):
+        """
+        Write the rows of `block` into `cache`, each at the next free row of
+        its sender, given by `cursor` (indexed like `ids`), and advance
+        `cursor`. The rows from each sender keep their order.
+        """
+        k = ids.searchsorted(block[:, 0].astype(int))
+        order = numpy.argsort(k, kind='mergesort')
+        k = k[order]
+        cache[cursor[k] + numpy.arange(k.size) - k.searchsorted(k)] = block[order]
+        cursor += numpy.bincount(k, minlength=ids.size)
+
+    def _merge_files(self):
+        """
+        Merge the events written to file by NEST since the last merge into
+        the cache, keeping the cache sorted by sender.
+        """
+        filenames = nest.GetStatus(self.device)[0].get('filenames', [])
+        staging = tempfile.TemporaryFile()
+        new_ids = numpy.zeros((0,), dtype=int)
+        new_counts = numpy.zeros((0,), dtype=int)
+        for filename in filenames:
+            if not os.path.exists(filename):
+                continue
+            with open(filename) as f:
+                f.seek(self._file_offsets.get(filename, 0))
+                at_end = False
+                while not at_end:
+                    lines = f.readlines(self.merge_block_size)
+                    at_end = not lines
+                    if lines and not lines[-1].endswith("\n"):
+                        # incomplete line at the end of the file, still being written
+                        f.seek(-len(lines.pop()), os.SEEK_CUR)
+                        at_end = True
+                    if lines:
+                        data = numpy.loadtxt(lines, ndmin=2)
+                        if self._cache_columns is None:
+                            self._cache_columns = data.shape[1]
+                        data = data[:, :self._cache_columns].astype(float)
+                        data.tofile(staging)
+                        senders = data[:, 0].astype(int)
+                        ids = numpy.union1d(new_ids, senders)
+                        counts = numpy.bincount(ids.searchsorted(senders), minlength=ids.size)
+                        counts[ids.searchsorted(new_ids)] += new_counts
+                        new_ids, new_counts = ids, counts
+                self._file_offsets[filename] = f.tell()
+        if new_ids.size == 0:
+            staging.close()
+            return
+        ids = numpy.union1d(self._cache_ids, new_ids)
+        counts = numpy.zeros(ids.shape, dtype=int)
+        counts[ids.searchsorted(self._cache_ids)] += numpy.diff(self._cache_index)
+        counts[ids.searchsorted(new_ids)] += new_counts
+        index = numpy.concatenate(([0], numpy.cumsum(counts)))
+        cache = self._open_cache(index[-1])
+        cursor = index[:-1].copy()
+        block_rows = max(1, self.merge_block_size // (8 * self._cache_columns))
+        # old events first, so that the events from each sender stay in time order
+        if self._cache is not None:
+            for i in xrange(0, self._cache.shape[0], block_rows):
+                self._scatter(cache, cursor, ids, numpy.asarray(self._cache[i:i + block_rows]))
+        staging.seek(0)
+        block = numpy.fromfile(staging, dtype=float, count=block_rows * self._cache_columns)
+        while block.size:
+            self._scatter(cache, cursor, ids, block.reshape((-1, self._cache_columns)))
+            block = numpy.fromfile(staging, dtype=float, count=block_rows * self._cache_columns)
+        staging.close()
+        cache.flush()
+        self._cache, self._cache_ids, self._cache_index = cache, ids, index
+
+    def _get_events(self):
+        """
+        Return the senders of the events held in memory by NEST, sorted with
+        a stable sort (so that the events from each sender remain in time
+        order), the sort order, the recorded events and a dict in which to
+        cache the sorted arrays of events (see `_get_sorted()`).
+
+        The result is cached until the next call to `run()`, so that the
+        events need only be sorted once for all the cells.
+        """
+        if self._events is None:
+            events = nest.GetStatus(self.device, 'events')[0]
+            order = numpy.argsort(events['senders'], kind='mergesort')
+            self._events = (events['senders'][order], order, events, {})
+        return self._events
+
+    def _get_sorted(self, name):
+        """
+        Return the recorded values of `name`, sorted by sender. If recording
+        to file, this is a column of the memory-mapped cache, which is only
+        read from disk when sliced.
+        """
+        if not self.to_memory:
+            self._merge_files()
+            if self._cache is None:
+                return numpy.zeros((0,))
+            names = self._file_columns()[:self._cache_columns]
+            return self._cache[:, names.index(name)]
+        senders, order, events, sorted_events = self._get_events()
+        if name not in sorted_events:
+            sorted_events[name] = numpy.asarray(events[name][order])
+        return sorted_events[name]
+
+    def _event_ranges(self, desired_ids):
+        """
+        Return the start and stop positions of the events from each of the
+        cells `desired_ids` in the arrays returned by `_get_sorted()`.
+        """
+        ids = numpy.fromiter((int(id) for id in desired_ids), dtype=int)
+        if not self.to_memory:
+            self._merge_files()
+            # the cache holds each sender once, so an absent id gets an empty range
+            return (self._cache_index[self._cache_ids.searchsorted(ids, side='left')],
+                    self._cache_index[self._cache_ids.searchsorted(ids, side='right')])
+        senders = self._get_events()[0]
+        return (numpy.searchsorted(senders, ids, side='left'),
+                numpy.searchsorted(senders, ids, side='right'))
+
+    def clear_data(self):
+        """Remove all the recorded data."""
+        if self.to_memory:
+            nest.SetStatus(self.device, 'n_events', 0)
+        else:
+            self._merge_files()  # so as to skip the data already written to file
+            self._cache = None
+            self._cache_ids = numpy.zeros((0,), dtype=int)
+            self._cache_index = numpy.zeros((1,), dtype=int)
+        self._events = None
+
     def get_data(self, variable, desired_ids, clear=False):
         """
         Return recorded data as a dictionary containing one numpy array for
@@ -54,12 +216,12 @@ class RecordingDevice(object):
         """
         scale_factor = SCALE_FACTORS.get(variable, 1)
         nest_variable = VARIABLE_MAP.get(variable, variable)
-        events = nest.GetStatus(self.device,'events')[0]
-        ids = events['senders']
-        values = events[nest_variable] * scale_factor # I'm hoping numpy optimises for the case where scale_factor = 1, otherwise should avoid this multiplication in that case
+        values = self._get_sorted(nest_variable)
         data = {}
-        for id in desired_ids:
-            data[id] = values[ids==id]
+        for id, start, stop in zip(desired_ids, *self._event_ranges(desired_ids)):
+            data[id] = numpy.array(values[start:stop])
+            if scale_factor != 1:
+                data[id] *= scale_factor
             if variable != 'times':
                 # NEST does not record values at the zeroth time step, so we
                 # add them here.
@@ -102,13 +264,12 @@ class SpikeDetector(RecordingDevice):
         """
         return self.get_data('times', desired_ids)
 
+    def _file_columns(self):
+        return ['senders', 'times']
+
     def get_spike_counts(self, desired_ids):
-        events = nest.GetStatus(self.device, 'events')[0]
-        N = {}
-        for id in desired_ids:
-            mask = events['senders'] == int(id)
-            N[int(id)] = len(events['times'][mask])
-        return N
+        starts, stops = self._event_ranges(desired_ids)
+        return dict((int(id), int(n)) for id, n in zip(desired_ids, stops - starts))
 
 
 class Multimeter(RecordingDevice):
@@ -132,230 +293,15 @@ class Multimeter(RecordingDevice):
     def variables(self):
         return set(nest.GetStatus(self.device, 'record_from')[0])
 
+    def _file_columns(self):
+        return ['senders', 'times'] + list(nest.GetStatus(self.device, 'record_from')[0])
+
     def add_variable(self, variable):
         current_variables = self.variables
         current_variables.add(VARIABLE_MAP.get(variable, variable))
         _set_status(self.device, {'record_from': list(current_variables)})
 
 
-#class RecordingDevice(object):
-#    scale_factors = {'V_m': 1, 'g_ex': 0.001, 'g_in': 0.001}
-#
-#    def __init__(self, device_type, to_memory=False):
-#        assert device_type in ("multimeter", "spike_detector")
-#        self.type      = device_type
-#        self.device    = nest.Create(device_type)
-#        self.to_memory = to_memory
-#        device_parameters = {"withgid": True, "withtime": True}
-#        if self.type is 'multimeter':
-#            device_parameters["interval"] = simulator.state.dt
-#        else:
-#            device_parameters["precise_times"] = True
-#            device_parameters["precision"] = simulator.state.default_recording_precision
-#        if to_memory:
-#            device_parameters.update(to_file=False, to_memory=True)
-#        else:
-#            device_parameters.update(to_file=True, to_memory=False)
-#        try:
-#            nest.SetStatus(self.device, device_parameters)
-#        except nest.hl_api.NESTError, e:
-#            raise nest.hl_api.NESTError("%s. Parameter dictionary was: %s" % (e, device_parameters))
-#
-#        self.record_from = []
-#        self._local_files_merged = False
-#        self._gathered = False
-#        self._connected = False
-#        self._all_ids = set([])
-#        simulator.state.recording_devices.append(self)
-#        logger.debug("Created %s with parameters %s" % (device_type, device_parameters))
-#
-#    def __del__(self):
-#        for name in "_merged_file", "_gathered_file":
-#            if hasattr(self, name):
-#                getattr(self, name).close()
-#
-#    def add_variables(self, *variables):
-#        assert self.type is "multimeter", "Can't add variables to a spike detector"
-#        self.record_from.extend(variables)
-#        nest.SetStatus(self.device, {'record_from': self.record_from})
-#
-#    def add_cells(self, new_ids):
-#        self._all_ids = self._all_ids.union(new_ids)
-#
-#    def connect_to_cells(self):
-#        if not self._connected:
-#            ids = list(self._all_ids)
-#            if self.type is "spike_detector":
-#                nest.ConvergentConnect(ids, self.device, model='static_synapse')
-#            else:
-#                nest.DivergentConnect(self.device, ids, model='static_synapse')
-#            self._connected = True
-#
-#    def in_memory(self):
-#        """Determine whether data is being recorded to memory."""
-#        return nest.GetStatus(self.device, 'to_memory')[0]
-#
-#    def events_to_array(self, events):
-#        """
-#        Transform the NEST events dictionary (when recording to memory) to a
-#        Numpy array.
-#        """
-#        ids = events['senders']
-#        times = events['times']
-#        if self.type == 'spike_detector':
-#            data = numpy.array((ids, times)).T
-#        else:
-#            data = [ids, times]
-#            for var in self.record_from:
-#                data.append(events[var])
-#            data = numpy.array(data).T
-#        return data
-#
-#    def scale_data(self, data):
-#        """
-#        Scale the data to give appropriate units.
-#        """
-#        scale_factors = [RecordingDevice.scale_factors.get(var, 1)
-#                         for var in self.record_from]
-#        for i, scale_factor in enumerate(scale_factors):
-#            column = i+2 # first two columns are id and t, which should not be scaled.
-#            if scale_factor != 1:
-#                data[:, column] *= scale_factor
-#        return data
-#
-#    def add_initial_values(self, data):
-#        """
-#        Add initial values (NEST does not record the value at t=0).
-#        """
-#        logger.debug("Prepending initial values to recorded data")
-#        initial_values = []
-#        for id in self._all_ids:
-#            initial = [id, 0.0]
-#            for variable in self.record_from:
-#                variable = REVERSE_VARIABLE_MAP.get(variable, variable)
-#                try:
-#                    initial.append(id.get_initial_value(variable))
-#                except KeyError:
-#                    initial.append(0.0) # unsatisfactory
-#            initial_values.append(initial)
-#        if initial_values:
-#            data = numpy.concatenate((initial_values, data))
-#        return data
-#
-#    def read_data_from_memory(self, gather, compatible_output):
-#        """
-#        Return memory-recorded data.
-#
-#        `gather` -- if True, gather data from all MPI nodes.
-#        `compatible_output` -- if True, transform the data into the PyNN
-#                               standard format.
-#        """
-#        data = nest.GetStatus(self.device,'events')[0]
-#        if compatible_output:
-#            data = self.events_to_array(data)
-#            data = self.scale_data(data)
-#        if gather and simulator.state.num_processes > 1:
-#            data = recording.gather(data)
-#            self._gathered_file = tempfile.TemporaryFile()
-#            numpy.save(self._gathered_file, data)
-#            self._gathered = True
-#        return data
-#
-#    def read_local_data(self, compatible_output):
-#        """
-#        Return file-recorded data from the local MPI node, merging data from
-#        different threads if applicable.
-#
-#        The merged data is cached, to avoid the overhead of re-merging if the
-#        method is called again.
-#        """
-#        # what if the method is called with different values of
-#        # `compatible_output`? Need to cache these separately.
-#        if self._local_files_merged:
-#            logger.debug("Loading merged data from cache")
-#            self._merged_file.seek(0)
-#            data = numpy.load(self._merged_file)
-#        else:
-#            d = nest.GetStatus(self.device)[0]
-#            if "filenames" in d:
-#                nest_files = d['filenames']
-#            else: # indicates that run() has not been called.
-#                raise errors.NothingToWriteError("No recorder data. Have you called run()?")
-#            # possibly we can just keep on saving to the end of self._merged_file, instead of concatenating everything in memory
-#            logger.debug("Concatenating data from the following files: %s" % ", ".join(nest_files))
-#            non_empty_nest_files = [filename for filename in nest_files if os.stat(filename).st_size > 0]
-#            if len(non_empty_nest_files) > 0: 
-#                data_list = [numpy.loadtxt(nest_file) for nest_file in non_empty_nest_files] 
-#                data_list = [numpy.atleast_2d(numpy.loadtxt(nest_file)) 
-#                             for nest_file in non_empty_nest_files] 
-#                data = numpy.concatenate(data_list) 
-#            if len(non_empty_nest_files) == 0 or data.size == 0:
-#                if self.type is "spike_detector":
-#                    ncol = 2
-#                else:
-#                    ncol = 2 + len(self.record_from)
-#                data = numpy.empty([0, ncol])
-#            if compatible_output and self.type is not "spike_detector":
-#                data = self.scale_data(data)
-#                data = self.add_initial_values(data)
-#            self._merged_file = tempfile.TemporaryFile()
-#            numpy.save(self._merged_file, data)
-#            self._local_files_merged = True  # this is set back to False by run() 
-#        return data
-#
-#    def read_data(self, gather, compatible_output, always_local=False):
-#        """
-#        Return file-recorded data.
-#
-#        `gather` -- if True, gather data from all MPI nodes.
-#        `compatible_output` -- if True, transform the data into the PyNN
-#                               standard format.
-#
-#        Gathered data is cached, so the MPI communication need only be done
-#        once, even if the method is called multiple times.
-#        """
-#        # what if the method is called with different values of
-#        # `compatible_output`? Need to cache these separately.
-#        if not self.to_memory:
-#            if gather and simulator.state.num_processes > 1:
-#                if self._gathered:
-#                    logger.debug("Loading previously gathered data from cache")
-#                    self._gathered_file.seek(0)
-#                    data = numpy.load(self._gathered_file)
-#                else:
-#                    local_data = self.read_local_data(compatible_output)
-#                    if always_local:
-#                        data = local_data # for always_local cells, no need to gather
-#                    else:
-#                        logger.debug("Gathering data")
-#                        data = recording.gather(local_data)
-#                    logger.debug("Caching gathered data")
-#                    self._gathered_file = tempfile.TemporaryFile()
-#                    numpy.save(self._gathered_file, data)
-#                    self._gathered = True
-#            else:
-#                data = self.read_local_data(compatible_output)
-#            if len(data.shape) == 1:
-#                data = data.reshape((1, data.size))
-#            return data
-#        else:
-#            return self.read_data_from_memory(gather, compatible_output)
-#
-#    def read_subset(self, variables, gather, compatible_output, always_local=False):
-#        if self.in_memory():
-#            data = self.read_data_from_memory(gather, compatible_output)
-#        else: # in file
-#            data = self.read_data(gather, compatible_output, always_local)
-#        indices = []
-#        for variable in variables:
-#            try:
-#                indices.append(self.record_from.index(variable))
-#            except ValueError:
-#                raise Exception("%s not recorded" % variable)
-#        columns = tuple([0, 1] + [index + 2 for index in indices])
-#        return data[:, columns]
-
-
 class Recorder(recording.Recorder):
     """Encapsulates data and functions related to recording model variables."""
     _simulator = simulator
@@ -366,8 +312,8 @@ class Recorder(recording.Recorder):
     def __init__(self, population, file=None):
         __doc__ = recording.Recorder.__doc__
         recording.Recorder.__init__(self, population, file)
-        self._multimeter = Multimeter()
-        self._spike_detector = SpikeDetector()
+        self._multimeter = Multimeter(to_memory=not simulator.state.record_to_file)
+        self._spike_detector = SpikeDetector(to_memory=not simulator.state.record_to_file)
 #        self._create_device()
 
 #    def _create_device(self, variable):
@@ -404,11 +350,11 @@ class Recorder(recording.Recorder):
         # I guess the existing devices still exist in NEST, can we delete them
         # or at least turn them off?
         # Maybe we can reset them, rather than create new ones?
-        self._multimeter = Multimeter()
-        self._spike_detector = SpikeDetector()
+        self._multimeter = Multimeter(to_memory=not simulator.state.record_to_file)
+        self._spike_detector = SpikeDetector(to_memory=not simulator.state.record_to_file)
 
     def _get_spiketimes(self, id):
-        return self._spike_detector.get_spiketimes([id])[id] # hugely inefficient - to be optimized later
+        return self._spike_detector.get_spiketimes([id])[id]
 
     def _get_all_signals(self, variable, ids, clear=False):
         data = self._multimeter.get_data(variable, ids, clear=clear)
@@ -444,8 +390,8 @@ class Recorder(recording.Recorder):
         Should remove all recorded data held by the simulator and, ideally,
         free up the memory.
         """
-        nest.SetStatus(self._spike_detector.device, 'n_events', 0)
-        nest.SetStatus(self._multimeter.device, 'n_events', 0)
+        self._spike_detector.clear_data()
+        self._multimeter.clear_data()
         
     def store_to_cache(self, annotations={}):
         # we over-ride the implementation from the parent class so as to
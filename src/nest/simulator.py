@@ -53,6 +53,7 @@ class _State(common.control.BaseState):
         self.optimize = False
         self.spike_precision = "off_grid"
         self.verbosity = "warning"
+        self.record_to_file = False
         self._cache_num_processes = nest.GetKernelStatus()['num_processes'] # avoids blocking if only some nodes call num_processes
                                                                             # do the same for rank?
         # allow NEST to erase previously written files (defaut with all the other simulators)
@@ -123,6 +124,7 @@ class _State(common.control.BaseState):
             if not device._connected:
                 device.connect_to_cells()
                 device._local_files_merged = False
+            device._events = None  # the cached events are out of date after running
         if not self.running and simtime > 0:
             simtime += self.dt # we simulate past the real time by one time step, otherwise NEST doesn't give us all the recorded data
             self.running = True
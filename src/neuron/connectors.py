@@ -20,4 +20,6 @@ from pyNN.connectors import AllToAllConnector, \
                             SmallWorldConnector, \
                             CSAConnector, \
                             CloneConnector, \
-                            ArrayConnector
+                            ArrayConnector, \
+                            SparseMatrixExpression, \
+                            CachedConnector
@@ -12,7 +12,6 @@ import logging
 from pyNN import common
 from pyNN.parameters import Sequence, ParameterSpace, simplify
 from pyNN.standardmodels import StandardCellType
-from pyNN.random import RandomDistribution
 from . import simulator
 from .recording import Recorder
 
@@ -46,7 +45,7 @@ class PopulationMixin(object):
             for cell in self:  # only on local node
                 setattr(cell._cell, "%s_init" % variable, value)
         else:
-            if isinstance(initial_values.base_value, RandomDistribution) and initial_values.base_value.rng.parallel_safe:
+            if initial_values._sequential_parallel_safe:
                 local_values = initial_values.evaluate()[self._mask_local]
             else:
                 local_values = initial_values[self._mask_local]            
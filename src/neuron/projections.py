@@ -28,13 +28,14 @@ class Projection(common.Projection):
 
     def __init__(self, presynaptic_population, postsynaptic_population,
                  connector, synapse_type=None, source=None, receptor_type=None,
-                 space=Space(), label=None):
+                 space=Space(), label=None, dry_run=False):
         __doc__ = common.Projection.__init__.__doc__
         common.Projection.__init__(self, presynaptic_population, postsynaptic_population,
                                    connector, synapse_type, source, receptor_type,
-                                   space, label)
+                                   space, label, dry_run)
         self._connections = dict((index, {}) for index in self.post._mask_local.nonzero()[0])    
-        connector.connect(self)
+        if not dry_run:
+            connector.connect(self)
         self._presynaptic_components = dict((index, {}) for index in 
                                             self.pre._mask_local.nonzero()[0])
         if self.synapse_type.presynaptic_type:
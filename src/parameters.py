@@ -54,6 +54,19 @@ class LazyArray(larray):
             except NameError, err:
                 raise errors.InvalidParameterValueError(errmsg + str(err))
         super(LazyArray, self).__init__(value, shape, dtype)
+        # The stream key of an addressable random array is allocated when the
+        # array is created, not when it is first evaluated, so that it is the
+        # same on all MPI nodes whichever columns each node evaluates.
+        if isinstance(value, LazyArray) and hasattr(value, "_stream_key"):
+            self._stream_key = value._stream_key
+        elif self._addressable:
+            self._stream_key = self.base_value.rng.new_key()
+
+    def __deepcopy__(self, memo):
+        obj = super(LazyArray, self).__deepcopy__(memo)
+        if hasattr(self, "_stream_key"):
+            obj._stream_key = self._stream_key
+        return obj
 
     def __setitem__(self, addr, new_value):
         self.check_bounds(addr)
@@ -66,6 +79,65 @@ class LazyArray(larray):
             self.base_value[addr] = new_value
             self.operations = []
 
+    @property
+    def _addressable(self):
+        """
+        True if the array is created from a random distribution whose values
+        can be drawn for any column without drawing those of the other columns.
+        """
+        return isinstance(self.base_value, RandomDistribution) and self.base_value.rng.addressable
+
+    @property
+    def _sequential_parallel_safe(self):
+        """
+        True if the array is created from a random distribution using a parallel
+        safe RNG that draws numbers in sequence, so that the values for all
+        elements must be drawn on all MPI nodes.
+        """
+        return (isinstance(self.base_value, RandomDistribution)
+                and self.base_value.rng.parallel_safe
+                and not self.base_value.rng.addressable)
+
+    def _draw_addressed(self, addr):
+        # Each column of the array is drawn from its own stream of the RNG,
+        # so any element has the same value whatever the order of access.
+        rng = self.base_value.rng
+        indices = self._array_indices(addr)
+        if len(self._shape) == 1:
+            rows, cols = numpy.asarray(indices[0]), numpy.zeros((), dtype=int)
+        else:
+            rows, cols = numpy.asarray(indices[0]), numpy.asarray(indices[1])
+        rows, cols = numpy.broadcast_arrays(rows, cols)
+        flat_rows, flat_cols = rows.ravel(), cols.ravel()
+        order = numpy.argsort(flat_cols, kind='mergesort')
+        boundaries = numpy.flatnonzero(numpy.diff(flat_cols[order])) + 1
+        values = None
+        for segment in numpy.split(order, boundaries):
+            if segment.size == 0:
+                continue
+            column = rng.stream(self._stream_key, flat_cols[segment[0]]).next(
+                self._shape[0], self.base_value.name, self.base_value.parameters,
+                mask_local=False)
+            if values is None:
+                values = numpy.empty(flat_rows.shape, dtype=column.dtype)
+            values[segment] = column[flat_rows[segment]]
+        if values is None:
+            return numpy.zeros(rows.shape)
+        if rows.ndim == 0:
+            return values[0]
+        return values.reshape(rows.shape)
+
+    def _partially_evaluate(self, addr, simplify=False):
+        if self._addressable:
+            return self._apply_operations(self._draw_addressed(addr), addr, simplify=simplify)
+        return super(LazyArray, self)._partially_evaluate(addr, simplify=simplify)
+
+    def evaluate(self, simplify=False):
+        if self._addressable:
+            return self._partially_evaluate(tuple(slice(None) for dim in self._shape),
+                                            simplify=simplify)
+        return super(LazyArray, self).evaluate(simplify=simplify)
+
     def by_column(self, mask=None):
         """
         Iterate over the columns of the array. Columns will be yielded either
@@ -77,7 +149,7 @@ class LazyArray(larray):
         if mask is not None:
             assert len(mask) == self.ncols
             column_indices = column_indices[mask]
-        if isinstance(self.base_value, RandomDistribution) and self.base_value.rng.parallel_safe:
+        if self._sequential_parallel_safe:
             if mask is None:
                 for j in column_indices:
                     yield self._apply_operations(self.base_value.next(self.nrows, mask_local=False),
@@ -92,6 +164,52 @@ class LazyArray(larray):
             for j in column_indices:
                 yield self._partially_evaluate((slice(None), j), simplify=True)
 
+    def by_column_block(self, block_size, mask=None):
+        """
+        Iterate over blocks of columns of the array. Each item is a tuple
+        `(column_indices, values)`, where `values` is either a 2D array with one
+        column for each index in `column_indices` or a single value (for a flat
+        array).
+
+        `block_size`: the maximum number of columns in each block.
+        `mask`: either `None` or a boolean array indicating which columns should be included.
+
+        The values are the same as those yielded by :meth:`by_column`. In
+        particular, random numbers are drawn column by column, so the result
+        does not depend on `block_size`.
+        """
+        column_indices = numpy.arange(self.ncols)
+        if mask is not None:
+            assert len(mask) == self.ncols
+        if self._sequential_parallel_safe and mask is not None:
+            # we have to draw the random numbers for the non-local columns,
+            # then throw them away
+            for start in xrange(0, self.ncols, block_size):
+                block = column_indices[start:start + block_size]
+                local = mask[start:start + block_size]
+                values = self._draw_columns(block.size)
+                if local.any():
+                    yield block[local], self._apply_operations(values[:, local],
+                                                               (slice(None), block[local]),
+                                                               simplify=True)
+        else:
+            if mask is not None:
+                column_indices = column_indices[mask]
+            for start in xrange(0, column_indices.size, block_size):
+                block = column_indices[start:start + block_size]
+                if isinstance(self.base_value, RandomDistribution) and not self._addressable:
+                    yield block, self._apply_operations(self._draw_columns(block.size),
+                                                        (slice(None), block),
+                                                        simplify=True)
+                else:
+                    yield block, self._partially_evaluate((slice(None), block), simplify=True)
+
+    def _draw_columns(self, n_columns):
+        # random numbers are generated in column-major order, so as to
+        # reproduce the sequence obtained when iterating column by column
+        values = self.base_value.next(self.nrows * n_columns, mask_local=False)
+        return values.reshape((n_columns, self.nrows)).T
+
 
 class Sequence(object):
     """
@@ -295,7 +413,7 @@ class ParameterSpace(object):
             self._evaluated_shape = self._shape
         else:
             for name, value in self._parameters.items():
-                if isinstance(value.base_value, RandomDistribution) and value.base_value.rng.parallel_safe:
+                if value._sequential_parallel_safe:
                     value = value.evaluate()  # can't partially evaluate if using parallel safe
                 self._parameters[name] = value[mask]
             self._evaluated_shape = partial_shape(mask, self._shape)
@@ -375,8 +493,7 @@ class ParameterSpace(object):
 
     @property
     def parallel_safe(self):
-        return any(isinstance(value.base_value, RandomDistribution) and value.base_value.rng.parallel_safe
-                   for value in self._parameters.values())
+        return any(value._sequential_parallel_safe for value in self._parameters.values())
 
 
 def simplify(value):
@@ -4,6 +4,8 @@ common interface so that they can be used interchangeably in PyNN.
 
 Classes:
     NumpyRNG           - uses the numpy.random.RandomState RNG
+    CounterBasedRNG    - provides independent, addressable streams of random
+                         numbers derived from a single seed
     GSLRNG             - uses the RNGs from the Gnu Scientific Library
     NativeRNG          - indicates to the simulator that it should use it's own,
                          built-in RNG
@@ -16,6 +18,7 @@ Classes:
 """
 
 import sys
+import hashlib
 from copy import deepcopy
 import logging
 import numpy.random
@@ -75,6 +78,10 @@ class AbstractRNG(object):
         self.random = self.next
         self.sample = self.next
 
+    # True if the RNG can provide a separate stream of random numbers for each
+    # column of an array, see :class:`CounterBasedRNG`
+    addressable = False
+
     def __repr__(self):
         return "%s(seed=%r)" % (self.__class__.__name__, self.seed)
 
@@ -231,6 +238,70 @@ class NumpyRNG(WrappedRNG):
         return numpy.maximum(numpy.minimum(res, high), low)
 
 
+class CounterBasedRNG(NumpyRNG):
+    """
+    Random number generator which, in addition to the usual sequential
+    interface, provides independent streams of random numbers identified by an
+    address, e.g. the index of a column of a connection matrix. The numbers in
+    a stream depend only on the seed and the address, not on which other
+    streams have been used, so each MPI process can generate just the streams
+    it needs and still obtain the same numbers as a single process would.
+
+    Each stream uses a Mersenne Twister seeded with a SHA-256 hash of the seed
+    and the address.
+
+    When a lazy array is created from a :class:`RandomDistribution` that uses
+    a :class:`CounterBasedRNG`, its elements are drawn from one stream per
+    column, so connectors and parameter maps need only evaluate the local
+    columns.
+    """
+    addressable = True
+
+    def __init__(self, seed=None, parallel_safe=True):
+        if seed is None:
+            seed = numpy.random.randint(0, 2**31 - 1)
+        WrappedRNG.__init__(self, seed, parallel_safe)
+        self._n_keys = 0
+        self._key_source = self
+        self.rng = self._generator(("sequential",))
+
+    def __deepcopy__(self, memo):
+        # copies take their keys from the original object, so that an array
+        # created from a copy never gets the key of an existing array
+        obj = CounterBasedRNG.__new__(CounterBasedRNG)
+        WrappedRNG.__init__(obj, seed=self.seed, parallel_safe=self.parallel_safe)
+        obj._key_source = self._key_source
+        obj.rng = deepcopy(self.rng)
+        return obj
+
+    def _generator(self, address):
+        digest = hashlib.sha256(repr((self.seed,) + tuple(address))).digest()
+        return numpy.random.RandomState(numpy.frombuffer(digest, dtype=numpy.uint32))
+
+    def new_key(self):
+        """
+        Return a new integer key, for use as the first component of a stream
+        address. Keys are allocated in sequence, so they are the same on all
+        MPI processes provided the processes request keys in the same order.
+        Copies of the RNG share the sequence of keys of the original.
+        """
+        source = self._key_source
+        key = source._n_keys
+        source._n_keys += 1
+        return key
+
+    def stream(self, *address):
+        """
+        Return a :class:`NumpyRNG`-like object generating the stream of random
+        numbers with the given address, a tuple of integers.
+        """
+        obj = NumpyRNG.__new__(NumpyRNG)
+        WrappedRNG.__init__(obj, seed=self.seed, parallel_safe=True)
+        obj.num_processes = 1  # each process draws the whole stream, when it needs it
+        obj.rng = self._generator(address)
+        return obj
+
+
 class GSLRNG(WrappedRNG):
     """Wrapper for the GSL random number generators."""
     translations = {
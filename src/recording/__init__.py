@@ -73,6 +73,118 @@ def gather_dict(D, all=False):
     return D
 
 
+def _pack_columns(columns):
+    """
+    Pack a list of 1D arrays of equal length into one contiguous 2D array per
+    dtype, with one row per element and one column per array, so that each
+    group can be sent with the MPI datatype matching its dtype.
+
+    Returns a list of (column indices, packed array) pairs.
+    """
+    columns = [numpy.asarray(column) for column in columns]
+    n = len(columns[0]) if columns else 0
+    groups = []
+    dtypes = []
+    for column in columns:
+        if column.dtype not in dtypes:
+            dtypes.append(column.dtype)
+    for dtype in dtypes:
+        indices = [k for k, column in enumerate(columns) if column.dtype == dtype]
+        data = numpy.empty((n, len(indices)), dtype=dtype)
+        for j, k in enumerate(indices):
+            data[:, j] = columns[k]
+        groups.append((indices, data))
+    return groups
+
+
+def _unpack_columns(groups, num_columns):
+    columns = [None] * num_columns
+    for indices, data in groups:
+        for j, k in enumerate(indices):
+            columns[k] = data[:, j].copy()
+    return columns
+
+
+def gather_columns(columns, all=False):
+    """
+    Gather a list of 1D NumPy arrays of equal length (e.g. the indices and
+    attribute values of connections) from all nodes to the root node, or to
+    all nodes if `all` is True, concatenating the arrays in order of rank.
+
+    Arrays with the same dtype are packed into a single buffer, and each
+    buffer is sent with `Gatherv`/`Allgatherv` in its own datatype, so values
+    are transferred exactly. Nodes which do not receive the data get back
+    their own arrays.
+    """
+    mpi_comm, mpi_flags = get_mpi_comm()
+    groups = _pack_columns(columns)
+    sizes = numpy.array(mpi_comm.allgather(len(columns[0]) if columns else 0), dtype=int)
+    receive = all or mpi_comm.rank == MPI_ROOT
+    gathered = []
+    for indices, data in groups:
+        width = data.shape[1]
+        counts = sizes * width
+        displacements = numpy.zeros_like(counts)
+        numpy.cumsum(counts[:-1], out=displacements[1:])
+        if receive:
+            gdata = numpy.empty((sizes.sum(), width), dtype=data.dtype)
+            recvbuf = [gdata, (counts.tolist(), displacements.tolist())]
+            gathered.append((indices, gdata))
+        else:
+            recvbuf = None
+        if all:
+            mpi_comm.Allgatherv(data, recvbuf)
+        else:
+            mpi_comm.Gatherv(data, recvbuf, root=MPI_ROOT)
+    if not receive:
+        return columns
+    return _unpack_columns(gathered, len(columns))
+
+
+def iter_gather_columns(columns, chunk_size):
+    """
+    Gather a list of 1D NumPy arrays of equal length from all nodes to the
+    root node, as for `gather_columns()`, but in chunks of at most
+    `chunk_size` elements, so that the root node never holds more than one
+    chunk of the gathered data at a time.
+
+    On the root node, yields lists of arrays, one list per chunk, in order of
+    rank. On the other nodes, yields nothing, but the generator must still be
+    run to completion, as each chunk is a collective operation.
+    """
+    mpi_comm, mpi_flags = get_mpi_comm()
+    groups = _pack_columns(columns)
+    sizes = numpy.array(mpi_comm.allgather(len(columns[0]) if columns else 0), dtype=int)
+    offsets = numpy.zeros_like(sizes)  # position of each node's data in the gathered arrays
+    numpy.cumsum(sizes[:-1], out=offsets[1:])
+    rank = mpi_comm.rank
+    for start in xrange(0, sizes.sum(), chunk_size):
+        stop = min(start + chunk_size, sizes.sum())
+        # the range of rows that each node contributes to this chunk. The
+        # contributions are contiguous and in order of rank, so the
+        # displacements follow from the counts alone, and nodes with nothing
+        # to contribute get a count of zero rather than a negative offset.
+        lo = numpy.minimum(numpy.maximum(start - offsets, 0), sizes)
+        hi = numpy.minimum(numpy.maximum(stop - offsets, 0), sizes)
+        rows = numpy.zeros_like(sizes)
+        numpy.cumsum((hi - lo)[:-1], out=rows[1:])
+        gathered = []
+        for indices, data in groups:
+            width = data.shape[1]
+            send = data[lo[rank]:hi[rank]]
+            if rank == MPI_ROOT:
+                gdata = numpy.empty((stop - start, width), dtype=data.dtype)
+                counts = (hi - lo) * width
+                displacements = rows * width
+                recvbuf = [gdata, (counts.tolist(), displacements.tolist())]
+                gathered.append((indices, gdata))
+            else:
+                recvbuf = None
+            mpi_comm.Gatherv(send, recvbuf, root=MPI_ROOT)
+        if rank == MPI_ROOT:
+            yield _unpack_columns(gathered, len(columns))
+
+
 def gather_blocks(data):
     """Gather Neo Blocks"""
     mpi_comm, mpi_flags = get_mpi_comm()
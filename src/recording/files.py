@@ -9,6 +9,7 @@ Classes:
     StandardTextFile
     PickleFile
     NumpyBinaryFile
+    BinaryConnectionFile
     HDF5ArrayFile - requires PyTables
 
 :copyright: Copyright 2006-2013 by the PyNN team, see AUTHORS.
@@ -17,8 +18,9 @@ Classes:
 """
 
 
-import numpy, os, shutil
+import numpy, os, shutil, struct, tempfile
 import cPickle as pickle
+from ast import literal_eval
 
 try:
     import tables
@@ -75,6 +77,21 @@ def savez(file, *args, **kwds):
     shutil.rmtree(direc)
 
 
+def is_binary_connection_file(filename):
+    """
+    Return True if `filename` is a connection file in the format written by
+    :class:`BinaryConnectionFile`.
+    """
+    try:
+        f = open(filename, 'rb')
+    except IOError:
+        return False
+    try:
+        return f.read(len(BinaryConnectionFile.magic)) == BinaryConnectionFile.magic
+    finally:
+        f.close()
+
+
 class BaseFile(object):
     """
     Base class for PyNN File classes.
@@ -120,6 +137,20 @@ class BaseFile(object):
         """
         raise NotImplementedError
 
+    def write_chunks(self, chunks, metadata):
+        """
+        Write data, given as an iterable of NumPy arrays with the same number
+        of columns, and metadata to file. By default, the chunks are
+        concatenated and written with `write()`; file types which can write
+        the data incrementally should override this.
+        """
+        chunks = list(chunks)
+        if chunks:
+            data = numpy.vstack(chunks)
+        else:
+            data = numpy.empty((0, len(metadata.get("columns", []))))
+        self.write(data, metadata)
+
     def read(self):
         """
         Read data from the file and return a NumPy array.
@@ -157,6 +188,16 @@ class StandardTextFile(BaseFile):
         savetxt(self.fileobj, data, fmt='%r', delimiter='\t')
         self.fileobj.close()
 
+    def write_chunks(self, chunks, metadata):
+        __doc__ = BaseFile.write_chunks.__doc__
+        self._check_open()
+        header_lines = ["# %s = %s" % item for item in metadata.items()]
+        self.fileobj.write("\n".join(header_lines) + '\n')
+        savetxt = getattr(numpy, 'savetxt', _savetxt)
+        for data in chunks:
+            savetxt(self.fileobj, data, fmt='%r', delimiter='\t')
+        self.fileobj.close()
+
     def read(self):
         self._check_open()
         return numpy.loadtxt(self.fileobj)
@@ -237,6 +278,172 @@ class NumpyBinaryFile(BaseFile):
         return D
 
 
+class BinaryConnectionFile(BaseFile):
+    """
+    Connection lists are saved as a raw binary array, with the rows sorted by
+    post-synaptic index, preceded by a text header containing the metadata
+    (including the column names and the dtype) and by an index giving, for
+    each post-synaptic index `j`, the range of rows `index[j]:index[j+1]`
+    containing the connections to that cell.
+
+    When reading, the file is memory-mapped, so that only the rows for the
+    requested post-synaptic cells are read from disk. The first two columns
+    of the data must be the pre- and post-synaptic indices.
+    """
+    magic = "PYNNCONN"
+    dtype = numpy.dtype('<f8')
+    index_dtype = numpy.dtype('<i8')
+
+    def __init__(self, filename, mode='r'):
+        """
+        Open a file with the given filename and mode.
+        """
+        if 'b' not in mode:
+            mode += 'b'
+        BaseFile.__init__(self, filename, mode)
+
+    def write(self, data, metadata):
+        __doc__ = BaseFile.write.__doc__
+        self._check_open()
+        columns = self._check_columns(metadata)
+        data = numpy.asarray(data, dtype=self.dtype).reshape((-1, len(columns)))
+        targets = data[:, 1].astype(int)
+        # group the connections by post-synaptic cell, preserving their order
+        order = numpy.argsort(targets, kind='mergesort')
+        counts = numpy.bincount(targets, minlength=max(metadata.get("n_post", 0), 1))
+        self._write_header(columns, metadata, data.shape[0], counts)
+        self.fileobj.write(data[order].tostring())
+        self.fileobj.close()
+
+    def write_chunks(self, chunks, metadata):
+        __doc__ = BaseFile.write_chunks.__doc__
+        self._check_open()
+        columns = self._check_columns(metadata)
+        counts = numpy.zeros((max(metadata.get("n_post", 0), 1),), dtype=int)
+        n_rows = 0
+        # The header needs the number of connections to each post-synaptic
+        # cell, so the chunks are first copied to a temporary file, then
+        # copied from there into place, one chunk at a time.
+        tmp = tempfile.TemporaryFile(dir=os.path.dirname(os.path.abspath(self.name)))
+        try:
+            for data in chunks:
+                data = numpy.asarray(data, dtype=self.dtype).reshape((-1, len(columns)))
+                chunk_counts = numpy.bincount(data[:, 1].astype(int), minlength=counts.size)
+                counts = numpy.hstack((counts, numpy.zeros((chunk_counts.size - counts.size,), dtype=int)))
+                counts += chunk_counts
+                tmp.write(data.tostring())
+                n_rows += data.shape[0]
+            self._write_header(columns, metadata, n_rows, counts)
+            if n_rows > 0:
+                offset = self.fileobj.tell()
+                shape = (n_rows, len(columns))
+                # extend the file to its final size, so it can be memory-mapped
+                self.fileobj.seek(offset + n_rows * len(columns) * self.dtype.itemsize - 1)
+                self.fileobj.write("\0")
+                self.fileobj.flush()
+                tmp.flush()
+                source = numpy.memmap(tmp, dtype=self.dtype, mode='r', shape=shape)
+                target = numpy.memmap(self.name, dtype=self.dtype, mode='r+',
+                                      offset=offset, shape=shape)
+                # next free row for the connections to each post-synaptic cell
+                cursor = numpy.cumsum(counts) - counts
+                rows_per_chunk = max(1, DEFAULT_BUFFER_SIZE // len(columns))
+                for start in xrange(0, n_rows, rows_per_chunk):
+                    data = numpy.asarray(source[start:start + rows_per_chunk])
+                    targets = data[:, 1].astype(int)
+                    order = numpy.argsort(targets, kind='mergesort')
+                    targets = targets[order]
+                    first = targets.searchsorted(targets)  # first row of each target in this chunk
+                    target[cursor[targets] + numpy.arange(targets.size) - first] = data[order]
+                    cursor += numpy.bincount(targets, minlength=cursor.size)
+                target.flush()
+                del source, target
+        finally:
+            tmp.close()
+        self.fileobj.close()
+
+    def _check_columns(self, metadata):
+        columns = list(metadata.get("columns", []))
+        if columns[:2] != ["i", "j"]:
+            raise ValueError("The first two columns of a connection file must be 'i' and 'j'.")
+        return columns
+
+    def _write_header(self, columns, metadata, n_rows, counts):
+        """
+        Write the header and the row index, given the number of connections
+        to each post-synaptic cell, `counts`.
+        """
+        index = numpy.zeros((counts.size + 1,), dtype=self.index_dtype)
+        numpy.cumsum(counts, out=index[1:])
+        header = dict(metadata)
+        header.update(columns=columns, dtype=self.dtype.str,
+                      n_rows=n_rows, n_post=counts.size)
+        header = repr(header)
+        header += " " * (-(len(self.magic) + 8 + len(header)) % self.dtype.itemsize)
+        self.fileobj.write(self.magic)
+        self.fileobj.write(struct.pack("<Q", len(header)))
+        self.fileobj.write(header)
+        self.fileobj.write(index.tostring())
+
+    def get_metadata(self):
+        __doc__ = BaseFile.get_metadata.__doc__
+        self._check_open()
+        self.fileobj.seek(0)
+        if self.fileobj.read(len(self.magic)) != self.magic:
+            raise IOError("%s is not a PyNN binary connection file" % self.name)
+        header_length, = struct.unpack("<Q", self.fileobj.read(8))
+        metadata = literal_eval(self.fileobj.read(header_length))
+        self.fileobj.seek(0)
+        self._data_offset = len(self.magic) + 8 + header_length
+        return metadata
+
+    def read_index(self):
+        """
+        Return the row index, as a memory-mapped array with one more element
+        than the number of post-synaptic cells.
+        """
+        metadata = self.get_metadata()
+        return numpy.memmap(self.name, dtype=self.index_dtype, mode='r',
+                            offset=self._data_offset,
+                            shape=(metadata["n_post"] + 1,))
+
+    def read(self):
+        __doc__ = BaseFile.read.__doc__
+        metadata = self.get_metadata()
+        shape = (metadata["n_rows"], len(metadata["columns"]))
+        if shape[0] == 0:
+            return numpy.zeros(shape, dtype=metadata["dtype"])
+        offset = self._data_offset + (metadata["n_post"] + 1) * self.index_dtype.itemsize
+        return numpy.memmap(self.name, dtype=metadata["dtype"], mode='r',
+                            offset=offset, shape=shape)
+
+    def read_targets(self, targets, chunk_size=DEFAULT_BUFFER_SIZE):
+        """
+        Iterate over the connections to the post-synaptic cells with indices
+        `targets`, yielding arrays of at most about `chunk_size` rows (a
+        single cell with more connections gives a larger chunk).
+        """
+        index = self.read_index()
+        data = self.read()
+        targets = numpy.asarray(targets, dtype=int)
+        targets = targets[targets < index.size - 1]
+        starts = numpy.asarray(index[targets])
+        counts = numpy.asarray(index[targets + 1]) - starts
+        targets, starts, counts = targets[counts > 0], starts[counts > 0], counts[counts > 0]
+        cumulative = numpy.cumsum(counts)
+        first = 0
+        while first < targets.size:
+            offset = first > 0 and cumulative[first - 1] or 0
+            last = max(first + 1,
+                       numpy.searchsorted(cumulative, offset + chunk_size, side='right'))
+            # contiguous row ranges for the targets in this chunk
+            n = counts[first:last]
+            rows = numpy.arange(n.sum()) - numpy.repeat(numpy.cumsum(n) - n, n) \
+                   + numpy.repeat(starts[first:last], n)
+            yield numpy.asarray(data[rows])
+            first = last
+
+
 if have_hdf5:
     class HDF5ArrayFile(BaseFile):
         """
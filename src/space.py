@@ -6,6 +6,8 @@ Classes:
 
   Space           - representation of a Cartesian space for use in calculating
                     distances
+  CellList        - a spatial index, for finding all pairs of points within a
+                    given distance of each other
 
   Line            - represents a structure with neurons distributed evenly on a
                     straight line.
@@ -124,8 +126,32 @@ class Space(object):
         numpy.sqrt(d, d)
         return d.flatten()
 
+    def paired_distances(self, A, B):
+        """
+        Calculate the distances between corresponding points in two sets of
+        coordinates of equal length, given the topology of the current space.
+        """
+        assert A.shape == B.shape
+        assert A.shape[-1] == 3
+        B = self.scale_factor*(B + self.offset)
+        d = numpy.zeros(A.shape[:-1], dtype=float)
+        for axis in self.axes:
+            diff = A[..., axis] - B[..., axis]
+            if self.periodic_boundaries is not None:
+                boundaries = self.periodic_boundaries[axis]
+                if boundaries is not None:
+                    range = boundaries[1] - boundaries[0]
+                    ad = abs(diff)
+                    diff = numpy.minimum(ad, range-ad)
+            d += diff**2
+        return numpy.sqrt(d)
+
     def distance_generator(self, f, g):
         def distance_map(i, j):
+            if (isinstance(i, numpy.ndarray) and isinstance(j, numpy.ndarray)
+                and i.ndim == 1 and j.ndim == 1):
+                # i and j are paired, e.g. the addresses of a sparse set of connections
+                return self.paired_distances(f(i), g(j))
             shape = []
             if isinstance(i, numpy.ndarray) and i.ndim == 2:
                 i = i[:, 0]
@@ -141,6 +167,134 @@ class Space(object):
         return distance_map
 
 
+class CellList(object):
+    """
+    Spatial index over a set of points, for finding all pairs of points within
+    a given distance of each other without calculating the full distance
+    matrix.
+
+    The points are sorted into a uniform grid of cells whose sides are at least
+    `cell_size` long, so that all points within `cell_size` of a given point
+    are found in the same or in neighbouring cells. Only the axes of `space`
+    are considered, and the grid wraps around along any axis with periodic
+    boundaries.
+
+    Arguments:
+        positions:
+            an (N, 3) array of coordinates.
+        cell_size:
+            the minimum side length of the cells. This should normally be the
+            largest distance that will be searched for.
+        space:
+            a :class:`Space` object.
+    """
+    # limits the number of (mostly empty) cells for very sparse point sets
+    max_cells_per_point = 4
+
+    def __init__(self, positions, cell_size, space):
+        assert cell_size > 0
+        self.cell_size = cell_size
+        self.positions = positions
+        self.space = space
+        n_points = positions.shape[0]
+        axes = space.axes
+        lower = numpy.zeros(len(axes))
+        extent = numpy.zeros(len(axes))
+        self.periodic = numpy.zeros(len(axes), dtype=bool)
+        coords = positions[:, axes]
+        for k, axis in enumerate(axes):
+            boundaries = space.periodic_boundaries and space.periodic_boundaries[axis]
+            if boundaries is not None:
+                self.periodic[k] = True
+                lower[k] = boundaries[0]
+                extent[k] = boundaries[1] - boundaries[0]
+            elif n_points > 0:
+                lower[k] = coords[:, k].min()
+                extent[k] = coords[:, k].max() - lower[k]
+        while True:
+            n_cells = numpy.where(self.periodic,
+                                  numpy.maximum(numpy.floor(extent / cell_size), 1),
+                                  numpy.floor(extent / cell_size) + 1).astype(int)
+            if n_cells.prod() <= max(self.max_cells_per_point * n_points, 1):
+                break
+            cell_size *= 2
+        self.lower = lower
+        self.n_cells = n_cells
+        self.cell_width = numpy.where(self.periodic, extent / n_cells, cell_size)
+        cell_ids = self._cell_ids(self._cell_coordinates(coords))
+        self._order = numpy.argsort(cell_ids, kind='mergesort')
+        self._counts = numpy.bincount(cell_ids, minlength=n_cells.prod())
+        self._starts = numpy.cumsum(self._counts) - self._counts
+
+    def _cell_coordinates(self, coords):
+        relative = coords - self.lower
+        for k in numpy.flatnonzero(self.periodic):
+            extent = self.cell_width[k] * self.n_cells[k]
+            relative[:, k] = numpy.mod(relative[:, k], extent)
+        cell_coords = numpy.floor(relative / self.cell_width).astype(int)
+        return cell_coords
+
+    def _cell_ids(self, cell_coords):
+        # coordinates outside the grid are clipped to the outermost cells
+        cell_coords = numpy.clip(cell_coords, 0, self.n_cells - 1)
+        return numpy.ravel_multi_index(cell_coords.T, self.n_cells)
+
+    def _neighbour_offsets(self):
+        offsets = []
+        for k in range(len(self.n_cells)):
+            if self.periodic[k] and self.n_cells[k] < 3:
+                offsets.append(numpy.arange(self.n_cells[k]))
+            else:
+                offsets.append(numpy.array([-1, 0, 1]))
+        grids = numpy.indices([len(o) for o in offsets])
+        return numpy.array([o[g.flatten()] for o, g in zip(offsets, grids)]).T
+
+    def pairs_within(self, points, max_distance):
+        """
+        Find all pairs of points, one from the index and one from `points`, an
+        (M, 3) array of coordinates, that are no further than `max_distance`
+        apart. `max_distance` may not be larger than the `cell_size` given when
+        creating the index. The distances are calculated as for :meth:`Space.distances`, so
+        the scale factor and offset of the space are applied to `points`.
+
+        Returns a tuple `(i, j, d)`, where `i` contains indices into the indexed
+        positions, `j` indices into `points` and `d` the distances, sorted by
+        `j`, then by `i`.
+        """
+        assert max_distance <= self.cell_size, "max_distance may not be larger than the cell size"
+        transformed = self.space.scale_factor * (points + self.space.offset)
+        query_cells = self._cell_coordinates(transformed[:, self.space.axes])
+        i_parts, j_parts = [], []
+        query_indices = numpy.arange(points.shape[0])
+        for offset in self._neighbour_offsets():
+            cells = query_cells + offset
+            valid = numpy.ones(points.shape[0], dtype=bool)
+            for k in range(len(self.n_cells)):
+                if self.periodic[k]:
+                    cells[:, k] = numpy.mod(cells[:, k], self.n_cells[k])
+                else:
+                    valid &= (cells[:, k] >= 0) & (cells[:, k] < self.n_cells[k])
+            cell_ids = numpy.ravel_multi_index(cells[valid].T, self.n_cells)
+            counts = self._counts[cell_ids]
+            total = counts.sum()
+            if total == 0:
+                continue
+            # positions in self._order of the points in each neighbouring cell
+            first = numpy.repeat(self._starts[cell_ids] - (numpy.cumsum(counts) - counts), counts)
+            i_parts.append(self._order[first + numpy.arange(total)])
+            j_parts.append(numpy.repeat(query_indices[valid], counts))
+        if i_parts:
+            i = numpy.hstack(i_parts)
+            j = numpy.hstack(j_parts)
+        else:
+            i = j = numpy.zeros((0,), dtype=int)
+        d = self.space.paired_distances(self.positions[i], points[j])
+        within = d <= max_distance
+        i, j, d = i[within], j[within], d[within]
+        order = numpy.lexsort((i, j))
+        return i[order], j[order], d[order]
+
+
 class BaseStructure(object):
 
     def __repr__(self):
@@ -0,0 +1,68 @@
+"""
+Benchmark of creating NEST populations with heterogeneous parameters, and of
+setting heterogeneous parameters, comparing the columnar approach used by
+pyNN.nest (homogeneous parameters given to Create, then one SetStatus call
+per heterogeneous parameter) with the previous approach of passing one
+parameter dict per cell.
+
+Usage: python nest_parameters_benchmark.py [n_cells ...]
+"""
+
+import sys
+import numpy
+import nest
+from pyNN.utility import Timer
+import pyNN.nest as sim
+from pyNN.random import RandomDistribution, NumpyRNG
+
+sizes = [int(x) for x in sys.argv[1:]] or [1000, 10000, 100000]
+timer = Timer()
+
+
+def random_celltype(rng):
+    return sim.IF_cond_exp(tau_m=RandomDistribution('uniform', (10.0, 20.0), rng=rng),
+                           v_thresh=RandomDistribution('normal', (-50.0, 1.0), rng=rng),
+                           cm=1.0, tau_refrac=2.0)
+
+
+def create_dict_per_cell(n):
+    """The previous implementation: one dict per cell."""
+    celltype = random_celltype(NumpyRNG(seed=298761))
+    parameter_space = celltype.native_parameters
+    parameter_space.shape = (n,)
+    parameter_space.evaluate()
+    cell_parameters = list(parameter_space)
+    for D in cell_parameters:
+        D.update(celltype.extra_parameters)
+    return nest.Create(celltype.nest_name['on_grid'], n, params=cell_parameters)
+
+
+def create_columnar(n):
+    return sim.Population(n, random_celltype(NumpyRNG(seed=298761)))
+
+
+def set_dict_per_cell(p):
+    values = numpy.random.uniform(-55.0, -50.0, size=p.size)
+    nest.SetStatus(p.all_cells.tolist(), [{'V_th': v} for v in values])
+
+
+def set_columnar(p):
+    p.set(v_thresh=numpy.random.uniform(-55.0, -50.0, size=p.size))
+
+
+print "%10s %16s %16s %16s %16s" % ("n_cells", "create (dicts)", "create (columns)",
+                                     "set (dicts)", "set (columns)")
+for n in sizes:
+    sim.setup(spike_precision="on_grid", verbosity="error")
+    timer.start()
+    create_dict_per_cell(n)
+    t_create_dicts = timer.diff()
+    p = create_columnar(n)
+    t_create_columns = timer.diff()
+    set_dict_per_cell(p)
+    t_set_dicts = timer.diff()
+    set_columnar(p)
+    t_set_columns = timer.diff()
+    print "%10d %16.3f %16.3f %16.3f %16.3f" % (n, t_create_dicts, t_create_columns,
+                                                 t_set_dicts, t_set_columns)
+sim.end()
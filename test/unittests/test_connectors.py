@@ -13,8 +13,11 @@ except ImportError:
 from pyNN import connectors, random, errors, space, recording
 import numpy
 import os
+import shutil
+import tempfile
 from numpy.testing import assert_array_equal, assert_array_almost_equal
 from .mocks import MockRNG, MockRNG2
+from pyNN.parameters import LazyArray
 import pyNN.mock as sim
 
 orig_mpi_get_config = random.get_mpi_config
@@ -128,6 +131,25 @@ class TestAllToAllConnector(unittest.TestCase):
                                                [nan, 7.0, nan, 15.0, nan]]),
                                   9)
 
+    def test_block_connect_same_as_column_connect(self):
+        def connect(max_block_elements):
+            rd = random.RandomDistribution('uniform', (0, 1), rng=MockRNG(delta=1.0, parallel_safe=True))
+            syn = sim.StaticSynapse(weight=rd, delay="0.2 + d")
+            C = connectors.AllToAllConnector(safe=False)
+            C.max_block_elements = max_block_elements
+            prj = sim.Projection(self.p1, self.p2, C, syn)
+            return C, prj
+        # max_block_elements=0 connects one column at a time, with _standard_connect()
+        C, prj = connect(0)
+        expected = prj.get(["weight", "delay"], format='list', gather=False)
+        self.assertEqual(len(expected), 8)
+        block_sizes = []
+        for max_block_elements in (1, 8, 10**9):  # one column, two columns, all columns per block
+            C, prj = connect(max_block_elements)
+            block_sizes.append(C._block_size(prj))
+            self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False), expected)
+        self.assertEqual(block_sizes, [1, 2, 10**9 // self.p1.size])
+
     def test_connect_with_distance_dependent_weights(self):
         d_expr = "d+100"
         syn = sim.StaticSynapse(weight=d_expr, delay=0.5)
@@ -260,6 +282,126 @@ class TestFixedProbabilityConnector(unittest.TestCase):
                                                [nan, 1.4, nan, nan, nan]]),
                                   9)
 
+    def test_connect_with_addressable_rng(self):
+        # with a CounterBasedRNG, only the local columns are evaluated, but the
+        # connections and weights are the same as for a single process
+        connections = []
+        for num_processes, rank in ((1, 0), (2, 1)):
+            sim.setup(num_processes=num_processes, rank=rank)
+            rng = random.CounterBasedRNG(seed=7264)
+            C = connectors.FixedProbabilityConnector(p_connect=0.3, rng=rng)
+            syn = sim.StaticSynapse(weight=random.RandomDistribution('uniform', (0, 1), rng=rng))
+            prj = sim.Projection(sim.Population(30, sim.IF_cond_exp()),
+                                 sim.Population(20, sim.IF_cond_exp()), C, syn)
+            self.assertFalse(C._parallel_safe(prj))
+            connections.append(prj.get("weight", format='list', gather=False))
+        all_connections, local_connections = connections
+        self.assertEqual(local_connections,
+                         [c for c in all_connections if c[1] % 2 == 1])
+
+    def test_connect_with_addressable_rng_no_local_cells(self):
+        # the first projection has no post-synaptic cells on rank 1, but the
+        # streams used by the second projection must be the same on all ranks
+        connections = []
+        for num_processes, rank in ((1, 0), (2, 1)):
+            sim.setup(num_processes=num_processes, rank=rank)
+            rng = random.CounterBasedRNG(seed=7264)
+            pre = sim.Population(30, sim.IF_cond_exp())
+            empty = sim.Population(1, sim.IF_cond_exp())
+            sim.Projection(pre, empty,
+                           connectors.FixedProbabilityConnector(p_connect=0.3, rng=rng),
+                           sim.StaticSynapse(weight=random.RandomDistribution('uniform', (0, 1), rng=rng)))
+            C = connectors.FixedProbabilityConnector(p_connect=0.3, rng=rng)
+            syn = sim.StaticSynapse(weight=random.RandomDistribution('uniform', (0, 1), rng=rng))
+            prj = sim.Projection(pre, sim.Population(20, sim.IF_cond_exp()), C, syn)
+            connections.append(prj.get("weight", format='list', gather=False))
+        self.assertFalse(empty._mask_local.any())
+        all_connections, local_connections = connections
+        self.assertGreater(len(local_connections), 0)
+        self.assertEqual(local_connections,
+                         [c for c in all_connections if prj.post._mask_local[c[1]]])
+
+    def test_weights_independent_of_connection_draws(self):
+        # the synapse parameters are copied when translated, but the copied RNG
+        # must not give the weights the stream used for the connection map
+        sim.setup(num_processes=1, rank=0)
+        rng = random.CounterBasedRNG(seed=7264)
+        C = connectors.FixedProbabilityConnector(p_connect=0.3, rng=rng)
+        syn = sim.StaticSynapse(weight=random.RandomDistribution('uniform', (0, 1), rng=rng))
+        prj = sim.Projection(sim.Population(30, sim.IF_cond_exp()),
+                             sim.Population(20, sim.IF_cond_exp()), C, syn)
+        weights = numpy.array(prj.get("weight", format='list', gather=False))[:, 2]
+        self.assertGreater(weights.size, 50)
+        # if the weights were the connection draws, they would all be < p_connect
+        self.assertTrue((weights >= 0.3).any())
+
+    def test_connect_with_threads(self):
+        # with addressable RNGs, the blocks may be evaluated in any order
+        connections = []
+        for threads in (1, 3):
+            sim.setup(num_processes=2, rank=1)
+            rng = random.CounterBasedRNG(seed=7264)
+            C = connectors.FixedProbabilityConnector(p_connect=0.3, rng=rng)
+            C.threads = threads
+            C.max_block_elements = 60  # two post-synaptic cells per block
+            syn = sim.StaticSynapse(weight=random.RandomDistribution('uniform', (0, 1), rng=rng))
+            prj = sim.Projection(sim.Population(30, sim.IF_cond_exp()),
+                                 sim.Population(20, sim.IF_cond_exp()), C, syn)
+            connections.append(prj.get("weight", format='list', gather=False))
+            self.assertEqual(rng._n_keys, 2)
+        self.assertEqual(connections[0], connections[1])
+        self.assertGreater(len(connections[0]), 0)
+
+    def test_connect_with_threads_and_sequential_rng(self):
+        # numbers must be drawn in sequence, so a single thread is used
+        C = connectors.FixedProbabilityConnector(p_connect=0.5,
+                                                 rng=MockRNG(delta=0.1, parallel_safe=False))
+        self.assertFalse(C._prepare_threads(
+            LazyArray(random.RandomDistribution('uniform', (0, 1), rng=C.rng), shape=(3, 4)),
+            {}))
+        C.threads = 4
+        prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse())
+        C2 = connectors.FixedProbabilityConnector(p_connect=0.5,
+                                                  rng=MockRNG(delta=0.1, parallel_safe=False))
+        prj2 = sim.Projection(self.p1, self.p2, C2, sim.StaticSynapse())
+        self.assertEqual(prj.get("weight", format='list', gather=False),
+                         prj2.get("weight", format='list', gather=False))
+
+    def test_connect_sparse(self):
+        # with p=0.5, u=0.5 gives a gap of 2, u=0.75 a gap of 3, etc.
+        uniforms = [0.5, 0.75, 0, 0.5, 0.875, 0, 0, 0.75, 0.5, 0.5] + [0.9]*10
+        C = connectors.FixedProbabilityConnector(p_connect=0.5, sparse=True,
+                                                 rng=MockRNG2(numpy.array(uniforms),
+                                                              parallel_safe=True))
+        syn = sim.StaticSynapse()
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        # connections are created at positions 1, 4, 5, 7, 11, 12, 13, 16, 18
+        # of the flattened (column-major) connection matrix:
+        # (1,0), (0,1), (1,1), (3,1), (3,2), (0,3), (1,3), (0,4), (2,4)
+        # of these, (0,1), (1,1), (3,1), (0,3), (1,3) are created on this node
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 1, 0.0, 0.123),
+                          (1, 1, 0.0, 0.123),
+                          (3, 1, 0.0, 0.123),
+                          (0, 3, 0.0, 0.123),
+                          (1, 3, 0.0, 0.123)])
+
+    def test_connect_sparse_independent_of_num_processes(self):
+        connections = []
+        for num_processes, rank in ((1, 0), (2, 1)):
+            sim.setup(num_processes=num_processes, rank=rank)
+            p1 = sim.Population(100, sim.IF_cond_exp())
+            p2 = sim.Population(80, sim.HH_cond_exp())
+            C = connectors.FixedProbabilityConnector(p_connect=0.05, sparse=True,
+                                                     rng=random.NumpyRNG(seed=42, parallel_safe=True))
+            C.max_block_elements = 1000
+            prj = sim.Projection(p1, p2, C, sim.StaticSynapse())
+            connections.append(prj.get("weight", format='list', gather=False))
+        all_connections, local_connections = connections
+        self.assertTrue(300 < len(all_connections) < 500)
+        self.assertEqual(local_connections,
+                         [c for c in all_connections if c[1] % 2 == 1])
+
     #def test_connect_with_random_delays_parallel_unsafe(self):
     #    rd = random.RandomDistribution('uniform', [0.1, 1.1], rng=MockRNG(start=1.0, delta=0.2, parallel_safe=False))
     #    syn = sim.StaticSynapse(delay=rd)
@@ -302,6 +444,37 @@ class TestDistanceDependentProbabilityConnector(unittest.TestCase):
                           (2, 3, 0.0, 0.123),
                           (3, 3, 0.0, 0.123)])
 
+    def test_connect_with_max_distance(self):
+        # random numbers are only drawn for pairs within max_distance:
+        # (0,0), (1,0), (0,1), (1,1), (2,1), (1,2), (2,2), (3,2), (2,3), (3,3), (3,4)
+        C = connectors.DistanceDependentProbabilityConnector(d_expression="0.7",
+                                                             max_distance=1.0,
+                                                             rng=MockRNG(delta=0.1))
+        syn = sim.StaticSynapse(weight="d")
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        # connections are created for the first seven of these pairs;
+        # of these, (0,1), (1,1), (2,1) are created on this node
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 1, 1.0, 0.123),
+                          (1, 1, 0.0, 0.123),
+                          (2, 1, 1.0, 0.123)])
+
+    def test_connect_with_max_distance_same_as_without(self):
+        # when the probability is zero beyond max_distance, the connections
+        # are statistically, but not exactly, the same as without max_distance
+        p1 = sim.Population(400, sim.IF_cond_exp(), structure=space.Grid2D())
+        connections = []
+        for max_distance in (None, 2.0):
+            C = connectors.DistanceDependentProbabilityConnector(d_expression="0.5*(d<2)",
+                                                                 max_distance=max_distance,
+                                                                 rng=random.NumpyRNG(seed=8734))
+            prj = sim.Projection(p1, p1, C, sim.StaticSynapse(weight="d"))
+            connections.append(numpy.array(prj.get("weight", format='list', gather=False)))
+        for conn in connections:
+            self.assertTrue((conn[:, 2] < 2).all())
+        n_without, n_with = [len(conn) for conn in connections]
+        self.assertTrue(abs(n_with - n_without) < 0.2 * n_without)
+
 
 class TestFromListConnector(unittest.TestCase):
 
@@ -338,6 +511,16 @@ class TestFromListConnector(unittest.TestCase):
         syn = sim.StaticSynapse()
         self.assertRaises(errors.ConnectionError, sim.Projection, self.p1, self.p2, C, syn)
 
+    def test_connect_with_out_of_range_target_index(self):
+        connection_list = [
+            (0, 1, 0.1, 0.1),  # local
+            (3, 5, 0.2, 0.11),  # NON-EXISTENT
+            (2, 3, 0.3, 0.12),  # local
+            ]
+        C = connectors.FromListConnector(connection_list)
+        syn = sim.StaticSynapse()
+        self.assertRaises(errors.ConnectionError, sim.Projection, self.p1, self.p2, C, syn)
+
     def test_with_plastic_synapse(self):
         connection_list = [
             (0, 0, 0.1, 0.1, 100, 400),
@@ -353,6 +536,51 @@ class TestFromListConnector(unittest.TestCase):
                          [(0, 1, 0.5, 0.14, 88.8, 800.0, 104.0),
                           (2, 3, 0.3, 0.12, 88.8, 600.0, 102.0)])
 
+    def test_connect_with_chunks(self):
+        chunks = [numpy.array([(0, 0, 0.1, 0.1),
+                               (3, 3, 0.2, 0.11),    # local
+                               (2, 3, 0.3, 0.12)]),  # local
+                  numpy.array([(2, 2, 0.4, 0.13),
+                               (0, 1, 0.5, 0.14),    # local
+                               (1, 3, 0.6, 0.15)])]  # local
+        syn = sim.StaticSynapse()
+        for conn_list in (chunks, iter(chunks)):
+            C = connectors.FromListConnector(conn_list)
+            prj = sim.Projection(self.p1, self.p2, C, syn)
+            # connections are sorted by target, then in the order given
+            self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                             [(0, 1, 0.5, 0.14),
+                              (3, 3, 0.2, 0.11),
+                              (2, 3, 0.3, 0.12),
+                              (1, 3, 0.6, 0.15)])
+
+    def test_connect_with_memmap(self):
+        dtype = numpy.dtype([('i', int), ('j', int), ('weight', float), ('U', float)])
+        filename = "test_connect_with_memmap.npy"
+        conn_list = numpy.memmap(filename, dtype=dtype, mode='w+', shape=(5,))
+        conn_list[:] = [(0, 0, 0.1, 0.6),
+                        (3, 0, 0.2, 0.7),
+                        (2, 3, 0.3, 0.8),  # local
+                        (2, 2, 0.4, 0.9),
+                        (0, 1, 0.5, 0.95)]  # local
+        conn_list.flush()
+        C = connectors.FromListConnector(numpy.memmap(filename, dtype=dtype, mode='r'))
+        C.chunk_size = 2
+        syn = sim.TsodyksMarkramSynapse(delay=0.2)
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        self.assertEqual(C.column_names, ('weight', 'U'))
+        self.assertEqual(prj.get(["weight", "delay", "U"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 1, 0.5, 0.2, 0.95),
+                          (2, 3, 0.3, 0.2, 0.8)])
+        del C, conn_list
+        os.remove(filename)
+
+    def test_chunks_with_wrong_number_of_columns(self):
+        chunks = iter([numpy.array([(0, 1, 0.1, 0.1, 0.5)])])
+        C = connectors.FromListConnector(chunks)
+        syn = sim.StaticSynapse()
+        self.assertRaises(ValueError, sim.Projection, self.p1, self.p2, C, syn)
+
 
 class TestFromFileConnector(unittest.TestCase):
 
@@ -410,24 +638,133 @@ class TestFromFileConnector(unittest.TestCase):
                          [(0, 1, 0.5, 0.14, 140.0, 96.0, 88.8),
                           (2, 3, 0.3, 0.12, 120.0, 98.0, 88.8)])
 
+    def test_connect_with_binary_file(self):
+        file = recording.files.BinaryConnectionFile("test.connections", mode='w')
+        file.write(self.connection_list, {"columns": ["i", "j", "weight", "delay"]})
+        C = connectors.FromFileConnector("test.connections")
+        self.assertIsInstance(C.file, recording.files.BinaryConnectionFile)
+        C.chunk_size = 1
+        syn = sim.StaticSynapse()
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 1, 0.5, 0.14),
+                          (2, 3, 0.3, 0.12)])
+
+    def test_save_and_load_binary_file(self):
+        sim.setup(num_processes=2, rank=0, min_delay=0.123)  # only rank 0 writes to file
+        self.p1 = sim.Population(4, sim.IF_cond_exp(), structure=space.Line())
+        self.p2 = sim.Population(5, sim.HH_cond_exp(), structure=space.Line())
+        prj = sim.Projection(self.p1, self.p2,
+                             connectors.FromListConnector(self.connection_list),
+                             sim.StaticSynapse())
+        prj.save("connections",
+                 recording.files.BinaryConnectionFile("test.connections", mode='w'),
+                 gather=False)
+        prj2 = sim.Projection(self.p1, self.p2,
+                              connectors.FromFileConnector("test.connections"),
+                              sim.StaticSynapse())
+        self.assertEqual(prj2.get(["weight", "delay"], format='list', gather=False),
+                         [(0, 0, 0.1, 0.1),
+                          (3, 0, 0.2, 0.11),
+                          (2, 2, 0.4, 0.13)])
+
+
+class TestFixedNumberPostConnector(unittest.TestCase):
+
+    def setUp(self):
+        sim.setup(num_processes=2, rank=1, min_delay=0.123)
+        self.p1 = sim.Population(4, sim.IF_cond_exp(), structure=space.Line())
+        self.p2 = sim.Population(5, sim.HH_cond_exp(), structure=space.Line())
+        assert_array_equal(self.p2._mask_local, numpy.array([0,1,0,1,0], dtype=bool))
+
+    def _all_connections(self, pre_size, post_size, connector, same_population=False):
+        sim.setup(num_processes=1, rank=0, min_delay=0.123)
+        p1 = sim.Population(pre_size, sim.IF_cond_exp())
+        p2 = same_population and p1 or sim.Population(post_size, sim.IF_cond_exp())
+        prj = sim.Projection(p1, p2, connector, sim.StaticSynapse())
+        return [(int(i), int(j)) for i, j, w in prj.get("weight", format='list', gather=False)]
+
+    def test_with_replacement(self):
+        # targets are floor(5*u): (0, 1, 2), (3, 4, 0), (1, 1, 4), (2, 3, 0)
+        uniforms = numpy.array([0.0, 0.2, 0.4, 0.6, 0.8, 0.0, 0.2, 0.2, 0.9, 0.5, 0.7, 0.1])
+        C = connectors.FixedNumberPostConnector(n=3, with_replacement=True,
+                                                rng=MockRNG2(uniforms, parallel_safe=True))
+        syn = sim.StaticSynapse()
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 1, 0.0, 0.123),
+                          (2, 1, 0.0, 0.123),
+                          (2, 1, 0.0, 0.123),
+                          (1, 3, 0.0, 0.123),
+                          (3, 3, 0.0, 0.123)])
+
+    def test_with_n_smaller_than_population_size(self):
+        C = connectors.FixedNumberPostConnector(n=3, rng=random.NumpyRNG(seed=9371))
+        connections = self._all_connections(20, 7, C)
+        for i in range(20):
+            targets = [post for pre, post in connections if pre == i]
+            self.assertEqual(len(targets), 3)
+            self.assertEqual(len(set(targets)), 3)
 
-#class TestFixedNumberPostConnector(unittest.TestCase):
-#
-#    def setUp(self):
-#        sim.setup(num_processes=2, rank=1, min_delay=0.123)
-#        self.p1 = sim.Population(4, sim.IF_cond_exp(), structure=space.Line())
-#        self.p2 = sim.Population(5, sim.HH_cond_exp(), structure=space.Line())
-#        assert_array_equal(self.p2._mask_local, numpy.array([0,1,0,1,0], dtype=bool))
-#
-#    def test_with_n_smaller_than_population_size(self):
-#        C = connectors.FixedNumberPostConnector(n=3, rng=MockRNG(delta=1))
-#        syn = sim.StaticSynapse()
-#        prj = sim.Projection(self.p1, self.p2, C, syn)
-#        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
-#                         [(0, 3, 0.0, 0.123),
-#                          (1, 3, 0.0, 0.123),
-#                          (2, 3, 0.0, 0.123),
-#                          (3, 3, 0.0, 0.123),])
+    def test_with_n_larger_than_population_size(self):
+        C = connectors.FixedNumberPostConnector(n=12, rng=random.NumpyRNG(seed=9371))
+        connections = self._all_connections(4, 5, C)
+        for i in range(4):
+            targets = [post for pre, post in connections if pre == i]
+            self.assertEqual(len(targets), 12)
+            self.assertEqual(sorted(set(targets)), range(5))
+            self.assertTrue(all(2 <= targets.count(j) <= 3 for j in range(5)))
+
+    def test_with_variable_n(self):
+        n = random.RandomDistribution('binomial', (5, 0.5), rng=random.NumpyRNG(seed=7))
+        expected_n = random.RandomDistribution('binomial', (5, 0.5), rng=random.NumpyRNG(seed=7)).next(130)[100:]  # the connector draws 100 values to check n
+        C = connectors.FixedNumberPostConnector(n=n, rng=random.NumpyRNG(seed=9371))
+        connections = self._all_connections(30, 10, C)
+        self.assertEqual([len([pre for pre, post in connections if pre == i]) for i in range(30)],
+                         list(expected_n))
+
+    def test_no_self_connections(self):
+        for with_replacement in (True, False):
+            C = connectors.FixedNumberPostConnector(n=8, with_replacement=with_replacement,
+                                                    allow_self_connections=False,
+                                                    rng=random.NumpyRNG(seed=9371))
+            connections = self._all_connections(10, 10, C, same_population=True)
+            self.assertEqual(len(connections), 80)
+            self.assertFalse(any(pre == post for pre, post in connections))
+
+    def test_no_mutual_connections(self):
+        C = connectors.FixedNumberPostConnector(n=3, allow_self_connections='NoMutual',
+                                                rng=random.NumpyRNG(seed=9371))
+        connections = self._all_connections(10, 10, C, same_population=True)
+        self.assertTrue(all(pre > post for pre, post in connections))
+        self.assertEqual(len([pre for pre, post in connections if pre == 5]), 3)
+
+    def test_parallel_safe(self):
+        C = connectors.FixedNumberPostConnector(n=3, rng=random.NumpyRNG(seed=9371, parallel_safe=True))
+        all_connections = self._all_connections(4, 5, C)
+        sim.setup(num_processes=2, rank=1, min_delay=0.123)
+        C = connectors.FixedNumberPostConnector(n=3, rng=random.NumpyRNG(seed=9371, parallel_safe=True))
+        prj = sim.Projection(sim.Population(4, sim.IF_cond_exp()),
+                             sim.Population(5, sim.IF_cond_exp()),
+                             C, sim.StaticSynapse())
+        local_connections = [(int(i), int(j)) for i, j, w in prj.get("weight", format='list', gather=False)]
+        self.assertEqual(local_connections,
+                         [(i, j) for i, j in all_connections if j % 2 == 1])
+
+    def test_parallel_safe_rng_connects_all_columns(self):
+        C = connectors.FixedNumberPostConnector(n=3, rng=random.NumpyRNG(seed=9371, parallel_safe=True))
+        calls = []
+        C._connect_blocks = lambda projection, blocks, parallel_safe: calls.append((list(blocks), parallel_safe))
+        prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse())
+        blocks, used_parallel_safe = calls[0]
+        self.assertTrue(used_parallel_safe)
+        columns = numpy.hstack([block[0] for block in blocks])
+        assert_array_equal(columns, numpy.arange(self.p2.size))
+
+    def test_requires_parallel_safe_rng_with_several_processes(self):
+        C = connectors.FixedNumberPostConnector(n=3, rng=random.NumpyRNG(seed=9371, parallel_safe=False))
+        self.assertRaises(errors.ConnectionError,
+                          sim.Projection, self.p1, self.p2, C, sim.StaticSynapse())
 
 
 class TestFixedNumberPreConnector(unittest.TestCase):
@@ -439,19 +776,38 @@ class TestFixedNumberPreConnector(unittest.TestCase):
         assert_array_equal(self.p2._mask_local, numpy.array([0,1,0,1,0], dtype=bool))
 
     def test_with_n_smaller_than_population_size(self):
-        C = connectors.FixedNumberPreConnector(n=3, rng=MockRNG(delta=1))
+        # since n > pre.size/2, the one cell per column that is *not* connected
+        # is drawn: floor(4*u) gives 3, 0, 1, 2, 2
+        C = connectors.FixedNumberPreConnector(n=3, rng=MockRNG2(numpy.array([0.9, 0.0, 0.3, 0.6, 0.5])))
         syn = sim.StaticSynapse(weight="0.1*d")
         prj = sim.Projection(self.p1, self.p2, C, syn)
+        assert_array_almost_equal(
+            numpy.array(prj.get(["weight", "delay"], format='list', gather=False)),  # use gather False because we are faking the MPI
+            numpy.array([(1, 1, 0.0, 0.123),
+                         (2, 1, 0.1, 0.123),
+                         (3, 1, 0.2, 0.123),
+                         (0, 3, 0.3, 0.123),
+                         (1, 3, 0.2, 0.123),
+                         (3, 3, 0.0, 0.123),]),
+            9)
+
+    def test_with_n_smaller_than_half_population_size(self):
+        # floor(4*u) gives (0, 0), (1, 3), (2, 2), (3, 0), (0, 2); the
+        # duplicates in the first and third columns are then redrawn
+        C = connectors.FixedNumberPreConnector(n=2, rng=MockRNG2(numpy.array([0.1, 0.1, 0.3, 0.8, 0.5, 0.6,
+                                                                              0.9, 0.0, 0.2, 0.7, 0.6, 0.3])))
+        syn = sim.StaticSynapse()
+        prj = sim.Projection(self.p1, self.p2, C, syn)
         self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
-                         [(3, 1, 0.2, 0.123),
-                          (2, 1, 0.1, 0.123),
-                          (1, 1, 0.0, 0.123),
+                         [(1, 1, 0.0, 0.123),
+                          (3, 1, 0.0, 0.123),
                           (3, 3, 0.0, 0.123),
-                          (2, 3, 0.1, 0.123),
-                          (1, 3, 0.2, 0.123),])
+                          (0, 3, 0.0, 0.123),])
 
     def test_with_n_larger_than_population_size(self):
-        C = connectors.FixedNumberPreConnector(n=7, rng=MockRNG(delta=1))
+        # all cells are connected once, then the cells left out of the
+        # second set are 3, 0, 1, 2, 2
+        C = connectors.FixedNumberPreConnector(n=7, rng=MockRNG2(numpy.array([0.9, 0.0, 0.3, 0.6, 0.5])))
         syn = sim.StaticSynapse()
         prj = sim.Projection(self.p1, self.p2, C, syn)
         self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
@@ -459,19 +815,23 @@ class TestFixedNumberPreConnector(unittest.TestCase):
                           (1, 1, 0.0, 0.123),
                           (2, 1, 0.0, 0.123),
                           (3, 1, 0.0, 0.123),
-                          (3, 1, 0.0, 0.123),
-                          (2, 1, 0.0, 0.123),
                           (1, 1, 0.0, 0.123),
+                          (2, 1, 0.0, 0.123),
+                          (3, 1, 0.0, 0.123),
                           (0, 3, 0.0, 0.123),
                           (1, 3, 0.0, 0.123),
                           (2, 3, 0.0, 0.123),
                           (3, 3, 0.0, 0.123),
-                          (3, 3, 0.0, 0.123),
-                          (2, 3, 0.0, 0.123),
-                          (1, 3, 0.0, 0.123),])
+                          (0, 3, 0.0, 0.123),
+                          (1, 3, 0.0, 0.123),
+                          (3, 3, 0.0, 0.123),])
 
     def test_with_n_larger_than_population_size_no_self_connections(self):
-        C = connectors.FixedNumberPreConnector(n=7, allow_self_connections=False, rng=MockRNG(delta=1))
+        # there are four candidates per column. The candidates left out of
+        # the second set are 3, 0, 1, 2, 2, i.e. cells 4, 0, 1, 2, 2 for
+        # column 1 and cells 4, 0, 1, 3, 2 for column 3
+        C = connectors.FixedNumberPreConnector(n=7, allow_self_connections=False,
+                                               rng=MockRNG2(numpy.array([0.9, 0.0, 0.3, 0.6, 0.5])))
         syn = sim.StaticSynapse()
         prj = sim.Projection(self.p2, self.p2, C, syn)
         self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
@@ -479,16 +839,16 @@ class TestFixedNumberPreConnector(unittest.TestCase):
                           (2, 1, 0.0, 0.123),
                           (3, 1, 0.0, 0.123),
                           (4, 1, 0.0, 0.123),
-                          (4, 1, 0.0, 0.123),
-                          (3, 1, 0.0, 0.123),
                           (2, 1, 0.0, 0.123),
+                          (3, 1, 0.0, 0.123),
+                          (4, 1, 0.0, 0.123),
                           (0, 3, 0.0, 0.123),
                           (1, 3, 0.0, 0.123),
                           (2, 3, 0.0, 0.123),
                           (4, 3, 0.0, 0.123),
-                          (4, 3, 0.0, 0.123),
-                          (2, 3, 0.0, 0.123),
-                          (1, 3, 0.0, 0.123),])
+                          (0, 3, 0.0, 0.123),
+                          (1, 3, 0.0, 0.123),
+                          (4, 3, 0.0, 0.123),])
 
     def test_with_replacement(self):
         C = connectors.FixedNumberPreConnector(n=3, with_replacement=True, rng=MockRNG(delta=1))
@@ -545,18 +905,31 @@ class TestFixedNumberPreConnector(unittest.TestCase):
                           ])
 
     def test_no_replacement_no_self_connections(self):
+        # the candidates left out are 3, 0, 1, 2, 2, i.e. cell 0 for
+        # column 1 and cell 2 for column 3
         C = connectors.FixedNumberPreConnector(n=3, with_replacement=False,
-                                               allow_self_connections=False, rng=MockRNG(start=2, delta=1))
+                                               allow_self_connections=False,
+                                               rng=MockRNG2(numpy.array([0.9, 0.0, 0.3, 0.6, 0.5])))
         syn = sim.StaticSynapse()
         prj = sim.Projection(self.p2, self.p2, C, syn)
         self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
-                         [(4, 1, 0.0, 0.123),
+                         [(2, 1, 0.0, 0.123),
                           (3, 1, 0.0, 0.123),
-                          (2, 1, 0.0, 0.123),
-                          (4, 3, 0.0, 0.123),
-                          #(3, 3, 0.0, 0.123),
-                          (2, 3, 0.0, 0.123),
-                          (1, 3, 0.0, 0.123),])
+                          (4, 1, 0.0, 0.123),
+                          (0, 3, 0.0, 0.123),
+                          (1, 3, 0.0, 0.123),
+                          (4, 3, 0.0, 0.123),])
+
+    def test_no_replacement_no_mutual_connections(self):
+        # for column j, the candidates are the cells with index greater than j
+        C = connectors.FixedNumberPreConnector(n=1, with_replacement=False,
+                                               allow_self_connections='NoMutual',
+                                               rng=MockRNG2(numpy.array([0.9, 0.0, 0.3, 0.6])))
+        syn = sim.StaticSynapse()
+        prj = sim.Projection(self.p2, self.p2, C, syn)
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(2, 1, 0.0, 0.123),
+                          (4, 3, 0.0, 0.123),])
 
     def test_with_replacement_parallel_unsafe(self):
         C = connectors.FixedNumberPreConnector(n=3, with_replacement=True, rng=MockRNG(delta=1, parallel_safe=False))
@@ -571,16 +944,18 @@ class TestFixedNumberPreConnector(unittest.TestCase):
                           (1, 3, 0.0, 0.123),])
 
     def test_no_replacement_parallel_unsafe(self):
-        C = connectors.FixedNumberPreConnector(n=3, with_replacement=False, rng=MockRNG(delta=1, parallel_safe=False))
+        # random numbers are only drawn for the local columns
+        C = connectors.FixedNumberPreConnector(n=3, with_replacement=False,
+                                               rng=MockRNG2(numpy.array([0.9, 0.0]), parallel_safe=False))
         syn = sim.StaticSynapse()
         prj = sim.Projection(self.p1, self.p2, C, syn)
         self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
-                         [(3, 1, 0.0, 0.123),
-                          (2, 1, 0.0, 0.123),
+                         [(0, 1, 0.0, 0.123),
                           (1, 1, 0.0, 0.123),
-                          (3, 3, 0.0, 0.123),
+                          (2, 1, 0.0, 0.123),
+                          (1, 3, 0.0, 0.123),
                           (2, 3, 0.0, 0.123),
-                          (1, 3, 0.0, 0.123),])
+                          (3, 3, 0.0, 0.123),])
 
 
 class TestArrayConnector(unittest.TestCase):
@@ -616,11 +991,56 @@ class TestArrayConnector(unittest.TestCase):
             ], dtype=bool)
         C = connectors.ArrayConnector(connections, safe=False)
         prj = sim.Projection(self.p1, self.p2, C, syn)
-        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
-                         [(1, 0, 0.0, 1.0),
-                          (0, 2, 3.0, 1.3),
-                          (2, 2, 4.0, 1.4000000000000001)])  # better to do an "almost-equal" check
+        assert_array_almost_equal(
+            numpy.array(prj.get(["weight", "delay"], format='list', gather=False)),  # use gather False because we are faking the MPI
+            numpy.array([(1, 0, 0.0, 1.0),
+                         (0, 2, 3.0, 1.3),
+                         (2, 2, 4.0, 1.4)]),
+            9)
+
+    def test_connect_with_sparse_matrix(self):
+        if not connectors.have_scipy:
+            raise unittest.SkipTest("scipy not available")
+        weights = numpy.array([
+                [0.0, 0.1, 0.2, 0.0],
+                [0.3, 0.4, 0.0, 0.5],
+                [0.0, 0.0, 0.6, 0.0],
+            ])
+        for format in ("csr", "csc", "coo"):
+            connections = getattr(connectors.scipy.sparse, "%s_matrix" % format)(weights)
+            C = connectors.ArrayConnector(connections, safe=False)
+            syn = sim.StaticSynapse(weight=connectors.SparseMatrixExpression(connections), delay=0.5)
+            prj = sim.Projection(self.p1, self.p2, C, syn)
+            self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                             [(1, 0, 0.3, 0.5),
+                              (0, 2, 0.2, 0.5),
+                              (2, 2, 0.6, 0.5)])
+
+    def test_connect_with_sparse_matrix_and_random_weights_parallel_safe(self):
+        if not connectors.have_scipy:
+            raise unittest.SkipTest("scipy not available")
+        rd_w = random.RandomDistribution('uniform', (0, 1), rng=MockRNG(delta=1.0, parallel_safe=True))
+        syn = sim.StaticSynapse(weight=rd_w, delay=0.5)
+        connections = connectors.scipy.sparse.csr_matrix(numpy.array([
+                [0, 1, 1, 0],
+                [1, 1, 0, 1],
+                [0, 0, 1, 0],
+            ], dtype=bool))
+        C = connectors.ArrayConnector(connections, safe=False)
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        # random numbers are drawn for every connection, including non-local ones
+        assert_array_almost_equal(
+            numpy.array(prj.get(["weight", "delay"], format='list', gather=False)),  # use gather False because we are faking the MPI
+            numpy.array([(1, 0, 0.0, 0.5),
+                         (0, 2, 3.0, 0.5),
+                         (2, 2, 4.0, 0.5)]),
+            9)
 
+    def test_connect_with_sparse_matrix_of_wrong_shape(self):
+        if not connectors.have_scipy:
+            raise unittest.SkipTest("scipy not available")
+        C = connectors.ArrayConnector(connectors.scipy.sparse.csr_matrix((4, 3)))
+        self.assertRaises(ValueError, sim.Projection, self.p1, self.p2, C, sim.StaticSynapse())
 
 
 class TestCloneConnector(unittest.TestCase):
@@ -647,10 +1067,13 @@ class TestCloneConnector(unittest.TestCase):
         def mock_gather_dict(D, all=False):
             return D
         recording.gather_dict = mock_gather_dict
+        self.orig_gather_columns = recording.gather_columns
+        recording.gather_columns = lambda columns, all=False: columns
 
     def tearDown(self):
-        # restore original gather_dict function
+        # restore original gather_dict and gather_columns functions
         recording.gather_dict = self.orig_gather_dict
+        recording.gather_columns = self.orig_gather_columns
 
     def test_connect(self):
         syn = sim.StaticSynapse(weight=5.0, delay=0.5)
@@ -660,6 +1083,19 @@ class TestCloneConnector(unittest.TestCase):
                          [(0, 1, 5.0, 0.5),
                           (2, 3, 5.0, 0.5)])
 
+    def test_connect_with_random_weights_parallel_safe(self):
+        rd_w = random.RandomDistribution('uniform', (0, 1), rng=MockRNG(delta=1.0, parallel_safe=True))
+        syn = sim.StaticSynapse(weight=rd_w, delay=0.5)
+        C = connectors.CloneConnector(self.ref_prj)
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        # with the faked MPI, only the local connections of the reference
+        # projection are gathered, and weights are drawn for all of them
+        assert_array_almost_equal(
+            numpy.array(prj.get(["weight", "delay"], format='list', gather=False)),  # use gather False because we are faking the MPI
+            numpy.array([(0, 1, 0.0, 0.5),
+                         (2, 3, 1.0, 0.5)]),
+            9)
+
     def test_connect_with_pre_post_mismatch(self):
         syn = sim.StaticSynapse()
         C = connectors.CloneConnector(self.ref_prj)
@@ -720,6 +1156,53 @@ class TestIndexBasedProbabilityConnector(unittest.TestCase):
                           (4, 2, 1, 7),
                           (2, 4, 1, 7)])
 
+    def test_evaluate_block(self):
+        expression = self.IndexBasedWeights()
+        assert_array_equal(expression.evaluate_block(numpy.array([1, 2]), numpy.array([0, 3, 4])),
+                           [[1, 4, 5], [1, 7, 9]])
+        self.assertEqual(expression.support(3), None)
+
+    def test_separable_expression(self):
+        class SeparableProbability(connectors.IndexBasedExpression):
+            is_separable = True
+            def __call__(self, i, j):
+                return self.pre_factor(i) * self.post_factor(j)
+            def pre_factor(self, i):
+                return (i % 2 == 0).astype(float)
+            def post_factor(self, j):
+                return (j < 3).astype(float)
+        expression = SeparableProbability()
+        assert_array_equal(expression.evaluate_block(numpy.arange(3), numpy.array([1, 4])),
+                           [[1, 0], [0, 0], [1, 0]])
+        # random numbers are only drawn within the support
+        rng = MockRNG(start=0.0, delta=0.0, parallel_safe=False)
+        C = connectors.IndexBasedProbabilityConnector(expression, rng=rng)
+        prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse(weight=1.0, delay=2))
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 0, 1, 2),
+                          (2, 0, 1, 2),
+                          (4, 0, 1, 2),
+                          (0, 2, 1, 2),
+                          (2, 2, 1, 2),
+                          (4, 2, 1, 2)])
+        self.assertEqual(expression.support(4).size, 0)
+
+    def test_sparse_matrix_support(self):
+        matrix = numpy.zeros((5, 5))
+        matrix[1, 0] = matrix[3, 2] = matrix[4, 2] = 0.5
+        expression = connectors.SparseMatrixExpression(matrix)
+        assert_array_equal(expression.support(2), [3, 4])
+        assert_array_equal(expression.evaluate_block(numpy.array([3, 4]), numpy.array([0, 2])),
+                           [[0, 0.5], [0, 0.5]])
+        C = connectors.IndexBasedProbabilityConnector(expression,
+                                                      rng=MockRNG(start=0.25, delta=0.125,
+                                                                  parallel_safe=False))
+        prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse(weight=1.0, delay=2))
+        # only three random numbers are drawn: 0.25, 0.375 and 0.5
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(1, 0, 1, 2),
+                          (3, 2, 1, 2)])
+
 
 class TestDisplacementDependentProbabilityConnector(unittest.TestCase):
 
@@ -767,6 +1250,35 @@ class TestDisplacementDependentProbabilityConnector(unittest.TestCase):
                           (1, 8, 1.0, 2.0),
                           (2, 8, 1.0, 2.0)])
 
+    def test_evaluate_block(self):
+        expression = connectors.DisplacementDependentProbabilityConnector.DisplacementExpression(
+                        lambda d: d[0] + 10 * d[1])
+        prj = sim.Projection(self.p1, self.p2, connectors.AllToAllConnector(), sim.StaticSynapse())
+        expression.projection = prj
+        sources, targets = numpy.array([0, 4, 8]), numpy.array([2, 3])
+        tile = expression.evaluate_block(sources, targets)
+        self.assertEqual(tile.shape, (3, 2))
+        for k, i in enumerate(sources):
+            for l, j in enumerate(targets):
+                self.assertAlmostEqual(tile[k, l], expression(i, j))
+        # index grids are evaluated as a block, paired indices are not
+        grid_j, grid_i = numpy.meshgrid(targets, sources)
+        assert_array_almost_equal(expression.evaluate(grid_i, grid_j), tile)
+        assert_array_almost_equal(expression.evaluate(sources[:2], targets),
+                                  [expression(0, 2), expression(4, 3)])
+
+    def test_disp_function_called_once_per_block(self):
+        calls = []
+        def displacement_expression(d):
+            calls.append(d.shape)
+            return 0.5 * (d[0] >= 0)
+        C = connectors.DisplacementDependentProbabilityConnector(displacement_expression,
+                                                                 rng=MockRNG(delta=0.01))
+        C.max_block_elements = 18  # two columns per block
+        sim.Projection(self.p1, self.p2, C, sim.StaticSynapse())
+        # the RNG is parallel safe, so all nine columns are evaluated
+        self.assertEqual(calls, [(3, 9, 2)] * 4 + [(3, 9, 1)])
+
 
 @unittest.skip('skipping these tests until I figure out how I want to refactor checks')
 class CheckTest(unittest.TestCase):
@@ -814,3 +1326,330 @@ class CheckTest(unittest.TestCase):
         self.assertEqual(connectors.check_delays(2*self.MIN_DELAY, self.MIN_DELAY, 1e99), 2*self.MIN_DELAY)
         self.assertRaises(errors.ConnectionError, connectors.check_delays, 0.5*self.MIN_DELAY, self.MIN_DELAY, 1e99)
         self.assertRaises(errors.ConnectionError, connectors.check_delays, 3.0, self.MIN_DELAY, 2.0)
+
+
+class TestSmallWorldConnector(unittest.TestCase):
+
+    def setUp(self):
+        sim.setup(num_processes=2, rank=1, min_delay=0.123)
+        self.p1 = sim.Population(4, sim.IF_cond_exp(), structure=space.Line())
+        self.p2 = sim.Population(5, sim.HH_cond_exp(), structure=space.Line())
+        assert_array_equal(self.p2._mask_local, numpy.array([0,1,0,1,0], dtype=bool))
+
+    def test_connect_without_rewiring(self):
+        C = connectors.SmallWorldConnector(degree=1.5, rewiring=0.0,
+                                           rng=MockRNG(delta=0.1, parallel_safe=False))
+        syn = sim.StaticSynapse()
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 1, 0.0, 0.123),
+                          (1, 1, 0.0, 0.123),
+                          (2, 1, 0.0, 0.123),
+                          (2, 3, 0.0, 0.123),
+                          (3, 3, 0.0, 0.123)])
+
+    def test_connect_with_rewiring_parallel_safe(self):
+        # two numbers per lattice connection: the first decides whether it is
+        # rewired, the second gives the new source
+        numbers = numpy.array([0.9, 0.0, 0.9, 0.0,                 # post 0
+                               0.1, 0.0, 0.9, 0.0, 0.1, 0.99,      # post 1
+                               0.9, 0.0, 0.9, 0.0, 0.9, 0.0,       # post 2
+                               0.1, 0.5, 0.9, 0.0,                 # post 3
+                               0.9, 0.0])                          # post 4
+        C = connectors.SmallWorldConnector(degree=1.5, rewiring=0.5,
+                                           rng=MockRNG2(numbers, parallel_safe=True))
+        syn = sim.StaticSynapse()
+        prj = sim.Projection(self.p1, self.p2, C, syn)
+        self.assertEqual(prj.get(["weight", "delay"], format='list', gather=False),  # use gather False because we are faking the MPI
+                         [(0, 1, 0.0, 0.123),
+                          (1, 1, 0.0, 0.123),
+                          (3, 1, 0.0, 0.123),
+                          (2, 3, 0.0, 0.123),
+                          (3, 3, 0.0, 0.123)])
+
+    def test_connect_without_self_connections(self):
+        # the second connection to post 1 is rewired to int(0.6*4) = 2,
+        # shifted to 3 to skip cell 1 itself
+        numbers = numpy.array([0.9, 0.0, 0.1, 0.6, 0.9, 0.0, 0.9, 0.0])
+        C = connectors.SmallWorldConnector(degree=1.5, rewiring=0.5,
+                                           allow_self_connections=False,
+                                           rng=MockRNG2(numbers, parallel_safe=False))
+        prj = sim.Projection(self.p2, self.p2, C, sim.StaticSynapse())
+        self.assertEqual([(int(i), int(j)) for i, j, w in prj.get("weight", format='list', gather=False)],
+                         [(0, 1), (3, 1), (2, 3), (4, 3)])
+
+    def test_n_connections_not_supported(self):
+        self.assertRaises(ValueError, connectors.SmallWorldConnector,
+                          degree=1.5, rewiring=0.0, n_connections=3)
+
+
+@unittest.skipUnless(connectors.haveCSA, "Requires csa")
+class TestCSAConnector(unittest.TestCase):
+
+    def setUp(self):
+        import csa
+        self.csa = csa
+        sim.setup(num_processes=2, rank=1, min_delay=0.123)
+        self.p1 = sim.Population(6, sim.IF_cond_exp())
+        self.p2 = sim.Population(9, sim.HH_cond_exp())
+        assert_array_equal(self.p2._mask_local, numpy.arange(9) % 2 == 1)
+        self.masks = [
+            # evaluated for the local columns only
+            csa.cross([(0, 2), (4, 5)], (0, 8)) * csa.cross((0, 5), [(1, 3), (6, 8)]),
+            csa.oneToOne + csa.cross((0, 1), (4, 8)),
+            # contains a difference, so evaluated for all columns
+            csa.cross([(0, 2), (4, 5)], (0, 8)) - csa.oneToOne,
+        ]
+
+    def _unrestricted(self, cset):
+        # all connections of the connection set, without restriction to the
+        # local columns, for the local post-synaptic cells
+        connections = self.csa.cross((0, self.p1.size - 1), (0, self.p2.size - 1)) * cset
+        return sorted(c for c in connections if self.p2._mask_local[c[1]])
+
+    def test_restrict(self):
+        C = connectors.CSAConnector(self.masks[0])
+        prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse())
+        columns = numpy.array([1, 2, 3, 6])
+        self.assertEqual(sorted(C._restrict(prj, columns) * self.csa.full),
+                         sorted((i, j) for i in range(6) for j in columns))
+        self.assertEqual(list(C._restrict(prj, numpy.array([], dtype=int)) * self.csa.full), [])
+
+    def test_can_restrict(self):
+        self.assertEqual([connectors.CSAConnector._can_restrict(mask) for mask in self.masks],
+                         [True, True, False])
+        self.assertFalse(connectors.CSAConnector._can_restrict(self.csa.cset(self.masks[2], 0.2, 1.5)))
+
+    def test_connect_mask_same_as_unrestricted(self):
+        for mask in self.masks:
+            C = connectors.CSAConnector(mask)
+            C.chunk_size = 4  # connections to a post-synaptic cell span several chunks
+            prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse(weight=0.5))
+            connections = [(int(i), int(j)) for i, j, w in prj.get("weight", format='list', gather=False)]
+            self.assertEqual(sorted(connections), self._unrestricted(mask))
+
+    def test_connect_cset_same_as_unrestricted(self):
+        for mask in self.masks:
+            cset = self.csa.cset(mask, 0.2, 1.5)
+            C = connectors.CSAConnector(cset)
+            C.chunk_size = 4
+            prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse())
+            self.assertEqual(sorted(prj.get(["weight", "delay"], format='list', gather=False)),
+                             self._unrestricted(cset))
+
+    def test_callback_progress(self):
+        for mask in self.masks:
+            for cset in (mask, self.csa.cset(mask, 0.2, 1.5)):
+                progress = []
+                C = connectors.CSAConnector(cset, callback=progress.append)
+                C.chunk_size = 4
+                sim.Projection(self.p1, self.p2, C, sim.StaticSynapse())
+                self.assertGreater(len(progress), 1)
+                self.assertEqual(progress, sorted(progress))
+                self.assertEqual(progress[-1], 1.0)
+
+
+class TestCachedConnector(unittest.TestCase):
+
+    def setUp(self):
+        sim.setup(num_processes=2, rank=1, min_delay=0.123)
+        self.p1 = sim.Population(4, sim.IF_cond_exp(), structure=space.Line())
+        self.p2 = sim.Population(5, sim.HH_cond_exp(), structure=space.Line())
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _connect(self, connector, syn):
+        prj = sim.Projection(self.p1, self.p2, connector, syn)
+        return prj.get(["weight", "delay"], format='list', gather=False)  # use gather False because we are faking the MPI
+
+    def test_cache_miss_then_hit(self):
+        rng = MockRNG2(numpy.linspace(0.0, 1.0, 20)[::-1] % 1.0, parallel_safe=False)
+        C = connectors.CachedConnector(
+                connectors.FixedProbabilityConnector(p_connect=0.5, rng=rng),
+                self.cache_dir)
+        syn = sim.StaticSynapse(weight=0.1, delay=0.5)
+        connections = self._connect(C, syn)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        rng_position = rng.i
+        rng.i = 0  # the same state as for the first projection
+        # on a hit, the connector is not used
+        orig_connect = connectors.FixedProbabilityConnector.connect
+        connectors.FixedProbabilityConnector.connect = None
+        try:
+            self.assertEqual(self._connect(C, syn), connections)
+        finally:
+            connectors.FixedProbabilityConnector.connect = orig_connect
+        self.assertEqual(rng.i, rng_position)
+
+    def test_different_parameters_give_different_entries(self):
+        syn = sim.StaticSynapse(weight=0.1, delay=0.5)
+        for p in (0.3, 0.7):
+            C = connectors.CachedConnector(
+                    connectors.FixedProbabilityConnector(p_connect=p, rng=MockRNG(delta=0.1)),
+                    self.cache_dir)
+            self._connect(C, syn)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+    def test_replay_parameter_arrays(self):
+        connection_list = [(0, 1, 0.5, 0.14), (3, 3, 0.2, 0.11), (2, 3, 0.3, 0.12)]
+        syn = sim.StaticSynapse()
+        C = connectors.CachedConnector(connectors.FromListConnector(connection_list),
+                                       connectors.ConnectionCache(self.cache_dir))
+        connections = self._connect(C, syn)
+        self.assertEqual(self._connect(C, syn), connections)
+        self.assertEqual(connections, [(0, 1, 0.5, 0.14), (3, 3, 0.2, 0.11), (2, 3, 0.3, 0.12)])
+
+    def test_uncacheable_connector(self):
+        C = connectors.CachedConnector(
+                connectors.DistanceDependentProbabilityConnector("d<1", rng=MockRNG(delta=0.1)),
+                self.cache_dir)
+        C.connector.d_expression = lambda d: d < 1
+        self._connect(C, sim.StaticSynapse())
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_cache_with_counter_based_rng(self):
+        def cached_connector():
+            rng = random.CounterBasedRNG(seed=1, parallel_safe=True)
+            return connectors.CachedConnector(
+                connectors.FixedProbabilityConnector(p_connect=0.5, rng=rng),
+                self.cache_dir)
+        syn = sim.StaticSynapse(weight=0.1, delay=0.5)
+        C1 = cached_connector()
+        connections = self._connect(C1, syn)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        C2 = cached_connector()
+        orig_connect = connectors.FixedProbabilityConnector.connect
+        connectors.FixedProbabilityConnector.connect = None
+        try:
+            self.assertEqual(self._connect(C2, syn), connections)
+        finally:
+            connectors.FixedProbabilityConnector.connect = orig_connect
+        # the generator is left as if the connections had been generated
+        rng1, rng2 = C1.connector.rng, C2.connector.rng
+        assert_array_equal(rng2.rng.get_state()[1], rng1.rng.get_state()[1])
+        self.assertEqual(rng2.new_key(), rng1.new_key())
+
+    def test_replay_in_blocks(self):
+        C = connectors.CachedConnector(connectors.AllToAllConnector(), self.cache_dir)
+        syn = sim.StaticSynapse(weight=0.1, delay=0.5)
+        connections = self._connect(C, syn)
+        C.max_block_elements = 1  # one post-synaptic cell per block
+        blocks = []
+        orig_connect_block = sim.Projection._connect_block
+        def connect_block(prj, presynaptic_indices, postsynaptic_indices, **parameters):
+            blocks.append(sorted(set(postsynaptic_indices)))
+            orig_connect_block(prj, presynaptic_indices, postsynaptic_indices, **parameters)
+        sim.Projection._connect_block = connect_block
+        try:
+            self.assertEqual(self._connect(C, syn), connections)
+        finally:
+            sim.Projection._connect_block = orig_connect_block
+        self.assertEqual(blocks, [[1], [3]])
+
+    def test_eviction(self):
+        cache = connectors.ConnectionCache(self.cache_dir, max_size=1)
+        C = connectors.CachedConnector(connectors.AllToAllConnector(), cache)
+        self._connect(C, sim.StaticSynapse())
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
+class TestEstimate(unittest.TestCase):
+
+    def setUp(self):
+        sim.setup(num_processes=2, rank=1, min_delay=0.123)
+        self.p1 = sim.Population(4, sim.IF_cond_exp(), structure=space.Line())
+        self.p2 = sim.Population(5, sim.HH_cond_exp(), structure=space.Line())
+        assert_array_equal(self.p2._mask_local, numpy.array([0,1,0,1,0], dtype=bool))
+        self.orig_mpi_sum = recording.mpi_sum
+        # pretend that there are 7 connections on the other MPI node
+        def mock_mpi_sum(x):
+            x = x.copy()
+            x[0] += 7
+            return x
+        recording.mpi_sum = mock_mpi_sum
+
+    def tearDown(self):
+        recording.mpi_sum = self.orig_mpi_sum
+
+    def test_all_to_all(self):
+        estimate = connectors.AllToAllConnector().estimate(self.p1, self.p2)
+        self.assertEqual(estimate['local'], 8)
+        self.assertEqual(estimate['per_rank'], [7, 8])
+        self.assertEqual(estimate['expected'], 15)
+        self.assertEqual(estimate['exact'], 15)
+
+    def test_all_to_all_without_self_connections(self):
+        C = connectors.AllToAllConnector(allow_self_connections=False)
+        self.assertEqual(C.estimate(self.p2, self.p2)['local'], 8)
+        C.allow_self_connections = 'NoMutual'
+        self.assertEqual(C.estimate(self.p2, self.p2)['local'], 4)
+
+    def test_fixed_probability(self):
+        estimate = connectors.FixedProbabilityConnector(0.5).estimate(self.p1, self.p2)
+        self.assertAlmostEqual(estimate['local'], 4.0)
+        self.assertEqual(estimate['exact'], None)
+
+    def test_fixed_number_pre(self):
+        estimate = connectors.FixedNumberPreConnector(3).estimate(self.p1, self.p2)
+        self.assertEqual(estimate['local'], 6)
+        self.assertEqual(estimate['exact'], 13)
+
+    def test_fixed_number_post(self):
+        estimate = connectors.FixedNumberPostConnector(2).estimate(self.p1, self.p2)
+        self.assertAlmostEqual(estimate['local'], 3.2)
+
+    def test_one_to_one(self):
+        self.assertEqual(connectors.OneToOneConnector().estimate(self.p2, self.p2)['local'], 2)
+
+    def test_from_list(self):
+        C = connectors.FromListConnector([(0, 1, 0.1, 0.1), (3, 3, 0.1, 0.1),
+                                          (2, 3, 0.1, 0.1), (2, 4, 0.1, 0.1)])
+        self.assertEqual(C.estimate(self.p1, self.p2)['local'], 3)
+
+    def test_from_list_generator(self):
+        chunks = (numpy.array([[0, 1, 0.1, 0.1]]) for i in range(2))
+        C = connectors.FromListConnector(chunks)
+        self.assertRaises(NotImplementedError, C.estimate, self.p1, self.p2)
+
+    def test_array(self):
+        array = numpy.zeros((4, 5), dtype=bool)
+        array[:, 1] = True
+        array[0, 3] = True
+        self.assertEqual(connectors.ArrayConnector(array).estimate(self.p1, self.p2)['exact'], 12)
+
+    def test_distance_dependent_is_sampled(self):
+        rng = random.NumpyRNG(seed=83)
+        C = connectors.DistanceDependentProbabilityConnector("d<1.5", rng=rng)
+        rng_state = rng.rng.get_state()
+        estimate = C.estimate(self.p1, self.p2)
+        # post 1 has 3 pre-synaptic cells within 1.5, post 3 has 2
+        self.assertAlmostEqual(estimate['local'], 5.0, delta=0.1)
+        self.assertEqual(estimate['exact'], None)
+        assert_array_equal(rng.rng.get_state()[1], rng_state[1])
+
+    def test_dry_run_of_connector(self):
+        # connectors without a specific method are run without creating connections
+        class TestConnector(connectors.FixedProbabilityConnector):
+            _estimate_connections = connectors.Connector._estimate_connections
+        C = TestConnector(0.5, rng=random.NumpyRNG(seed=11))
+        estimate = C.estimate(self.p1, self.p2)
+        prj = sim.Projection(self.p1, self.p2, C, sim.StaticSynapse())
+        # the random number generator is restored, so the connections are the same
+        self.assertEqual(estimate['local'], len(prj))
+        self.assertEqual(estimate['exact'], 7 + len(prj))
+
+    def test_bytes(self):
+        estimate = connectors.AllToAllConnector().estimate(self.p1, self.p2,
+                                                           synapse_type=sim.StaticSynapse())
+        self.assertEqual(sorted(estimate['parameters']), ['delay', 'weight'])
+        self.assertEqual(estimate['bytes_per_connection'], 32)
+        self.assertEqual(estimate['bytes_local'], 8 * 32)
+        self.assertEqual(estimate['bytes'], 15 * 32)
+
+    def test_projection_dry_run(self):
+        prj = sim.Projection(self.p1, self.p2, connectors.AllToAllConnector(),
+                             sim.StaticSynapse(), dry_run=True)
+        self.assertEqual(len(prj), 0)
+        self.assertEqual(prj.estimate['local'], 8)
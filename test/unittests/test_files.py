@@ -110,3 +110,47 @@ def test_HDF5ArrayFile():
         h5f.close()
     
         os.remove("tmp.h5")
+
+def test_BinaryConnectionFile():
+    bcf = files.BinaryConnectionFile("tmp.conn", "w")
+    data = [(0, 2, 0.1, 0.5), (1, 0, 0.2, 0.6), (2, 2, 0.3, 0.7), (3, 0, 0.4, 0.8)]
+    metadata = {'columns': ['i', 'j', 'weight', 'delay']}
+    bcf.write(data, metadata)
+    bcf.close()
+
+    bcf = files.BinaryConnectionFile("tmp.conn", "r")
+    assert files.is_binary_connection_file("tmp.conn")
+    assert_equal(bcf.get_metadata()['columns'], metadata['columns'])
+    assert_arrays_equal(bcf.read_index(), numpy.array([0, 2, 2, 4]))
+    assert_arrays_equal(bcf.read().flatten(),
+                        numpy.array([data[1], data[3], data[0], data[2]]).flatten())
+    chunks = list(bcf.read_targets([2, 5], chunk_size=1))
+    assert_equal(len(chunks), 1)
+    assert_arrays_equal(chunks[0].flatten(), numpy.array([data[0], data[2]]).flatten())
+    chunks = list(bcf.read_targets([0, 1, 2], chunk_size=2))
+    assert_equal(len(chunks), 2)
+    bcf.close()
+
+    os.remove("tmp.conn")
+    assert not files.is_binary_connection_file("tmp.conn")
+
+def test_BinaryConnectionFile_write_chunks():
+    data = numpy.array([(0, 2, 0.1, 0.5), (1, 0, 0.2, 0.6), (2, 4, 0.3, 0.7),
+                        (3, 0, 0.4, 0.8), (4, 2, 0.5, 0.9), (5, 0, 0.6, 1.0)])
+    metadata = {'columns': ['i', 'j', 'weight', 'delay']}
+    bcf = files.BinaryConnectionFile("tmp.conn", "w")
+    bcf.write(data, metadata)
+    expected = open("tmp.conn", "rb").read()
+    # the chunks are written as they arrive, and give the same file as write()
+    bcf = files.BinaryConnectionFile("tmp.conn", "w")
+    bcf.write_chunks((data[start:start + 2] for start in (0, 2, 4)), metadata)
+    assert_equal(open("tmp.conn", "rb").read(), expected)
+    bcf = files.BinaryConnectionFile("tmp.conn", "r")
+    assert_arrays_equal(bcf.read_index(), numpy.array([0, 3, 3, 5, 5, 6]))
+    bcf.close()
+    bcf = files.BinaryConnectionFile("tmp.conn", "w")
+    bcf.write_chunks(iter([]), metadata)
+    bcf = files.BinaryConnectionFile("tmp.conn", "r")
+    assert_equal(bcf.read().shape, (0, 4))
+    bcf.close()
+    os.remove("tmp.conn")
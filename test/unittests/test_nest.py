@@ -4,6 +4,8 @@ try:
 except ImportError:
     nest = False
 from pyNN.standardmodels import StandardCellType
+from pyNN.parameters import Sequence
+from pyNN.random import RandomDistribution, NumpyRNG
 try:
     import unittest2 as unittest
 except ImportError:
@@ -76,6 +78,26 @@ class TestPopulation(unittest.TestCase):
     def test_set_parameters_scalar(self):
         self.p[0:1].set(tau_m=20.)
 
+    def test_create_with_heterogeneous_parameters(self):
+        # random, constant and array-valued parameters, set by Create and SetStatus
+        v_rest = RandomDistribution('uniform', (-70.0, -60.0), rng=NumpyRNG(seed=8658764))
+        p = sim.Population(5, sim.IF_cond_exp(v_rest=v_rest, cm=0.5,
+                                              i_offset=numpy.array([0.1, 0.2, 0.3, 0.4, 0.5])))
+        ids = p.all_cells.tolist()
+        expected_v_rest = RandomDistribution('uniform', (-70.0, -60.0),
+                                             rng=NumpyRNG(seed=8658764)).next(5)
+        assert_array_almost_equal(numpy.array(nest.GetStatus(ids, 'E_L')), expected_v_rest, decimal=12)
+        assert_array_almost_equal(numpy.array(nest.GetStatus(ids, 'C_m')), 500.0 * numpy.ones((5,)),
+                                  decimal=12)
+        assert_array_almost_equal(numpy.array(nest.GetStatus(ids, 'I_e')),
+                                  numpy.array([100.0, 200.0, 300.0, 400.0, 500.0]), decimal=12)
+        # Sequence-valued parameters which differ between cells
+        spike_times = [Sequence([1.0, 5.0]), Sequence([2.0, 3.0, 4.0]), Sequence([7.0])]
+        p = sim.Population(3, sim.SpikeSourceArray(spike_times=spike_times))
+        values = nest.GetStatus(p.all_cells.tolist(), 'spike_times')
+        for value, expected in zip(values, spike_times):
+            assert_array_almost_equal(numpy.array(value), expected.value, decimal=12)
+
 
 
 @unittest.skipUnless(nest, "Requires NEST")
@@ -136,6 +158,28 @@ class TestProjection(unittest.TestCase):
             prj = sim.Projection(self.p1, self.p2, fromlist,
                                  synapse_type=self.native_synapse_type())
 
+    def test_connect_with_parameter_arrays(self):
+        connections = [(0, 1, 0.1, 0.5, 0.2), (3, 1, 0.2, 0.6, 0.3), (1, 2, 0.3, 0.7, 0.4)]
+        prj = sim.Projection(self.p1, self.p2,
+                             sim.FromListConnector(connections, column_names=["weight", "delay", "U"]),
+                             synapse_type=sim.TsodyksMarkramSynapse())
+        self.assertEqual(len(prj), 3)
+        values = sorted(prj.get(["weight", "delay", "U"], format="list"))
+        assert_array_almost_equal(numpy.array(values), numpy.array(sorted(connections)))
+
+    def test_connect_to_assembly_with_mixed_cell_types(self):
+        # the weight scaling of the Izhikevich model must only be applied to
+        # the connections onto the Izhikevich neurons
+        p5 = sim.Population(3, sim.Izhikevich())
+        prj = sim.Projection(self.p1, sim.Assembly(self.p3, p5), sim.AllToAllConnector(),
+                             synapse_type=sim.StaticSynapse(weight=0.5))
+        self.assertEqual(len(prj), 7 * 8)
+        izh_weights = nest.GetStatus(nest.GetConnections(target=p5.all_cells.tolist()), 'weight')
+        iaf_weights = nest.GetStatus(nest.GetConnections(target=self.p3.all_cells.tolist()), 'weight')
+        self.assertEqual((len(izh_weights), len(iaf_weights)), (7 * 3, 7 * 5))
+        assert_array_almost_equal(numpy.array(izh_weights), 0.5 * numpy.ones((7 * 3,)))
+        assert_array_almost_equal(numpy.array(iaf_weights), 500.0 * numpy.ones((7 * 5,)))
+
     def test_set_array(self):
         weight = 0.123
         prj = sim.Projection(self.p1, self.p2, sim.AllToAllConnector())
@@ -179,5 +223,55 @@ class TestProjection(unittest.TestCase):
         prj.set(weight=weight_array)
         self.assertTrue((weight_array == prj.get("weight", format="array")).all())
 
+
+@unittest.skipUnless(nest, "Requires NEST")
+class TestRecording(unittest.TestCase):
+
+    def setUp(self):
+        sim.setup()
+        spike_times = [[1.0, 5.0], [], [2.0, 3.0, 4.0]]
+        self.p = sim.Population(3, sim.SpikeSourceArray(spike_times=spike_times))
+        self.p.record('spikes')
+        sim.run(10.0)
+
+    def test_get_spike_counts(self):
+        self.assertEqual(self.p.get_spike_counts(),
+                         {self.p[0]: 2, self.p[1]: 0, self.p[2]: 3})
+
+    def test_get_spiketrains(self):
+        spiketrains = self.p.get_data().segments[0].spiketrains
+        self.assertEqual([len(st) for st in spiketrains], [2, 0, 3])
+        assert_array_almost_equal(spiketrains[2].magnitude, [2.0, 3.0, 4.0], decimal=1)
+
+
+@unittest.skipUnless(nest, "Requires NEST")
+class TestRecordingToFile(unittest.TestCase):
+
+    def setUp(self):
+        sim.setup(record_to_file=True)
+        self.p = sim.Population(2, sim.IF_cond_exp(i_offset=[1.0, 0.0]))
+        self.p.record(['spikes', 'v'])
+
+    def tearDown(self):
+        sim.setup()
+
+    def test_get_data(self):
+        sim.run(50.0)
+        data = self.p.get_data().segments[0]
+        self.assertGreater(len(data.spiketrains[0]), 0)
+        self.assertEqual(len(data.spiketrains[1]), 0)
+        v = data.filter(name='v')[0]
+        self.assertEqual(v.shape, (501, 2))
+        self.assertEqual(v[0, 1], -65.0)
+
+    def test_get_data_after_further_run(self):
+        sim.run(20.0)
+        n1 = self.p.get_spike_counts()[self.p[0]]
+        sim.run(30.0)
+        data = self.p.get_data().segments[0]
+        self.assertGreaterEqual(len(data.spiketrains[0]), n1)
+        self.assertEqual(data.filter(name='v')[0].shape, (501, 2))
+
+
 if __name__ == '__main__':
     unittest.main()
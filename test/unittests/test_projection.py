@@ -20,7 +20,7 @@ import pyNN.mock as sim
 #import pyNN.neuron as sim
 #import pyNN.nest as sim
 
-from pyNN import random, errors, space
+from pyNN import random, errors, space, common, recording
 from pyNN.parameters import Sequence
 
 
@@ -148,9 +148,10 @@ class ProjectionTest(unittest.TestCase):
         assert_array_equal(weights, target)
 
     def test_get_weights_as_array_with_multapses(self):
-        C = sim.FixedNumberPreConnector(n=7, rng=MockRNG(delta=1))
+        C = sim.FixedNumberPreConnector(n=7, rng=MockRNG(delta=0))
         prj = sim.Projection(self.p2, self.p3, C, synapse_type=self.syn1)
-        # because we use a fake RNG, it is always the last three presynaptic cells which receive the double connection
+        # because we use a fake RNG, it is always the first presynaptic cell which is left out of the
+        # second set of connections, so the last three presynaptic cells receive the double connection
         target = numpy.array([
             [0.123, 0.123, 0.123, 0.123, 0.123],
             [0.246, 0.246, 0.246, 0.246, 0.246],
@@ -160,6 +161,22 @@ class ProjectionTest(unittest.TestCase):
         weights = prj.get("weight", format="array", gather=False)  # use gather False because we are faking the MPI
         assert_array_equal(weights, target)
 
+    def test_get_weights_as_sparse(self):
+        C = sim.FixedNumberPreConnector(n=7, rng=MockRNG(delta=0))
+        prj = sim.Projection(self.p2, self.p3, C, synapse_type=self.syn1)
+        weights = prj.get("weight", format="sparse", gather=False)  # use gather False because we are faking the MPI
+        self.assertEqual(weights.format, "csr")
+        self.assertEqual(weights.shape, (4, 5))
+        # multiple connections are summed, as for the array format
+        assert_array_almost_equal(weights.toarray(),
+                                  prj.get("weight", format="array", gather=False))
+        weights, delays = prj.get(["weight", "delay"], format="sparse", gather=False)
+        self.assertEqual(delays.nnz, 20)
+
+    def test_get_sparse_without_connections(self):
+        prj = sim.Projection(self.p1, self.p2, sim.FromListConnector([]), synapse_type=self.syn1)
+        self.assertEqual(prj.get("weight", format="sparse", gather=False).nnz, 0)
+
     def test_get_plasticity_attribute_as_list(self):
         U_distr = random.RandomDistribution('uniform', low=0.4, high=0.6, rng=MockRNG(start=0.5, delta=0.001))
         depressing = sim.TsodyksMarkramSynapse(U=U_distr, tau_rec=lambda d: 800.0+d, tau_facil=0.0)
@@ -227,6 +244,99 @@ class ProjectionTest(unittest.TestCase):
     #    assert os.path.exists(filename)
     #    os.remove(filename)
 
+    def test_getitem(self):
+        prj = sim.Projection(self.p1, self.p2, connector=self.all2all, synapse_type=self.syn2)
+        c = prj[8]
+        self.assertEqual((c.presynaptic_index, c.postsynaptic_index), (1, 1))
+        self.assertAlmostEqual(c.WEIGHT, 0.456)  # connections have the native parameter names
+        c.WEIGHT = 0.1  # connections are views of the projection's connection store
+        self.assertAlmostEqual(prj.get("weight", format="array", gather=False)[1, 1], 0.1)
+        self.assertEqual(len(prj[2:5]), 3)
+        self.assertEqual(len(list(prj.connections)), 28)
+        self.assertRaises(IndexError, prj.__getitem__, 28)
+
+    def test_set_weights(self):
+        prj = sim.Projection(self.p1, self.p2, connector=self.all2all, synapse_type=self.syn2)
+        prj.set(weight=0.2)
+        assert_array_equal(prj.get("weight", format="array", gather=False),
+                           0.2 * numpy.ones((7, 4)))
+        weights = numpy.arange(28.0).reshape((7, 4))
+        prj.set(weight=weights)
+        assert_array_equal(prj.get("weight", format="array", gather=False), weights)
+
+    def test_set_weights_from_list(self):
+        C = sim.FromListConnector([(0, 1, 0.1, 0.5), (3, 0, 0.1, 0.5), (1, 1, 0.1, 0.5)])
+        prj = sim.Projection(self.p1, self.p2, C, synapse_type=self.syn1)
+        # values are given in the order of the local connections
+        self.assertEqual(prj.get("weight", format="list", gather=False),
+                         [(3, 0, 0.1), (0, 1, 0.1), (1, 1, 0.1)])
+        prj.set(weight=[0.2, 0.3, 0.4])
+        self.assertEqual(prj.get("weight", format="list", gather=False),
+                         [(3, 0, 0.2), (0, 1, 0.3), (1, 1, 0.4)])
+        prj.set(delay=numpy.array([0.6, 0.7, 0.8]))
+        assert_array_almost_equal(prj.get("delay", format="list", gather=False, with_address=False),
+                                  [0.6, 0.7, 0.8])
+        self.assertRaises(errors.InvalidDimensionsError, prj.set, weight=[0.2, 0.3])
+
+    def test_set_weights_by_address(self):
+        C = sim.FromListConnector([(0, 1, 0.1, 0.5), (3, 0, 0.1, 0.5), (1, 1, 0.1, 0.5), (0, 1, 0.1, 0.5)])
+        prj = sim.Projection(self.p1, self.p2, C, synapse_type=self.syn1)
+        # pairs without a local connection, such as (2, 2), are ignored; the
+        # other connections are unchanged
+        prj.set(weight=(numpy.array([2, 0, 3]), numpy.array([2, 1, 0]), numpy.array([0.9, 0.2, 0.3])))
+        self.assertEqual(prj.get("weight", format="list", gather=False),
+                         [(3, 0, 0.3), (0, 1, 0.2), (1, 1, 0.1), (0, 1, 0.2)])
+        prj.set(weight=([1], [1], 0.5), delay=0.25)
+        self.assertEqual(prj.get(["weight", "delay"], format="list", gather=False),
+                         [(3, 0, 0.3, 0.25), (0, 1, 0.2, 0.25), (1, 1, 0.5, 0.25), (0, 1, 0.2, 0.25)])
+
+    def test_get_list_with_gather(self):
+        sim.setup(num_processes=2, rank=0)
+        C = sim.FromListConnector([(0, 1, 0.1, 0.5), (3, 0, 0.2, 0.5)])
+        prj = sim.Projection(self.p1, self.p2, C, synapse_type=self.syn1)
+        # pretend that node 1 has a single connection
+        def mock_gather_columns(columns, all=False):
+            return [numpy.hstack((column, [value])) for column, value in zip(columns, [6, 3, 0.7])]
+        with patch("pyNN.recording.gather_columns", mock_gather_columns):
+            self.assertEqual(prj.get("weight", format="list", gather=True),
+                             [(3, 0, 0.2), (0, 1, 0.1), (6, 3, 0.7)])
+            self.assertEqual(prj.get("weight", format="list", gather=True, with_address=False),
+                             [0.2, 0.1, 0.7])
+
+    def test_save_list_in_chunks(self):
+        filename = "test.connections"
+        prj = sim.Projection(self.p1, self.p2, connector=self.all2all, synapse_type=self.syn2)
+        prj.save(["weight", "delay"], filename, chunk_size=5)
+        self.assertEqual(open(filename).readline(), "# columns = ['i', 'j', 'weight', 'delay']\n")
+        connections = numpy.loadtxt(filename)
+        os.remove(filename)
+        assert_array_equal(connections, numpy.array(prj.get(["weight", "delay"], format="list")))
+
+    def test_save_binary_in_chunks(self):
+        filename = "test.connections"
+        prj = sim.Projection(self.p1, self.p2, connector=self.all2all, synapse_type=self.syn2)
+        file = recording.files.BinaryConnectionFile(filename, mode='w')
+        with patch.object(file, "write", Mock(side_effect=AssertionError("the chunks must not be concatenated"))):
+            prj.save(["weight", "delay"], file, chunk_size=5)
+        file = recording.files.BinaryConnectionFile(filename, mode='r')
+        connections = numpy.array(file.read())
+        file.close()
+        os.remove(filename)
+        expected = numpy.array(prj.get(["weight", "delay"], format="list"))
+        assert_array_equal(connections, expected[numpy.argsort(expected[:, 1], kind='mergesort')])
+
+    def test_save_array(self):
+        filename = "test.weights"
+        C = sim.FromListConnector([(0, 1, 0.1, 0.5), (3, 0, 0.2, 0.5), (3, 0, 0.3, 0.5)])
+        prj = sim.Projection(self.p1, self.p2, C, synapse_type=self.syn1)
+        prj.save('weight', filename, format='array', gather=False)
+        weights = numpy.loadtxt(filename)
+        os.remove(filename)
+        target = numpy.zeros((7, 4))
+        target[0, 1] = 0.1
+        target[3, 0] = 0.5
+        assert_array_almost_equal(weights, target)
+
     def test_describe(self):
         prj = sim.Projection(self.p1, self.p2, connector=self.all2all,
                              synapse_type=self.syn2)
@@ -239,3 +349,45 @@ class ProjectionTest(unittest.TestCase):
         n, bins = prj.weightHistogram(min=0.0, max=1.0)
         assert_array_equal(bins, numpy.linspace(0, 1.0, num=11))
         assert_array_equal(n, numpy.array([0, 0, 0, 0, prj.size(), 0, 0, 0, 0, 0]))
+
+
+class ConnectionStoreTest(unittest.TestCase):
+
+    def test_add_keeps_connections_sorted_by_target(self):
+        store = common.ConnectionStore(4)
+        store.add(numpy.array([0, 1]), numpy.array([2, 2]), weight=numpy.array([0.1, 0.2]))
+        store.add(numpy.array([3, 2]), numpy.array([3, 0]), weight=0.3, delay=1.0)
+        store.add(numpy.array([4]), numpy.array([2]), weight=0.4, delay=1.5)
+        self.assertEqual(len(store), 5)
+        assert_array_equal(store.postsynaptic_index, [0, 2, 2, 2, 3])
+        assert_array_equal(store.presynaptic_index, [2, 0, 1, 4, 3])
+        assert_array_equal(store.parameter("weight"), [0.3, 0.1, 0.2, 0.4, 0.3])
+        assert_array_equal(store.parameter("delay"), [1.0, numpy.nan, numpy.nan, 1.5, 1.0])
+        assert_array_equal(store.indptr, [0, 1, 1, 4, 5])
+
+    def test_out_of_order_blocks_are_sorted_on_access(self):
+        store = common.ConnectionStore(10)
+        for j in range(9, -1, -1):
+            store.add(numpy.array([j, j + 1]), numpy.array([j, j]), weight=float(j))
+        self.assertFalse(store._sorted)  # nothing has been sorted yet
+        assert_array_equal(store.postsynaptic_index, numpy.repeat(numpy.arange(10), 2))
+        self.assertTrue(store._sorted)
+        assert_array_equal(store.presynaptic_index[:4], [0, 1, 1, 2])
+        assert_array_equal(store.parameter("weight")[-2:], [9.0, 9.0])
+        assert_array_equal(store.indptr, numpy.arange(0, 21, 2))
+
+    def test_growth(self):
+        store = common.ConnectionStore(1000)
+        for j in range(1000):
+            store.add(numpy.arange(3), numpy.repeat(j, 3), weight=float(j))
+        self.assertEqual(len(store), 3000)
+        assert_array_equal(store.parameter("weight")[-3:], [999.0, 999.0, 999.0])
+
+    def test_as_list_and_arrays(self):
+        store = common.ConnectionStore(3)
+        store.add(numpy.array([0, 1, 1]), numpy.array([0, 2, 2]), weight=numpy.array([0.1, 0.2, 0.3]))
+        self.assertEqual(store.as_list("presynaptic_index", "weight"),
+                         [(0, 0.1), (1, 0.2), (1, 0.3)])
+        weights, = store.as_arrays(2, "weight")
+        assert_array_almost_equal(weights, [[0.1, numpy.nan, numpy.nan],
+                                            [numpy.nan, numpy.nan, 0.5]])
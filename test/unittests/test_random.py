@@ -4,6 +4,7 @@ Unit tests for pyNN/random.py.
 
 import pyNN.random as random
 import numpy
+from copy import deepcopy
 try:
     import unittest2 as unittest
 except ImportError:
@@ -62,7 +63,7 @@ class SimpleTests(unittest.TestCase):
 class ParallelTests(unittest.TestCase):
 
     def setUp(self):
-        self.rng_types = [random.NumpyRNG]
+        self.rng_types = [random.NumpyRNG, random.CounterBasedRNG]
         if random.have_gsl:
             self.rng_types.append(random.GSLRNG)
         self.orig_mpi_config = random.get_mpi_config
@@ -119,6 +120,68 @@ class ParallelTests(unittest.TestCase):
         perm1 = rng1.permutation(A)
         assert_arrays_almost_equal(perm0, perm1, 1e-99)
 
+class CounterBasedRNGTests(unittest.TestCase):
+
+    def test_streams_are_independent_of_order(self):
+        rng0 = random.CounterBasedRNG(seed=4367)
+        rng1 = random.CounterBasedRNG(seed=4367)
+        draw0 = [rng0.stream(3, j).next(4, 'uniform', {'low': 0, 'high': 1}) for j in range(5)]
+        draw1 = [rng1.stream(3, j).next(4, 'uniform', {'low': 0, 'high': 1}) for j in (4, 1, 3, 0, 2)]
+        for j, k in zip((4, 1, 3, 0, 2), range(5)):
+            self.assertEqual(draw0[j].tolist(), draw1[k].tolist())
+
+    def test_streams_differ(self):
+        rng = random.CounterBasedRNG(seed=4367)
+        a = rng.stream(0, 0).next(5, 'normal', {'mu': 0, 'sigma': 1})
+        b = rng.stream(0, 1).next(5, 'normal', {'mu': 0, 'sigma': 1})
+        c = rng.stream(1, 0).next(5, 'normal', {'mu': 0, 'sigma': 1})
+        d = random.CounterBasedRNG(seed=4368).stream(0, 0).next(5, 'normal', {'mu': 0, 'sigma': 1})
+        for x in (b, c, d):
+            self.assertNotEqual(a.tolist(), x.tolist())
+
+    def test_stream_seeding(self):
+        # the streams depend only on the seed and the address, through a
+        # SHA-256 hash, not on the version of NumPy
+        import hashlib
+        digest = hashlib.sha256(repr((4367, 3, 5))).digest()
+        expected = numpy.random.RandomState(numpy.frombuffer(digest, dtype=numpy.uint32)).uniform(0, 1, 4)
+        x = random.CounterBasedRNG(seed=4367).stream(3, 5).next(4, 'uniform', {'low': 0, 'high': 1})
+        self.assertEqual(x.tolist(), expected.tolist())
+
+    def test_new_key(self):
+        rng = random.CounterBasedRNG(seed=4367)
+        self.assertEqual([rng.new_key() for i in range(3)], [0, 1, 2])
+
+    def test_copies_share_keys(self):
+        rng = random.CounterBasedRNG(seed=4367)
+        rng.new_key()
+        rng_copy = deepcopy(rng)
+        self.assertEqual([rng_copy.new_key(), rng.new_key(), deepcopy(rng_copy).new_key()],
+                         [1, 2, 3])
+
+    def test_lazy_array_key_allocated_on_creation(self):
+        from pyNN.parameters import LazyArray
+        rng = random.CounterBasedRNG(seed=4367)
+        A = LazyArray(random.RandomDistribution('uniform', (0, 1), rng=rng), shape=(4, 5))
+        B = LazyArray(random.RandomDistribution('uniform', (0, 1), rng=rng), shape=(4, 5))
+        self.assertEqual((A._stream_key, B._stream_key), (0, 1))
+        # copies and derived arrays keep the key, so they have the same values
+        self.assertEqual(deepcopy(A)._stream_key, 0)
+        self.assertEqual((2 * A).evaluate().tolist(), (2 * A.evaluate()).tolist())
+        self.assertEqual(rng._n_keys, 2)
+
+    def test_lazy_array_columns_do_not_depend_on_access_order(self):
+        from pyNN.parameters import LazyArray
+        rd = random.RandomDistribution('uniform', (0, 1), rng=random.CounterBasedRNG(seed=4367))
+        full = LazyArray(rd, shape=(4, 5)).evaluate()
+        rd = random.RandomDistribution('uniform', (0, 1), rng=random.CounterBasedRNG(seed=4367))
+        A = LazyArray(rd, shape=(4, 5))
+        self.assertEqual(A[:, 3].tolist(), full[:, 3].tolist())
+        self.assertEqual(A[numpy.array([2, 0]), numpy.array([1, 4])].tolist(),
+                         [full[2, 1], full[0, 4]])
+        self.assertEqual(A[1, 2], full[1, 2])
+
+
 class NativeRNGTests(unittest.TestCase):
 
     def test_create(self):
@@ -30,6 +30,128 @@ from pyNN.utility import assert_arrays_equal
 
 #def test_mpi_sum():
 
+class MockComm(object):
+    """
+    Pretend to be node `rank` of an MPI communicator, with the columns of the
+    other nodes given by `other_data`, a dict of lists of 1D arrays.
+    """
+    def __init__(self, rank, other_data):
+        self.rank = rank
+        self.other_data = other_data
+        self.sent = defaultdict(int)  # number of values of each dtype sent so far by each node
+        self.size = len(other_data) + 1
+
+    def allgather(self, n):
+        return [n if r == self.rank else len(self.other_data[r][0]) for r in range(self.size)]
+
+    def _packed(self, r, dtype):
+        return numpy.array([column for column in self.other_data[r]
+                            if column.dtype == dtype], dtype=dtype).T.reshape(-1)
+
+    def Gatherv(self, sendbuf, recvbuf, root=0):
+        assert sendbuf.flags.c_contiguous or sendbuf.size == 0
+        if recvbuf is not None:
+            gdata, (counts, displacements) = recvbuf
+            assert gdata.dtype == sendbuf.dtype
+            flat = gdata.reshape(-1)
+            for r in range(self.size):
+                if r == self.rank:
+                    values = sendbuf.reshape(-1)
+                else:
+                    key = (r, sendbuf.dtype)
+                    values = self._packed(r, sendbuf.dtype)[self.sent[key]:self.sent[key] + counts[r]]
+                    self.sent[key] += counts[r]
+                assert values.size == counts[r]
+                assert 0 <= displacements[r] <= flat.size - counts[r]
+                flat[displacements[r]:displacements[r] + counts[r]] = values
+
+    Allgatherv = Gatherv
+
+
+def _mock_mpi_comm(rank, other_data):
+    comm = MockComm(rank, other_data)
+    return lambda: (comm, {'DOUBLE': None})
+
+
+def test_gather_columns():
+    orig_get_mpi_comm = recording.get_mpi_comm
+    recording.get_mpi_comm = _mock_mpi_comm(0, {1: [numpy.array([5, 6]),
+                                                    numpy.array([1, 2]),
+                                                    numpy.array([0.5, 0.6])]})
+    try:
+        sources, targets, weights = recording.gather_columns([numpy.array([3]),
+                                                              numpy.array([4]),
+                                                              numpy.array([0.3])])
+    finally:
+        recording.get_mpi_comm = orig_get_mpi_comm
+    assert_arrays_equal(sources, numpy.array([3, 5, 6]))
+    assert_equal(sources.dtype, numpy.array([3]).dtype)
+    assert_arrays_equal(targets, numpy.array([4, 1, 2]))
+    assert_arrays_equal(weights, numpy.array([0.3, 0.5, 0.6]))
+
+
+def test_gather_columns_preserves_values():
+    # integers too large to be represented exactly as doubles, and single
+    # precision floats, must be gathered in their own datatype
+    big = 2**53 + 1
+    orig_get_mpi_comm = recording.get_mpi_comm
+    recording.get_mpi_comm = _mock_mpi_comm(0, {1: [numpy.array([big + 2], dtype=numpy.int64),
+                                                    numpy.array([0.2], dtype=numpy.float32)]})
+    try:
+        indices, values = recording.gather_columns([numpy.array([big], dtype=numpy.int64),
+                                                    numpy.array([0.1], dtype=numpy.float32)])
+    finally:
+        recording.get_mpi_comm = orig_get_mpi_comm
+    assert_equal(indices.tolist(), [big, big + 2])
+    assert_equal(values.dtype, numpy.float32)
+    assert_arrays_equal(values, numpy.array([0.1, 0.2], dtype=numpy.float32))
+
+
+def test_gather_columns_not_root():
+    orig_get_mpi_comm = recording.get_mpi_comm
+    recording.get_mpi_comm = _mock_mpi_comm(1, {0: [numpy.array([5]), numpy.array([0.5])]})
+    columns = [numpy.array([3, 4]), numpy.array([0.3, 0.4])]
+    try:
+        assert recording.gather_columns(columns) is columns
+        sources, weights = recording.gather_columns(columns, all=True)
+    finally:
+        recording.get_mpi_comm = orig_get_mpi_comm
+    assert_arrays_equal(sources, numpy.array([5, 3, 4]))
+    assert_arrays_equal(weights, numpy.array([0.5, 0.3, 0.4]))
+
+
+def test_iter_gather_columns():
+    orig_get_mpi_comm = recording.get_mpi_comm
+    other_data = {1: [numpy.array([10, 11, 12]), numpy.array([1.0, 1.1, 1.2])],
+                  2: [numpy.array([20]), numpy.array([2.0])]}
+    recording.get_mpi_comm = _mock_mpi_comm(0, other_data)
+    try:
+        chunks = list(recording.iter_gather_columns([numpy.array([0, 1]),
+                                                     numpy.array([0.0, 0.1])],
+                                                    chunk_size=4))
+    finally:
+        recording.get_mpi_comm = orig_get_mpi_comm
+    assert_equal([chunk[0].tolist() for chunk in chunks], [[0, 1, 10, 11], [12, 20]])
+    assert_equal([chunk[1].tolist() for chunk in chunks], [[0.0, 0.1, 1.0, 1.1], [1.2, 2.0]])
+
+
+def test_iter_gather_columns_with_empty_nodes():
+    # the root node and node 2 have no data; chunks starting beyond their
+    # position in the gathered arrays must not give them negative displacements
+    orig_get_mpi_comm = recording.get_mpi_comm
+    other_data = {1: [numpy.array([10, 11, 12]), numpy.array([1.0, 1.1, 1.2])],
+                  2: [numpy.array([], dtype=int), numpy.array([])],
+                  3: [numpy.array([30]), numpy.array([3.0])]}
+    recording.get_mpi_comm = _mock_mpi_comm(0, other_data)
+    try:
+        chunks = list(recording.iter_gather_columns([numpy.array([], dtype=int),
+                                                     numpy.array([])],
+                                                    chunk_size=2))
+    finally:
+        recording.get_mpi_comm = orig_get_mpi_comm
+    assert_equal([chunk[0].tolist() for chunk in chunks], [[10, 11], [12, 30]])
+    assert_equal([chunk[1].tolist() for chunk in chunks], [[1.0, 1.1], [1.2, 3.0]])
+
 class MockState(object):
     def __init__(self, mpi_rank):
         self.mpi_rank = mpi_rank
@@ -10,7 +10,7 @@ import unittest
 import numpy
 from mock import Mock
 from nose.tools import assert_equal, assert_raises
-from pyNN.utility import assert_arrays_equal
+from pyNN.utility import assert_arrays_equal, assert_arrays_almost_equal
 from math import sqrt
 
 def assert_arrays_almost_equal(a, b, threshold, msg=''):
@@ -124,6 +124,38 @@ class SpaceTest(unittest.TestCase):
                                numpy.array([sqrt(3), sqrt(4+4+4), 0.0, sqrt(4+1+0)]))
 
 
+class CellListTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(7391)
+        self.A = rng.uniform(0, 100, size=(200, 3))
+        self.B = rng.uniform(0, 100, size=(150, 3))
+
+    def _check_against_distance_matrix(self, s, max_distance):
+        index = space.CellList(self.A, max_distance, s)
+        i, j, d = index.pairs_within(self.B, max_distance)
+        D = s.distances(self.A, self.B).reshape((self.A.shape[0], self.B.shape[0]))
+        expected_j, expected_i = numpy.nonzero(D.T <= max_distance)
+        assert_arrays_equal(i, expected_i)
+        assert_arrays_equal(j, expected_j)
+        assert_arrays_almost_equal(d, D[expected_i, expected_j], 1e-12)
+
+    def test_pairs_within_infinite_space(self):
+        for max_distance in (5.0, 20.0, 150.0):
+            self._check_against_distance_matrix(space.Space(), max_distance)
+
+    def test_pairs_within_with_collapsed_axes(self):
+        self._check_against_distance_matrix(space.Space(axes='xy'), 10.0)
+
+    def test_pairs_within_with_scale_and_offset(self):
+        self._check_against_distance_matrix(space.Space(scale_factor=0.5, offset=20.0), 25.0)
+
+    def test_pairs_within_cylindrical_space(self):
+        s = space.Space(periodic_boundaries=((0, 100), None, (0, 100)))
+        for max_distance in (10.0, 40.0, 60.0):
+            self._check_against_distance_matrix(s, max_distance)
+
+
 class LineTest(unittest.TestCase):
 
     def test_generate_positions_default_parameters(self):